@@ -1,3 +1,111 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
 
-# Create your tests here.
+from shop.cards import refresh_product_cards
+from shop.models import Order, ProductImage, ProductVariant
+from shop.orders import backfill_order_history, transition_orders
+from shop.tests import LOCMEM, make_orders, make_variants
+
+
+@override_settings(CACHES=LOCMEM)
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cliente", email="cliente@example.com")
+        self.variants = make_variants(3, prefix="h")
+        ProductImage.objects.bulk_create([
+            ProductImage(product_id=v.product_id, image=f"shop/products/h-{v.pk}.jpg") for v in self.variants
+        ])
+        refresh_product_cards([v.product_id for v in self.variants])
+
+    def test_backfill_links_by_email_and_summarizes(self):
+        make_orders(self.variants, 3, quantity=1, customer_email="Cliente@Example.com")
+        make_orders(self.variants, 2, prefix="x", quantity=1, customer_email="outro@example.com")
+
+        self.assertEqual(backfill_order_history(batch_size=2), (3, 5))
+        self.assertEqual(backfill_order_history(), (0, 0))
+        order = Order.objects.filter(user=self.user).first()
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(order.item_count, 3)
+        self.assertEqual(order.item_names, "h 0, h 1, h 2")
+        self.assertIn(f"h-{self.variants[0].pk}.jpg", order.thumbnail_url)
+
+    def _page_queries(self, n):
+        make_orders(self.variants, n, prefix=f"p{n}", quantity=1)
+        backfill_order_history()
+        self.client.force_login(self.user)
+        self.client.get(reverse("accounts:orders"))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("accounts:orders"))
+        self.assertContains(response, "h 0, h 1, h 2")
+        # detalhe por item (tamanho, quantidade, preço) de cada encomenda da página
+        self.assertContains(response, "250.00 MZN/un", count=min(n, 10) * len(self.variants))
+        return len(ctx)
+
+    def test_page_queries_do_not_grow_with_orders(self):
+        few = self._page_queries(1)
+        Order.objects.all().delete()
+        self.assertEqual(self._page_queries(10), few)
+
+
+@override_settings(CACHES=LOCMEM)
+class OrderTransitionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cliente", email="cliente@example.com")
+        self.variants = make_variants(2, prefix="t", stock=10)
+        self.client.force_login(self.user)
+
+    def _stock(self):
+        return sorted(ProductVariant.objects.filter(pk__in=[v.pk for v in self.variants])
+                      .values_list("stock_qty", flat=True))
+
+    def _cancel_queries(self, n):
+        make_orders(self.variants, n, prefix=f"c{n}", quantity=1, user=self.user)
+        orders = Order.objects.filter(order_number__startswith=f"c{n}-")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(transition_orders(orders, "cancelled"), n)
+        return len(ctx)
+
+    def test_cancel_queries_do_not_grow_with_orders(self):
+        self._cancel_queries(1)  # cria as linhas dos rollups do dia
+        self.assertEqual(self._cancel_queries(2), self._cancel_queries(20))
+        self.assertEqual(self._stock(), [33, 33])
+
+    def test_bulk_cancel_restores_stock_once(self):
+        make_orders(self.variants, 5, quantity=1, user=self.user)
+        orders = Order.objects.filter(user=self.user)
+
+        self.assertEqual(transition_orders(orders, "cancelled"), 5)
+        self.assertEqual(self._stock(), [15, 15])
+        self.assertEqual(transition_orders(orders, "cancelled"), 0)
+        self.assertEqual(self._stock(), [15, 15])
+
+    def test_cancel_view(self):
+        (order,) = make_orders(self.variants, 1, quantity=1, user=self.user)
+        url = reverse("accounts:order_cancel", args=[order.order_number])
+
+        self.assertTrue(self.client.post(url).json()["success"])
+        self.assertEqual(self._stock(), [11, 11])
+        self.assertFalse(self.client.post(url).json()["success"])
+        self.assertEqual(self._stock(), [11, 11])
+
+    def test_confirmed_order_cannot_be_cancelled(self):
+        (order,) = make_orders(self.variants, 1, quantity=1, user=self.user)
+        self.assertTrue(self.client.post(reverse("accounts:order_confirm", args=[order.order_number])).json()["success"])
+        response = self.client.post(reverse("accounts:order_cancel", args=[order.order_number])).json()
+
+        self.assertFalse(response["success"])
+        order.refresh_from_db()
+        self.assertEqual(order.status, "confirmed")
+        self.assertEqual(self._stock(), [10, 10])
+
+    def test_other_users_order_is_not_found(self):
+        other = User.objects.create_user("outro", email="outro@example.com")
+        (order,) = make_orders(self.variants, 1, quantity=1, customer_email=other.email, user=other)
+        response = self.client.post(reverse("accounts:order_cancel", args=[order.order_number])).json()
+
+        self.assertEqual(response["error"], "Pedido não encontrado")
+        order.refresh_from_db()
+        self.assertEqual(order.status, "pending")
@@ -1,13 +1,15 @@
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.db.models import Prefetch
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView
+from shop.guest_cart import merge_guest_cart
 from shop.models import Order, OrderItem
-from django.db.models import Prefetch
+from shop.orders import transition_orders
 from django.http import JsonResponse
 
 from .forms import SignupForm, EmailLoginForm
@@ -26,7 +28,9 @@ class SignupView(View):
 
         user = form.save()
         login(request, user)
-        return redirect(request.GET.get("next") or reverse("shop:product_list"))
+        response = redirect(request.GET.get("next") or reverse("shop:product_list"))
+        merge_guest_cart(request, response)
+        return response
 
 
 class LoginView(View):
@@ -60,7 +64,9 @@ class LoginView(View):
             return render(request, self.template_name, {"form": form})
 
         login(request, user)
-        return redirect(request.GET.get("next") or reverse("shop:product_list"))
+        response = redirect(request.GET.get("next") or reverse("shop:product_list"))
+        merge_guest_cart(request, response)
+        return response
 
 
 class LogoutView(View):
@@ -75,51 +81,31 @@ class OrderListView(LoginRequiredMixin, ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        return Order.objects.filter(
-            customer_email=self.request.user.email
-        ).prefetch_related(
+        # índice (user, -created_at); a linha fechada usa o resumo gravado na
+        # encomenda e o detalhe dos itens vem num só prefetch para a página
+        return Order.objects.filter(user=self.request.user).prefetch_related(
             Prefetch(
                 'items',
-                queryset=OrderItem.objects.select_related(
-                    'product_variant__product'
-                ).prefetch_related('product_variant__product__images')
+                queryset=OrderItem.objects.select_related('product_variant__product').order_by('id'),
             )
         ).order_by('-created_at')
 
 
 class OrderConfirmView(LoginRequiredMixin, View):
     def post(self, request, order_number):
-        try:
-            order = Order.objects.get(
-                order_number=order_number,
-                customer_email=request.user.email
-            )
-
-            if order.status == 'pending':
-                order.status = 'confirmed'
-                order.save(update_fields=['status'])
-                return JsonResponse({'success': True})
-            else:
-                return JsonResponse({'success': False, 'error': 'Pedido já processado'})
-
-        except Order.DoesNotExist:
+        orders = Order.objects.filter(order_number=order_number, user=request.user)
+        if transition_orders(orders, 'confirmed'):
+            return JsonResponse({'success': True})
+        if not orders.exists():
             return JsonResponse({'success': False, 'error': 'Pedido não encontrado'})
+        return JsonResponse({'success': False, 'error': 'Pedido já processado'})
 
 
 class OrderCancelView(LoginRequiredMixin, View):
     def post(self, request, order_number):
-        try:
-            order = Order.objects.get(
-                order_number=order_number,
-                customer_email=request.user.email
-            )
-
-            if order.status == 'pending':
-                order.status = 'cancelled'
-                order.save(update_fields=['status'])
-                return JsonResponse({'success': True})
-            else:
-                return JsonResponse({'success': False, 'error': 'Não é possível cancelar este pedido'})
-
-        except Order.DoesNotExist:
-            return JsonResponse({'success': False, 'error': 'Pedido não encontrado'})
\ No newline at end of file
+        orders = Order.objects.filter(order_number=order_number, user=request.user)
+        if transition_orders(orders, 'cancelled'):
+            return JsonResponse({'success': True})
+        if not orders.exists():
+            return JsonResponse({'success': False, 'error': 'Pedido não encontrado'})
+        return JsonResponse({'success': False, 'error': 'Não é possível cancelar este pedido'})
@@ -1,6 +1,7 @@
 from django.db import models
 from django.utils import timezone
-from django.utils.text import slugify
+
+from core.slugs import unique_slug
 
 
 class Campaign(models.Model):
@@ -70,6 +71,7 @@ class Campaign(models.Model):
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ("-start_date",)
@@ -83,13 +85,7 @@ class Campaign(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            base = slugify(self.title)[:200] or "campaign.html"
-            candidate = base
-            i = 2
-            while Campaign.objects.filter(slug=candidate).exclude(pk=self.pk).exists():
-                candidate = f"{base}-{i}"
-                i += 1
-            self.slug = candidate
+            self.slug = unique_slug(Campaign, self.title, "campaign.html", exclude_pk=self.pk)
         super().save(*args, **kwargs)
 
     @property
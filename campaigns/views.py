@@ -1,5 +1,7 @@
 from django.shortcuts import render
 
+from core.conditional import conditional_page
+
 from .models import Campaign
 
 
@@ -10,6 +12,18 @@ def list_campaigns(request):
     return render(request, 'campaigns/campaign.html', context=context)
 
 
+def _campaign_freshness(request, slug):
+    updated_at = (
+        Campaign.objects.filter(slug=slug)
+        .values_list("updated_at", flat=True)
+        .first()
+    )
+    if updated_at is None:
+        return None
+    return (("campaign", slug, updated_at.isoformat()), updated_at)
+
+
+@conditional_page(_campaign_freshness)
 def campaign_detail(request, slug):
     campaign = Campaign.objects.get(slug=slug)
     context = {'campaign': campaign}
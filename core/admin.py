@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import NewsletterSubscriber
+from . import mail
+from .models import EmailOutbox, NewsletterSubscriber
 
 
 admin.site.site_header = "PLA - Painel Administrativo"
@@ -21,3 +22,23 @@ class NewsletterSubscriberAdmin(admin.ModelAdmin):
         ("Estado", {"fields": ("status", "unsubscribed_at")}),
         ("Datas", {"fields": ("subscribed_at",)}),
     )
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ("subject", "status", "attempts", "next_attempt_at", "created_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("subject",)
+    readonly_fields = (
+        "subject", "from_email", "to", "body", "html_body",
+        "status", "attempts", "next_attempt_at", "last_error", "created_at", "sent_at",
+    )
+    actions = ["requeue"]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Voltar a pôr na fila de envio")
+    def requeue(self, request, queryset):
+        count = mail.requeue(queryset)
+        self.message_user(request, f"{count} emails de volta à fila.")
@@ -0,0 +1,44 @@
+"""
+Base de dados descartável para os comandos bench_*.
+
+Os benchmarks criam dezenas de milhares de linhas (e alguns escrevem a partir
+de várias threads), por isso correm num ficheiro SQLite temporário, migrado
+do zero e apagado no fim, nunca na base de dados configurada. A cache também
+passa a ser local ao processo durante a medição.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@contextmanager
+def scratch_database():
+    """Troca a ligação default por um ficheiro SQLite novo; devolve o caminho."""
+    if connection.vendor != "sqlite":
+        raise CommandError("Os benchmarks só correm sobre SQLite.")
+
+    fd, path = tempfile.mkstemp(prefix="bench-", suffix=".sqlite3")
+    os.close(fd)
+
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    previous_test_name = test_settings.get("NAME")
+    test_settings["NAME"] = path
+    try:
+        with override_settings(CACHES=LOCMEM):
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                yield path
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+    finally:
+        test_settings["NAME"] = previous_test_name
+        if os.path.exists(path):
+            os.remove(path)
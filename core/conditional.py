@@ -0,0 +1,51 @@
+"""
+GET condicional (ETag / Last-Modified) para páginas de detalhe.
+
+`conditional_page(freshness)` envolve uma view com o decorator `condition`
+do Django. `freshness(request, *args, **kwargs)` faz uma única query barata e
+devolve `(etag_parts, last_modified)` ou None (página inexistente). A view só
+corre (querysets + template) quando o cliente não tem a versão actual.
+
+Só se aplica a páginas partilhadas (`is_shared_view`): quando a navbar mostra
+um carrinho (utilizador autenticado ou visitante com carrinho no cookie) a
+página muda sem mexer no conteúdo.
+"""
+from __future__ import annotations
+
+import hashlib
+
+from django.conf import settings
+from django.views.decorators.http import condition
+
+_NOT_COMPUTED = object()
+
+
+def is_shared_view(request) -> bool:
+    """True quando a resposta não depende do visitante (pode ir para cache/304)."""
+    if request.user.is_authenticated:
+        return False
+    return not request.COOKIES.get(getattr(settings, "GUEST_CART_COOKIE_NAME", "guest_cart"))
+
+
+def conditional_page(freshness):
+    def _state(request, *args, **kwargs):
+        state = getattr(request, "_page_freshness", _NOT_COMPUTED)
+        if state is _NOT_COMPUTED:
+            state = None
+            if request.method in ("GET", "HEAD") and is_shared_view(request):
+                state = freshness(request, *args, **kwargs)
+            request._page_freshness = state
+        return state
+
+    def etag(request, *args, **kwargs):
+        state = _state(request, *args, **kwargs)
+        if state is None:
+            return None
+        raw = "|".join(str(p) for p in state[0])
+        return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        state = _state(request, *args, **kwargs)
+        return state[1] if state is not None else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,26 @@
+"""
+Cursores opacos para paginação por keyset: (datetime, pk) em base64 url-safe.
+
+O cliente só os devolve tal como os recebeu; a view filtra
+`(t < moment) OR (t = moment AND pk < pk_cursor)` com a mesma ordem descendente
+de (t, pk), por isso cada página é uma range query no índice, seja qual for a
+profundidade.
+"""
+from __future__ import annotations
+
+import base64
+from datetime import datetime
+
+
+def encode_cursor(moment: datetime, pk: int) -> str:
+    raw = f"{moment.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int] | None:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        moment, pk = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(moment), int(pk)
+    except (ValueError, UnicodeError):
+        return None
@@ -0,0 +1,120 @@
+"""
+Slots da homepage: o produto em destaque e o próximo evento, já resolvidos
+(nome, slug, preço/data, imagem) e guardados em HomeSlot.
+
+Recalculados pelos signals quando muda o conteúdo de origem (Product,
+ProductImage, Event; ver core/signals.py), e o slot do próximo evento também
+quando esse evento começa (`valid_until`). A homepage lê-os de uma entrada na
+cache, sem queries; a entrada tem uma versão nova sempre que os slots mudam e
+essa versão entra na chave da página inteira em cache (core.views.index).
+"""
+from __future__ import annotations
+
+import time
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from events.models import Event
+from shop.models import Product, ProductImage
+
+from .models import HomeSlot
+
+HERO_PRODUCT = "hero_product"
+NEXT_EVENT = "next_event"
+
+SLOTS_CACHE_KEY = "home:slots"
+MAX_TIMEOUT = 60 * 60 * 24
+
+
+def _hero_product(now):
+    product = Product.objects.filter(is_featured=True).only("pk", "name", "slug", "price").first()
+    if product is None:
+        return None, None
+    image = (
+        ProductImage.objects.filter(product_id=product.pk)
+        .order_by("id")
+        .values_list("image", flat=True)
+        .first()
+    )
+    return {"name": product.name, "slug": product.slug, "price": str(product.price), "image": image or ""}, None
+
+
+def _next_event(now):
+    event = (
+        Event.objects.filter(start_at__gte=now)
+        .order_by("start_at")
+        .only("pk", "title", "slug", "city", "poster", "start_at")
+        .first()
+    )
+    if event is None:
+        return None, None
+    return {
+        "title": event.title,
+        "slug": event.slug,
+        "city": event.city,
+        "poster": event.poster.name,
+        "start_at": event.start_at.isoformat(),
+    }, event.start_at
+
+
+SLOT_BUILDERS = {
+    HERO_PRODUCT: _hero_product,
+    NEXT_EVENT: _next_event,
+}
+
+
+def timeout_until(valid_until, now) -> int:
+    if valid_until is None:
+        return MAX_TIMEOUT
+    return max(1, min(MAX_TIMEOUT, int((valid_until - now).total_seconds()) + 1))
+
+
+def _publish(now) -> dict:
+    """
+    Lê os slots da tabela para a cache, com uma versão nova. A escrita na cache
+    só acontece no commit: dentro de uma transacção que depois faça rollback
+    publicava slots que nunca existiram.
+    """
+    slots = list(HomeSlot.objects.all())
+    valid_until = min((s.valid_until for s in slots if s.valid_until), default=None)
+    entry = {
+        "version": int(time.time() * 1000),
+        "slots": {s.name: s.payload for s in slots},
+        "valid_until": valid_until,
+    }
+    transaction.on_commit(lambda: cache.set(SLOTS_CACHE_KEY, entry, timeout_until(valid_until, now)))
+    return entry
+
+
+def refresh_slots(*names) -> dict:
+    """Recalcula os slots indicados (por omissão todos) e publica-os."""
+    now = timezone.now()
+    for name in names or SLOT_BUILDERS:
+        payload, valid_until = SLOT_BUILDERS[name](now)
+        HomeSlot.objects.update_or_create(name=name, defaults={"payload": payload, "valid_until": valid_until})
+    return _publish(now)
+
+
+def home_slots() -> dict:
+    """Entrada da cache {"version", "slots", "valid_until"}; recalcula só o que expirou ou falta."""
+    now = timezone.now()
+    entry = cache.get(SLOTS_CACHE_KEY)
+    if entry is None:
+        entry = _publish(now)
+    missing = [name for name in SLOT_BUILDERS if name not in entry["slots"]]
+    if missing:
+        return refresh_slots(*missing)
+    if entry["valid_until"] is not None and entry["valid_until"] < now:
+        return refresh_slots(NEXT_EVENT)
+    return entry
+
+
+def slot_context(entry) -> dict:
+    """Contexto do template core/index.html a partir dos slots."""
+    event = entry["slots"].get(NEXT_EVENT)
+    if event is not None:
+        event = {**event, "start_at": datetime.fromisoformat(event["start_at"])}
+    return {"top_product": entry["slots"].get(HERO_PRODUCT), "e": event}
@@ -0,0 +1,236 @@
+"""
+Renditions responsivas das imagens enviadas (produtos, posters de eventos,
+capas de campanhas).
+
+Para cada imagem original `<dir>/<nome>.<ext>` são gerados, em
+`renditions/<dir>/<nome>-<largura>w.webp` e `.jpg`, as larguras de
+RENDITION_WIDTHS menores que o original, mais o original à largura real quando
+é mais estreito que a maior (nunca se amplia nem se repete a mesma imagem com
+larguras diferentes). As larguras escritas ficam em `renditions/<dir>/<nome>.json`
+e, para o srcset não abrir o manifesto a cada render, também na cache.
+O original é recomprimido e perde o EXIF no upload (ou no build_renditions,
+para as imagens que já estavam em media/).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+RENDITION_WIDTHS = (480, 960, 1600)
+RENDITION_DIR = "renditions"
+
+JPEG_QUALITY = 82
+WEBP_QUALITY = 78
+ORIGINAL_JPEG_QUALITY = 88
+
+# Um original já gravado só é substituído se ficar pelo menos 10% menor
+# (recomprimir o mesmo JPEG a cada execução só perderia qualidade).
+MIN_ORIGINAL_SAVING = 0.10
+
+WIDTHS_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+# Fundo usado ao achatar transparência para JPEG (o site é escuro).
+FLATTEN_BACKGROUND = (0, 0, 0)
+
+
+def rendition_name(name: str, width: int, fmt: str) -> str:
+    base, _ = os.path.splitext(name)
+    ext = "jpg" if fmt == "jpeg" else fmt
+    return f"{RENDITION_DIR}/{base}-{width}w.{ext}"
+
+
+def manifest_name(name: str) -> str:
+    base, _ = os.path.splitext(name)
+    return f"{RENDITION_DIR}/{base}.json"
+
+
+def target_widths(original_width: int) -> tuple[int, ...]:
+    """Larguras a gerar para um original com `original_width` px."""
+    widths = [w for w in RENDITION_WIDTHS if w < original_width]
+    if original_width <= RENDITION_WIDTHS[-1]:
+        widths.append(original_width)
+    return tuple(widths)
+
+
+def _open(fileobj) -> tuple[Image.Image, str]:
+    img = Image.open(fileobj)
+    fmt = (img.format or "").lower()
+    img.load()
+    # Aplica a orientação do EXIF antes de o descartar.
+    img = ImageOps.exif_transpose(img)
+    for key in ("exif", "xmp", "XML:com.adobe.xmp"):
+        img.info.pop(key, None)
+    return img, fmt
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        bg = Image.new("RGB", rgba.size, FLATTEN_BACKGROUND)
+        bg.paste(rgba, mask=rgba.split()[-1])
+        return bg
+    return img.convert("RGB")
+
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    buf = BytesIO()
+    if fmt == "jpeg":
+        _flatten(img).save(buf, "JPEG", quality=quality, optimize=True, progressive=True)
+    elif fmt == "webp":
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        img.save(buf, "WEBP", quality=quality, method=6)
+    else:
+        img.save(buf, fmt.upper(), optimize=True)
+    return buf.getvalue()
+
+
+def _recompressed(fileobj) -> bytes | None:
+    """Original recomprimido e sem EXIF; None se não for um formato que se recomprima."""
+    try:
+        fileobj.seek(0)
+        img, fmt = _open(fileobj)
+    except Exception:
+        # Não é uma imagem que o Pillow saiba ler; fica tal como veio.
+        return None
+
+    if fmt in ("jpeg", "mpo"):
+        return _encode(img, "jpeg", ORIGINAL_JPEG_QUALITY)
+    if fmt == "png":
+        return _encode(img, "png", 0)
+    if fmt == "webp":
+        return _encode(img, "webp", WEBP_QUALITY)
+    return None
+
+
+def optimize_upload(fieldfile) -> None:
+    """
+    Recomprime um upload ainda não gravado (FieldFile não committed) e remove
+    os metadados EXIF. Chamado em pre_save, antes de o ficheiro ir para o storage.
+    """
+    if not fieldfile or getattr(fieldfile, "_committed", True):
+        return
+
+    data = _recompressed(fieldfile.file)
+    if data is not None:
+        fieldfile.file = ContentFile(data, name=fieldfile.name)
+
+
+def recompress_original(fieldfile) -> str | None:
+    """
+    Recomprime um original já gravado (imagens de antes do optimize_upload).
+    Devolve o nome com que ficou no storage, ou None se não foi substituído.
+    """
+    if not fieldfile or not fieldfile.name:
+        return None
+
+    storage = fieldfile.storage
+    name = fieldfile.name
+    try:
+        with storage.open(name, "rb") as fh:
+            original = fh.read()
+    except OSError:
+        return None
+
+    data = _recompressed(BytesIO(original))
+    if data is None or len(data) > len(original) * (1 - MIN_ORIGINAL_SAVING):
+        return None
+
+    storage.delete(name)
+    return storage.save(name, ContentFile(data))
+
+
+def generate_renditions(fieldfile, overwrite: bool = False) -> int:
+    """
+    Gera as renditions WebP + JPEG de um ficheiro já gravado.
+    Devolve o número de ficheiros escritos.
+    """
+    if not fieldfile or not fieldfile.name:
+        return 0
+
+    storage = fieldfile.storage
+    name = fieldfile.name
+
+    if not overwrite and has_renditions(name, storage):
+        return 0
+
+    try:
+        with storage.open(name, "rb") as fh:
+            img, _ = _open(fh)
+    except Exception:
+        return 0
+
+    delete_renditions(name, storage)
+
+    widths = target_widths(img.width)
+    written = 0
+    for width in widths:
+        height = max(1, round(img.height * width / img.width))
+        resized = img.resize((width, height), Image.LANCZOS) if width != img.width else img
+
+        for fmt, quality in (("webp", WEBP_QUALITY), ("jpeg", JPEG_QUALITY)):
+            storage.save(rendition_name(name, width, fmt), ContentFile(_encode(resized, fmt, quality)))
+            written += 1
+
+    # o manifesto vai no fim: sem ele o template usa o original
+    storage.save(manifest_name(name), ContentFile(json.dumps({"widths": widths}).encode("utf-8")))
+    cache.set(_widths_key(name), widths, WIDTHS_CACHE_TIMEOUT)
+    return written
+
+
+def _widths_key(name: str) -> str:
+    return "renditions:" + hashlib.md5(name.encode("utf-8")).hexdigest()
+
+
+def _read_manifest(name: str, storage) -> tuple[int, ...]:
+    try:
+        with storage.open(manifest_name(name), "rb") as fh:
+            return tuple(json.load(fh)["widths"])
+    except (OSError, ValueError, KeyError):
+        return ()
+
+
+def rendition_widths(name: str, storage=None) -> tuple[int, ...]:
+    """
+    Larguras geradas para `name` (vazio se ainda não há renditions).
+    Vêm da cache; o manifesto só é lido na primeira vez.
+    """
+    key = _widths_key(name)
+    widths = cache.get(key)
+    if widths is None:
+        widths = _read_manifest(name, storage or default_storage)
+        cache.set(key, widths, WIDTHS_CACHE_TIMEOUT)
+    return tuple(widths)
+
+
+def has_renditions(name: str, storage=None) -> bool:
+    """Lê o manifesto (não a cache): é o que decide se há trabalho a fazer."""
+    return bool(_read_manifest(name, storage or default_storage))
+
+
+def delete_renditions(name: str, storage=None) -> None:
+    storage = storage or default_storage
+    # inclui RENDITION_WIDTHS: renditions antigas, de antes do manifesto
+    for width in set(_read_manifest(name, storage)) | set(RENDITION_WIDTHS):
+        for fmt in ("webp", "jpeg"):
+            out = rendition_name(name, width, fmt)
+            if storage.exists(out):
+                storage.delete(out)
+    if storage.exists(manifest_name(name)):
+        storage.delete(manifest_name(name))
+    cache.delete(_widths_key(name))
+
+
+def rendition_srcset(name: str, fmt: str, widths, storage=None) -> str:
+    storage = storage or default_storage
+    return ", ".join(
+        f"{storage.url(rendition_name(name, width, fmt))} {width}w"
+        for width in widths
+    )
@@ -0,0 +1,137 @@
+"""
+Outbox de emails transacionais.
+
+`enqueue()` é só um INSERT em EmailOutbox e deve ser chamado dentro da
+transação que origina o email: rollback leva o email com ela, commit garante
+que ele sai. Os pedidos HTTP nunca falam com o SMTP; a entrega é do
+`manage.py run_mail_worker`:
+
+    - reclama um lote de emails vencidos com um UPDATE (lease), para que dois
+      workers não enviem o mesmo;
+    - envia o lote por uma única ligação (`get_connection()`), aberta uma vez;
+    - marca os enviados num UPDATE; as falhas voltam a `pending` com backoff
+      exponencial e, esgotadas as tentativas ou com erro permanente (5xx),
+      ficam `dead` para ver/reenviar no admin.
+"""
+from __future__ import annotations
+
+import random
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 60  # segundos: ~1m, 2m, 4m... até BACKOFF_MAX
+BACKOFF_MAX = 6 * 60 * 60
+LEASE = timedelta(minutes=5)  # um worker que morra a meio liberta o lote ao fim disto
+
+
+def enqueue(subject: str, body: str, to, html_body: str = "", from_email: str | None = None) -> EmailOutbox:
+    return EmailOutbox.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        next_attempt_at=timezone.now(),
+    )
+
+
+def backoff(attempts: int) -> timedelta:
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    # jitter para os emails que falharam juntos não voltarem todos juntos
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_batch(batch_size: int = BATCH_SIZE, now=None) -> list[EmailOutbox]:
+    """
+    Reserva até `batch_size` emails vencidos empurrando o next_attempt_at para
+    o fim da lease (e contando a tentativa). Só devolve as linhas que ficaram
+    com a nossa lease: as que outro worker apanhou entretanto ficam de fora.
+    """
+    now = now or timezone.now()
+    due = EmailOutbox.objects.filter(status=EmailOutbox.Status.PENDING, next_attempt_at__lte=now)
+    ids = list(due.order_by("next_attempt_at", "id").values_list("pk", flat=True)[:batch_size])
+    if not ids:
+        return []
+    lease_until = now + LEASE
+    due.filter(pk__in=ids).update(next_attempt_at=lease_until, attempts=F("attempts") + 1)
+    return list(
+        EmailOutbox.objects.filter(
+            pk__in=ids, status=EmailOutbox.Status.PENDING, next_attempt_at=lease_until
+        ).order_by("id")
+    )
+
+
+def _message(row: EmailOutbox, connection) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(
+        subject=row.subject,
+        body=row.body,
+        from_email=row.from_email or None,
+        to=row.to,
+        connection=connection,
+    )
+    if row.html_body:
+        message.attach_alternative(row.html_body, "text/html")
+    return message
+
+
+def _permanent(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(exc, smtplib.SMTPResponseException) and 500 <= exc.smtp_code < 600
+
+
+def deliver(rows, connection) -> tuple[int, int, int]:
+    """
+    Envia `rows` (já reclamadas) pela `connection`, que fica aberta entre
+    mensagens e entre lotes. Devolve (enviados, a repetir, dead).
+    """
+    sent = retried = dead = 0
+    now = timezone.now()
+
+    for row in rows:
+        try:
+            # open() não faz nada se a ligação já estiver aberta; se o backend
+            # a abrisse dentro de send_messages, fechava-a logo a seguir
+            connection.open()
+            if not connection.send_messages([_message(row, connection)]):
+                raise smtplib.SMTPException("O backend não enviou a mensagem.")
+        except Exception as exc:
+            permanent = _permanent(exc)
+            if not permanent:
+                # estado da sessão SMTP desconhecido: a próxima mensagem reabre
+                connection.close()
+            error = f"{type(exc).__name__}: {exc}"[:2000]
+            if permanent or row.attempts >= MAX_ATTEMPTS:
+                EmailOutbox.objects.filter(pk=row.pk).update(
+                    status=EmailOutbox.Status.DEAD, last_error=error
+                )
+                dead += 1
+            else:
+                EmailOutbox.objects.filter(pk=row.pk).update(
+                    next_attempt_at=now + backoff(row.attempts), last_error=error
+                )
+                retried += 1
+        else:
+            # marcado logo: se o worker morrer (ou o lease expirar) a meio do
+            # lote, o que já saiu não volta a ser enviado
+            EmailOutbox.objects.filter(pk=row.pk).update(
+                status=EmailOutbox.Status.SENT, sent_at=timezone.now(), last_error=""
+            )
+            sent += 1
+    return sent, retried, dead
+
+
+def requeue(queryset) -> int:
+    """Volta a pôr emails (ex: dead) na fila, com as tentativas a zero."""
+    return queryset.exclude(status=EmailOutbox.Status.SENT).update(
+        status=EmailOutbox.Status.PENDING, attempts=0, next_attempt_at=timezone.now()
+    )
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from core.images import delete_renditions, generate_renditions, has_renditions, recompress_original
+from core.signals import RESPONSIVE_IMAGE_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera renditions responsivas (WebP + JPEG) para as imagens já existentes em media/ "
+        "e recomprime (sem EXIF) os originais que ainda não tinham passado pelo upload optimizado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenera mesmo quando as renditions já existem.",
+        )
+
+    def handle(self, *args, **options):
+        total_files = 0
+        for model, field in RESPONSIVE_IMAGE_FIELDS.items():
+            label = model._meta.label
+            done = recompressed = 0
+            qs = model.objects.exclude(**{field: ""}).only("pk", field)
+            for obj in qs.iterator(chunk_size=200):
+                fieldfile = getattr(obj, field)
+                if not options["force"] and has_renditions(fieldfile.name, fieldfile.storage):
+                    continue
+
+                # o original primeiro: as renditions saem já da versão recomprimida
+                old_name = fieldfile.name
+                saved = recompress_original(fieldfile)
+                if saved is not None:
+                    recompressed += 1
+                    if saved != old_name:
+                        # o storage não reutilizou o nome: grava o novo (os signals
+                        # actualizam cards e renditions como num upload)
+                        delete_renditions(old_name, fieldfile.storage)
+                        fieldfile.name = saved
+                        obj.save(update_fields=[field])
+
+                written = generate_renditions(fieldfile, overwrite=options["force"])
+                if written:
+                    done += 1
+                    total_files += written
+            self.stdout.write(f"{label}: {done} imagens processadas, {recompressed} originais recomprimidos")
+
+        self.stdout.write(self.style.SUCCESS(f"{total_files} ficheiros escritos."))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import mail
+
+
+class Command(BaseCommand):
+    help = (
+        "Entrega os emails do outbox em lotes, por uma ligação SMTP persistente, com "
+        "retry/backoff e dead-letter. Correr como serviço (ou com --once no cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=mail.BATCH_SIZE)
+        parser.add_argument("--idle-sleep", type=float, default=5.0,
+                            help="Segundos de espera quando não há emails vencidos.")
+        parser.add_argument("--once", action="store_true",
+                            help="Esvazia o que estiver vencido e sai.")
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        try:
+            while True:
+                close_old_connections()
+                rows = mail.claim_batch(options["batch_size"])
+                if rows:
+                    sent, retried, dead = mail.deliver(rows, connection)
+                    self.stdout.write(f"{sent} enviados, {retried} a repetir, {dead} dead")
+                    continue
+
+                # sem trabalho: não deixar a sessão SMTP pendurada (o servidor corta-a)
+                connection.close()
+                if options["once"]:
+                    return
+                time.sleep(options["idle_sleep"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
@@ -24,4 +24,52 @@ class NewsletterSubscriber(models.Model):
     unsubscribed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+class EmailOutbox(models.Model):
+    """
+    Emails transacionais por enviar. Escritos na mesma transação que os dados
+    que os originam (ex: a encomenda) e entregues por `manage.py run_mail_worker`.
+    """
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        SENT = "sent", "Sent"
+        DEAD = "dead", "Dead"
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list)
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("next_attempt_at", "id")
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
+
+
+class HomeSlot(models.Model):
+    """
+    Conteúdo da homepage já resolvido (produto em destaque, próximo evento),
+    recalculado quando muda o conteúdo de origem (ver core/home.py).
+    """
+    name = models.CharField(max_length=40, unique=True)
+    payload = models.JSONField(null=True, blank=True)
+    # próximo evento: deixa de ser o próximo quando começa
+    valid_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
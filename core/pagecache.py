@@ -0,0 +1,24 @@
+"""
+Respostas de página inteira guardadas na cache para visitantes anónimos
+(`core.conditional.is_shared_view`). Usado pela cache do catálogo
+(shop/cache.py) e pela homepage (core/views.py).
+
+O HTML guardado não tem nada do visitante: só páginas partilhadas vão para a
+cache. O token CSRF dos formulários é trocado pelo do pedido actual quando a
+página sai da cache.
+"""
+from __future__ import annotations
+
+import re
+
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+_CSRF_INPUT_RE = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def cached_page_response(request, content: bytes) -> HttpResponse:
+    if _CSRF_INPUT_RE.search(content):
+        token = get_token(request).encode("ascii")
+        content = _CSRF_INPUT_RE.sub(rb"\g<1>" + token + rb"\g<2>", content)
+    return HttpResponse(content)
@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from campaigns.models import Campaign
+from events.models import Event
+from shop.models import Product, ProductImage
+
+from .home import HERO_PRODUCT, NEXT_EVENT, refresh_slots
+from .images import delete_renditions, generate_renditions, optimize_upload
+
+# Modelo -> campo de imagem que recebe renditions responsivas.
+RESPONSIVE_IMAGE_FIELDS = {
+    ProductImage: "image",
+    Event: "poster",
+    Campaign: "cover_image",
+}
+
+
+def _optimize_original(sender, instance, **kwargs):
+    optimize_upload(getattr(instance, RESPONSIVE_IMAGE_FIELDS[sender]))
+
+
+def _build_renditions(sender, instance, **kwargs):
+    generate_renditions(getattr(instance, RESPONSIVE_IMAGE_FIELDS[sender]))
+
+
+def _drop_renditions(sender, instance, **kwargs):
+    fieldfile = getattr(instance, RESPONSIVE_IMAGE_FIELDS[sender])
+    if fieldfile and fieldfile.name:
+        delete_renditions(fieldfile.name, fieldfile.storage)
+
+
+for _model in RESPONSIVE_IMAGE_FIELDS:
+    pre_save.connect(_optimize_original, sender=_model, dispatch_uid=f"optimize_{_model.__name__}")
+    post_save.connect(_build_renditions, sender=_model, dispatch_uid=f"renditions_{_model.__name__}")
+    post_delete.connect(_drop_renditions, sender=_model, dispatch_uid=f"drop_renditions_{_model.__name__}")
+
+
+# Slots da homepage (core/home.py): recalculados depois do commit.
+HOME_SLOT_SOURCES = {
+    Product: HERO_PRODUCT,
+    ProductImage: HERO_PRODUCT,
+    Event: NEXT_EVENT,
+}
+
+
+def _refresh_home_slot(sender, **kwargs):
+    slot = HOME_SLOT_SOURCES[sender]
+    transaction.on_commit(lambda: refresh_slots(slot))
+
+
+for _model in HOME_SLOT_SOURCES:
+    post_save.connect(_refresh_home_slot, sender=_model, dispatch_uid=f"home_slot_{_model.__name__}")
+    post_delete.connect(_refresh_home_slot, sender=_model, dispatch_uid=f"home_slot_delete_{_model.__name__}")
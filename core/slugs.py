@@ -0,0 +1,99 @@
+"""
+Alocação de slugs únicos com uma query por nome base.
+
+Em vez de testar `base`, `base-2`, `base-3`... um a um, lê de uma vez todos
+os slugs do intervalo `base` / `base-*` (range query no índice único do slug)
+e escolhe o primeiro livre.
+"""
+from __future__ import annotations
+
+import re
+
+from django.db.models import Q
+from django.utils.text import slugify
+
+BASE_MAX_LENGTH = 200
+
+
+def slug_base(text: str, fallback: str) -> str:
+    return slugify(text)[:BASE_MAX_LENGTH] or fallback
+
+
+def _family_q(base: str) -> Q:
+    # "-" (0x2d) é seguido de "." (0x2e): o intervalo apanha todos os "base-..."
+    return Q(slug=base) | Q(slug__gt=f"{base}-", slug__lt=f"{base}.")
+
+
+def taken_numbers(queryset, base: str) -> set[int]:
+    """Números já usados: 1 para `base`, n para `base-n`."""
+    pattern = re.compile(rf"^{re.escape(base)}(?:-(\d+))?$")
+    taken = set()
+    for slug in queryset.filter(_family_q(base)).values_list("slug", flat=True):
+        m = pattern.match(slug)
+        if m:
+            taken.add(int(m.group(1)) if m.group(1) else 1)
+    return taken
+
+
+def _first_free(taken: set[int]) -> int:
+    if 1 not in taken:
+        return 1
+    n = 2
+    while n in taken:
+        n += 1
+    return n
+
+
+def _format(base: str, n: int) -> str:
+    return base if n == 1 else f"{base}-{n}"
+
+
+def unique_slug(model, text: str, fallback: str, exclude_pk=None) -> str:
+    base = slug_base(text, fallback)
+    qs = model._default_manager.all()
+    if exclude_pk is not None:
+        qs = qs.exclude(pk=exclude_pk)
+    return _format(base, _first_free(taken_numbers(qs, base)))
+
+
+class SlugAllocator:
+    """
+    Aloca slugs para muitos objectos do mesmo modelo (importações em massa).
+    Faz uma query por nome base e lembra-se do que já atribuiu.
+    """
+
+    def __init__(self, model, fallback: str):
+        self.model = model
+        self.fallback = fallback
+        self._taken: dict[str, set[int]] = {}
+        # slugs exactos já entregues: "tee-2" pode vir da família "tee" ou ser o base de "Tee 2"
+        self._used: set[str] = set()
+
+    def reserve(self, slug: str) -> bool:
+        """
+        Marca um slug explícito como usado. Devolve False se já tinha sido
+        reservado ou alocado por este allocator.
+        """
+        if slug in self._used:
+            return False
+        m = re.match(r"^(.*?)(?:-(\d+))?$", slug)
+        base, n = m.group(1), int(m.group(2)) if m.group(2) else 1
+        self._numbers(base).add(n)
+        self._used.add(slug)
+        return True
+
+    def allocate(self, text: str) -> str:
+        base = slug_base(text, self.fallback)
+        taken = self._numbers(base)
+        while True:
+            n = _first_free(taken)
+            taken.add(n)
+            slug = _format(base, n)
+            if slug not in self._used:
+                self._used.add(slug)
+                return slug
+
+    def _numbers(self, base: str) -> set[int]:
+        if base not in self._taken:
+            self._taken[base] = taken_numbers(self.model._default_manager.all(), base)
+        return self._taken[base]
@@ -0,0 +1,50 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from core.images import rendition_name, rendition_srcset, rendition_widths
+
+register = template.Library()
+
+DEFAULT_SIZES = "(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw"
+
+
+@register.simple_tag
+def responsive_image(image, alt="", css_class="", sizes=DEFAULT_SIZES, loading="lazy", **attrs):
+    """
+    <picture> com srcset WebP + JPEG para um ImageField (ou o nome no storage).
+    Sem renditions geradas, cai para um <img> simples com o original.
+
+    Uso:
+        {% load responsive_images %}
+        {% responsive_image e.poster alt=e.title css_class="w-full h-full object-cover" %}
+    """
+    if not image:
+        return ""
+
+    if isinstance(image, str):
+        name, storage = image, default_storage
+    else:
+        name, storage = image.name, image.storage
+
+    extra = flatatt({k.replace("_", "-"): v for k, v in attrs.items()})
+
+    widths = rendition_widths(name, storage)
+    if not widths:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}"{}>',
+            storage.url(name), alt, css_class, loading, extra,
+        )
+
+    # src para browsers sem srcset: a largura intermédia (ou a única)
+    fallback = storage.url(rendition_name(name, widths[min(1, len(widths) - 1)], "jpeg"))
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}" decoding="async"{}>'
+        '</picture>',
+        rendition_srcset(name, "webp", widths, storage), sizes,
+        fallback, rendition_srcset(name, "jpeg", widths, storage), sizes,
+        alt, css_class, loading, extra,
+    )
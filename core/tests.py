@@ -1,3 +1,227 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import smtplib
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail as django_mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from core import mail
+from core.home import HERO_PRODUCT, SLOTS_CACHE_KEY, home_slots, refresh_slots
+from core.images import (
+    delete_renditions, generate_renditions, recompress_original, rendition_name, rendition_widths,
+)
+from core.models import EmailOutbox
+from core.templatetags.responsive_images import responsive_image
+from events.tests import LOCMEM, make_event
+from shop.models import Product
+
+
+@override_settings(CACHES=LOCMEM)
+class RenditionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.storage = FileSystemStorage(location=self.root, base_url="/media/")
+
+    def _upload(self, width, height=400):
+        buf = BytesIO()
+        Image.new("RGB", (width, height), "red").save(buf, "JPEG")
+        name = self.storage.save("produtos/foto.jpg", ContentFile(buf.getvalue()))
+        return SimpleNamespace(name=name, storage=self.storage)
+
+    def test_narrow_image_is_not_upscaled_or_duplicated(self):
+        f = self._upload(700)
+        generate_renditions(f)
+
+        self.assertEqual(rendition_widths(f.name, self.storage), (480, 700))
+        self.assertFalse(self.storage.exists(rendition_name(f.name, 960, "jpeg")))
+        with self.storage.open(rendition_name(f.name, 700, "webp")) as fh:
+            self.assertEqual(Image.open(fh).width, 700)
+
+        html = responsive_image(f, alt="x")
+        self.assertIn("700w", html)
+        self.assertNotIn("1600w", html)
+
+    def test_wide_image_gets_every_width(self):
+        f = self._upload(2000)
+        generate_renditions(f)
+        self.assertEqual(rendition_widths(f.name, self.storage), (480, 960, 1600))
+
+    def test_delete_removes_files_and_manifest(self):
+        f = self._upload(700)
+        generate_renditions(f)
+        delete_renditions(f.name, self.storage)
+
+        self.assertEqual(rendition_widths(f.name, self.storage), ())
+        self.assertFalse(self.storage.exists(rendition_name(f.name, 480, "jpeg")))
+
+    def test_widths_served_from_cache(self):
+        f = self._upload(700)
+        generate_renditions(f)
+        with mock.patch.object(self.storage, "open", side_effect=AssertionError("manifesto lido")):
+            self.assertEqual(rendition_widths(f.name, self.storage), (480, 700))
+            self.assertIn("700w", responsive_image(f))
+
+    def test_recompress_original(self):
+        buf = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = "Camera"
+        Image.effect_noise((800, 600), 40).convert("RGB").save(buf, "JPEG", quality=100, exif=exif)
+        name = self.storage.save("produtos/antiga.jpg", ContentFile(buf.getvalue()))
+        f = SimpleNamespace(name=name, storage=self.storage)
+
+        self.assertEqual(recompress_original(f), name)
+        self.assertLess(self.storage.size(name), len(buf.getvalue()))
+        with self.storage.open(name) as fh:
+            self.assertNotIn("exif", Image.open(fh).info)
+        # já recomprimido: não volta a perder qualidade
+        self.assertIsNone(recompress_original(f))
+
+
+@override_settings(CACHES=LOCMEM)
+class HomePageTests(TransactionTestCase):
+    # os slots são publicados depois do commit: fora de TestCase
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name="Hero Tee", price=Decimal("1500"), is_featured=True)
+        self.event = make_event("next", timezone.now() + timedelta(days=1), title="Next Night")
+
+    def test_anonymous_page_served_from_cache(self):
+        first = self.client.get("/")
+        self.assertContains(first, "Hero Tee")
+        self.assertContains(first, "Next Night")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/").content, first.content)
+
+    def test_cached_page_has_no_user_parts(self):
+        self.client.get("/")
+        user = get_user_model().objects.create_user("home-user", password="x")
+        self.client.force_login(user)
+        self.client.get("/")
+        self.client.logout()
+        self.assertNotContains(self.client.get("/"), "home-user")
+
+    def test_product_write_invalidates_page(self):
+        self.client.get("/")
+        self.product.name = "Hero Tee renamed"
+        self.product.save()
+        self.assertContains(self.client.get("/"), "Hero Tee renamed")
+
+    def test_next_event_slot_moves_when_event_starts(self):
+        make_event("later", timezone.now() + timedelta(days=2), title="Later Night")
+        self.assertContains(self.client.get("/"), "Next Night")
+        with mock.patch("django.utils.timezone.now", return_value=self.event.start_at + timedelta(minutes=1)):
+            self.assertContains(self.client.get("/"), "Later Night")
+
+    def test_rolled_back_slots_are_not_published(self):
+        before = home_slots()
+        with transaction.atomic():
+            Product.objects.filter(pk=self.product.pk).update(name="Phantom Tee")
+            refresh_slots(HERO_PRODUCT)
+            transaction.set_rollback(True)
+        self.assertEqual(cache.get(SLOTS_CACHE_KEY), before)
+
+    def test_import_dry_run_leaves_cache_alone(self):
+        before = home_slots()
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), "catalogue.jsonl")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(json.dumps({"ref": "dry", "name": "Dry Tee", "price": "900", "is_featured": True,
+                                 "variants": [{"size": "M", "stock_qty": 3}]}) + "\n")
+        call_command("import_catalogue", path, "--dry-run", stdout=StringIO())
+
+        self.assertEqual(cache.get(SLOTS_CACHE_KEY), before)
+        self.assertNotContains(self.client.get("/"), "Dry Tee")
+
+
+class FlakyBackend(LocmemBackend):
+    """locmem que corta a ligação a cada 3.º envio, recusa @bounce e nunca entrega @down."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sends = 0
+
+    def send_messages(self, messages):
+        self.sends += 1
+        recipients = messages[0].to
+        if any(r.endswith("@bounce.test") for r in recipients):
+            raise smtplib.SMTPRecipientsRefused({r: (550, b"No such user") for r in recipients})
+        if any(r.endswith("@down.test") for r in recipients) or self.sends % 3 == 0:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class MailOutboxTests(TestCase):
+    def _enqueue(self, n, domain="example.com"):
+        for i in range(n):
+            mail.enqueue(f"Encomenda #{i}", "Obrigado.", [f"cliente{i}@{domain}"], html_body="<p>Obrigado.</p>")
+
+    def test_enqueue_does_not_send(self):
+        self._enqueue(2)
+        self.assertEqual(len(django_mail.outbox), 0)
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.Status.PENDING).count(), 2)
+
+    def test_worker_delivers_in_batches_on_one_connection(self):
+        self._enqueue(5)
+        connection = get_connection()
+        while rows := mail.claim_batch(batch_size=2):
+            mail.deliver(rows, connection)
+
+        self.assertEqual(len(django_mail.outbox), 5)
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.Status.SENT).count(), 5)
+
+    def test_sent_rows_survive_a_crash_mid_batch(self):
+        self._enqueue(4)
+        backend = LocmemBackend()
+        sends = iter([True, True, SystemExit])
+
+        def send_messages(messages):
+            outcome = next(sends)
+            if outcome is SystemExit:
+                raise SystemExit("worker morto")
+            return LocmemBackend.send_messages(backend, messages)
+
+        with mock.patch.object(backend, "send_messages", side_effect=send_messages), self.assertRaises(SystemExit):
+            mail.deliver(mail.claim_batch(), backend)
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.Status.SENT).count(), 2)
+
+    def test_retries_then_dead_letter(self):
+        self._enqueue(30)
+        self._enqueue(3, domain="bounce.test")
+        self._enqueue(2, domain="down.test")
+
+        backend = FlakyBackend()
+        now = timezone.now()
+        for _ in range(mail.MAX_ATTEMPTS + 1):
+            # avança o relógio para lá de qualquer backoff
+            now += timedelta(seconds=mail.BACKOFF_MAX * 2)
+            while rows := mail.claim_batch(now=now):
+                mail.deliver(rows, backend)
+
+        by_status = dict(EmailOutbox.objects.values_list("status").annotate(n=Count("id")).order_by())
+        self.assertEqual(by_status, {EmailOutbox.Status.SENT: 30, EmailOutbox.Status.DEAD: 5})
+        # recusado pelo servidor: dead logo à primeira; ligação em baixo: esgota as tentativas
+        self.assertEqual(
+            sorted(EmailOutbox.objects.filter(status=EmailOutbox.Status.DEAD).values_list("attempts", flat=True)),
+            [1, 1, 1, mail.MAX_ATTEMPTS, mail.MAX_ATTEMPTS],
+        )
@@ -8,5 +8,6 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('universo/', views.about, name='universo'),
     path('contacto/', views.contact, name='contacto'),
+    path('painel/vendas/', views.sales_dashboard, name='sales_dashboard'),
 
 ]
\ No newline at end of file
@@ -1,30 +1,35 @@
+from datetime import date, timedelta
+
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render
-from shop.models import OrderItem, Cart
-from events.models import Event
-from django.db.models import Sum
+from django.core.cache import cache
 from django.utils import timezone
+from shop.rollups import sales_report
 
+from .conditional import is_shared_view
+from .home import home_slots, slot_context, timeout_until
+from .pagecache import cached_page_response
 
-def index(request):
-    from shop.models import Product
-
-    top_product = Product.objects.filter(is_featured=True).first()
-
-    now = timezone.now()
+DASHBOARD_RANGES = (7, 30, 90, 365)
 
-    evento_mais_proximo = (
-        Event.objects
-        .filter(start_at__gte=now)
-        .order_by("start_at")
-        .first()
-    )
 
-    ctx = {
-        'top_product': top_product,
-        'e': evento_mais_proximo,
-    }
+def index(request):
+    """
+    Homepage a partir dos slots pré-calculados (core/home.py). Para visitantes
+    anónimos a página inteira vem da cache, com a versão dos slots na chave.
+    """
+    entry = home_slots()
+    shared = request.method == "GET" and is_shared_view(request)
+    key = f"home:page:{entry['version']}"
+    if shared:
+        content = cache.get(key)
+        if content is not None:
+            return cached_page_response(request, content)
 
-    return render(request, 'core/index.html', context=ctx)
+    response = render(request, 'core/index.html', context=slot_context(entry))
+    if shared and response.status_code == 200:
+        cache.set(key, response.content, timeout_until(entry["valid_until"], timezone.now()))
+    return response
 
 
 def about(request):
@@ -34,4 +39,41 @@ def about(request):
 
 def contact(request):
 
-    return render(request, 'core/contacto.html')
\ No newline at end of file
+    return render(request, 'core/contacto.html')
+
+
+def _report_range(request) -> tuple[date, date, int | None]:
+    today = timezone.localdate()
+    try:
+        start = date.fromisoformat(request.GET["de"])
+        end = date.fromisoformat(request.GET.get("ate") or today.isoformat())
+        if start <= end:
+            return start, end, None
+    except (KeyError, ValueError):
+        pass
+    try:
+        days = int(request.GET.get("dias", 30))
+    except ValueError:
+        days = 30
+    if days not in DASHBOARD_RANGES:
+        days = 30
+    return today - timedelta(days=days - 1), today, days
+
+
+@staff_member_required
+def sales_dashboard(request):
+    """Dashboard de vendas para staff; lê só os rollups diários (shop/rollups.py)."""
+    start, end, days = _report_range(request)
+    report = sales_report(start, end)
+    peak = max((d["revenue"] for d in report["days"]), default=0) or 1
+    for d in report["days"]:
+        d["height"] = round(d["revenue"] / peak * 100)
+
+    ctx = {
+        "report": report,
+        "start": start,
+        "end": end,
+        "days": days,
+        "ranges": DASHBOARD_RANGES,
+    }
+    return render(request, "core/sales_dashboard.html", context=ctx)
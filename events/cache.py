@@ -0,0 +1,101 @@
+"""
+Cache das listagens que dividem eventos em próximos/passados por
+`timezone.now()` (agenda, sidebars do detalhe, próximo evento da homepage).
+
+Um TTL fixo servia a lista errada logo que um evento começasse. Aqui as chaves
+levam:
+- a versão do namespace, incrementada em cada escrita de Event (signals);
+- a fronteira: o próximo start_at ainda por vir, o instante em que a divisão
+  muda sem ninguém escrever.
+
+A fronteira fica ela própria na cache (uma query quando muda ou quando há
+escritas). Enquanto `now <= fronteira` as chaves são as mesmas e as listagens
+saem da cache; quando o evento começa a fronteira avança, as chaves mudam e a
+próxima leitura recalcula. As entradas antigas ficam inalcançáveis e expiram
+sozinhas (timeout = tempo até à fronteira).
+
+Dentro de uma transacção por fechar lê-se da cache mas não se escreve: o que
+se calculasse aí podia ser desfeito por um rollback e ficava em cache como se
+estivesse gravado.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Event
+
+VERSION_KEY = "events:v"
+# sem eventos futuros não há fronteira: só as escritas invalidam
+MAX_TIMEOUT = 60 * 60 * 24
+_NO_BOUNDARY = "none"
+
+
+def _initial_version() -> int:
+    # como em shop/cache.py: se o contador for despejado não repete versões
+    return int(time.time() * 1000)
+
+
+def events_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = _initial_version()
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def bump_events_cache() -> None:
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _initial_version(), timeout=None)
+
+
+def _can_store() -> bool:
+    return not connection.in_atomic_block
+
+
+def next_boundary(version: int, now):
+    """Próximo start_at >= now (None se não houver eventos futuros), da cache."""
+    key = f"events:boundary:{version}"
+    boundary = cache.get(key)
+    if boundary is not None and (boundary == _NO_BOUNDARY or boundary >= now):
+        return None if boundary == _NO_BOUNDARY else boundary
+
+    boundary = Event.objects.filter(start_at__gte=now).aggregate(next=Min("start_at"))["next"]
+    if _can_store():
+        cache.set(key, boundary or _NO_BOUNDARY, _timeout(boundary, now))
+    return boundary
+
+
+def _timeout(boundary, now) -> int:
+    if boundary is None:
+        return MAX_TIMEOUT
+    return max(1, min(MAX_TIMEOUT, int((boundary - now).total_seconds()) + 1))
+
+
+def cached_listing(name: str, parts, compute, now=None):
+    """
+    `compute(now)` em cache até à próxima escrita de Event ou à próxima
+    fronteira. `parts` distinguem variantes (filtros, cursor...).
+    """
+    now = now or timezone.now()
+    version = events_version()
+    boundary = next_boundary(version, now)
+    raw = "|".join(str(p) for p in parts)
+    digest = hashlib.md5(raw.encode("utf-8")).hexdigest()
+    key = f"events:{name}:{version}:{boundary.isoformat() if boundary else _NO_BOUNDARY}:{digest}"
+
+    # num tuplo, para um resultado None (ex: nenhum evento) também ficar em cache
+    hit = cache.get(key)
+    if hit is None:
+        hit = (compute(now),)
+        if _can_store():
+            cache.set(key, hit, _timeout(boundary, now))
+    return hit[0]
@@ -0,0 +1,95 @@
+"""
+Facetas de cidade da agenda: nº de eventos próximos e passados por cidade.
+
+Ficam na cache numa só entrada (`city_facets()`), com a data em que deixam de
+ser válidas sem ninguém mexer nos eventos: o próximo start_at ainda por vir,
+quando um evento passa de "próximo" a "passado". Até lá a agenda lê-as sem
+queries.
+
+Os signals de Event (events/signals.py) refrescam só as cidades afectadas
+(a anterior e a nova), com uma query agrupada depois do commit, e corrigem a
+entrada na cache. Se a entrada não existir não há nada a corrigir: a próxima
+leitura reconstrói tudo.
+
+Como em events/cache.py, nada é escrito na cache dentro de uma transacção por
+fechar.
+"""
+from __future__ import annotations
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import Event
+
+CACHE_KEY = "events:city_facets"
+# limite para qualquer desvio (escritas concorrentes na cache, bulk sem signals)
+CACHE_TIMEOUT = 60 * 60
+
+
+def _counts(cities=None, now=None) -> tuple[dict[str, list[int]], object]:
+    """({cidade: [próximos, passados]}, próximo start_at por vir) numa query agrupada."""
+    now = now or timezone.now()
+    events = Event.objects.exclude(city="")
+    if cities is not None:
+        events = events.filter(city__in=cities)
+    rows = (
+        events.values("city")
+        .annotate(
+            upcoming=Count("id", filter=Q(start_at__gte=now)),
+            past=Count("id", filter=Q(start_at__lt=now)),
+            next_start=Min("start_at", filter=Q(start_at__gte=now)),
+        )
+        .order_by()
+    )
+    counts, boundary = {}, None
+    for row in rows:
+        counts[row["city"]] = [row["upcoming"], row["past"]]
+        if row["next_start"] is not None and (boundary is None or row["next_start"] < boundary):
+            boundary = row["next_start"]
+    return counts, boundary
+
+
+def rebuild_city_facets() -> dict:
+    counts, boundary = _counts()
+    entry = {"counts": counts, "valid_until": boundary}
+    if not connection.in_atomic_block:
+        cache.set(CACHE_KEY, entry, CACHE_TIMEOUT)
+    return entry
+
+
+def city_facets() -> list[dict]:
+    """[{city, upcoming, past}] por ordem alfabética, da cache sempre que possível."""
+    entry = cache.get(CACHE_KEY)
+    if entry is None or (entry["valid_until"] is not None and entry["valid_until"] <= timezone.now()):
+        entry = rebuild_city_facets()
+    return [
+        {"city": city, "upcoming": upcoming, "past": past}
+        for city, (upcoming, past) in sorted(entry["counts"].items())
+    ]
+
+
+def refresh_cities(cities) -> None:
+    """Recalcula as `cities` indicadas e corrige-as na entrada em cache."""
+    cities = {c for c in cities if c}
+    entry = cache.get(CACHE_KEY)
+    if not cities or entry is None or connection.in_atomic_block:
+        return
+
+    now = timezone.now()
+    if entry["valid_until"] is not None and entry["valid_until"] <= now:
+        rebuild_city_facets()
+        return
+
+    counts, boundary = _counts(cities, now)
+    for city in cities:
+        if counts.get(city, [0, 0]) == [0, 0]:
+            entry["counts"].pop(city, None)
+        else:
+            entry["counts"][city] = counts[city]
+    # o próximo evento pode ter mudado de data: a fronteira só pode antecipar-se
+    # (se se afastou, a entrada expira mais cedo e é reconstruída, sem erro)
+    if boundary is not None and (entry["valid_until"] is None or boundary < entry["valid_until"]):
+        entry["valid_until"] = boundary
+    cache.set(CACHE_KEY, entry, CACHE_TIMEOUT)
@@ -0,0 +1,92 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from core.bench import scratch_database
+from events.models import Event
+from events.search import fts_available, matching_ids, rebuild_index
+
+WORDS = (
+    "afro rave house amapiano kuduro marrabenta jazz noite festa sunset rooftop "
+    "live session dj set vinil baile praia cultura arte dança beat groove"
+).split()
+CITIES = ("Maputo", "Matola", "Beira", "Nampula", "Inhambane", "Xai-Xai")
+QUERIES = ("amapiano sunset", "rooftop maputo", "marrabenta", "kudu", "dança vinil", "zzzz")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a pesquisa da agenda com icontains vs FTS5 (MATCH sem limite). "
+        "Os eventos de teste são criados numa base SQLite descartável (core/bench.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=50_000)
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def _seed(self, n):
+        rnd = random.Random(42)
+        now = timezone.now()
+        # vocabulário de enchimento para o texto longo não ser só palavras-chave
+        syllables = ("ka", "lu", "mo", "ze", "ti", "ra", "no", "vi", "sa", "pe")
+        filler = ["".join(rnd.choice(syllables) for _ in range(3)) for _ in range(5000)]
+        events = []
+        for i in range(n):
+            words = rnd.sample(WORDS, 4)
+            events.append(Event(
+                title=f"{' '.join(words[:2]).title()} {i}",
+                slug=f"bench-event-{i}",
+                poster="events/posters/bench.jpg",
+                description=" ".join(
+                    rnd.choice(WORDS) if rnd.random() < 0.01 else rnd.choice(filler)
+                    for _ in range(120)
+                ),
+                lineup_text="\n".join(f"DJ {rnd.choice(WORDS).title()}" for _ in range(6)),
+                city=rnd.choice(CITIES),
+                start_at=now - timedelta(days=rnd.randint(1, 3650)),
+            ))
+        Event.objects.bulk_create(events, batch_size=1000)
+        rebuild_index()
+
+    def _time(self, fn, repeat):
+        timings = []
+        for _ in range(repeat):
+            for q in QUERIES:
+                start = time.perf_counter()
+                fn(q)
+                timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), max(timings)
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError("FTS5 só está disponível em SQLite.")
+
+        # o mesmo trabalho que a view faz: todos os resultados, ordenados por data
+        def icontains(q):
+            return list(
+                Event.objects.filter(
+                    Q(title__icontains=q) |
+                    Q(city__icontains=q) |
+                    Q(description__icontains=q) |
+                    Q(lineup_text__icontains=q)
+                ).order_by("-start_at").values_list("pk", flat=True)
+            )
+
+        def fts(q):
+            return list(
+                Event.objects.filter(pk__in=matching_ids(q))
+                .order_by("-start_at").values_list("pk", flat=True)
+            )
+
+        with scratch_database():
+            self.stdout.write(f"A criar {options['events']} eventos de teste...")
+            self._seed(options["events"])
+
+            for label, fn in (("icontains", icontains), ("FTS5 MATCH", fts)):
+                median, worst = self._time(fn, options["repeat"])
+                self.stdout.write(f"{label:<12} mediana={median:.2f}ms pior={worst:.2f}ms")
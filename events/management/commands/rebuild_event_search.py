@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from events.search import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice FTS5 da pesquisa de eventos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write(self.style.WARNING("FTS5 só está disponível em SQLite; nada a fazer."))
+            return
+        total = rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{total} eventos indexados."))
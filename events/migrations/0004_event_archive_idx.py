@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-18 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='events_even_start_a_6b7821_idx',
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['-start_at', '-id'], name='event_archive_idx'),
+        ),
+    ]
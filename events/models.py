@@ -1,6 +1,7 @@
 from django.db import models
 from django.utils import timezone
-from django.utils.text import slugify
+
+from core.slugs import unique_slug
 
 
 class Event(models.Model):
@@ -25,11 +26,14 @@ class Event(models.Model):
     is_featured = models.BooleanField(default=False, db_index=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # também actualizado quando muda o EventMedia (ver events/signals.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ("-start_at",)
         indexes = [
-            models.Index(fields=["-start_at"]),
+            # arquivo da agenda: keyset em (start_at, id)
+            models.Index(fields=["-start_at", "-id"], name="event_archive_idx"),
             models.Index(fields=["is_featured", "-start_at"]),
         ]
 
@@ -38,13 +42,7 @@ class Event(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            base = slugify(self.title)[:200] or "event"
-            candidate = base
-            i = 2
-            while Event.objects.filter(slug=candidate).exclude(pk=self.pk).exists():
-                candidate = f"{base}-{i}"
-                i += 1
-            self.slug = candidate
+            self.slug = unique_slug(Event, self.title, "event", exclude_pk=self.pk)
         super().save(*args, **kwargs)
 
     @property
@@ -0,0 +1,139 @@
+"""
+Pesquisa de eventos com SQLite FTS5.
+
+A tabela virtual `events_event_fts` espelha title, city, description e
+lineup_text (rowid = Event.id). É mantida pelos signals de Event (ver
+events/signals.py) e reconstruída com `manage.py rebuild_event_search`.
+Noutras bases de dados as funções devolvem None e a view cai para icontains.
+"""
+from __future__ import annotations
+
+import re
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "events_event_fts"
+FTS_COLUMNS = ("title", "city", "description", "lineup_text")
+
+# Pesos bm25 por coluna (título e cidade contam mais do que o texto longo).
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+
+MAX_RESULTS = 500
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_INSERT_SQL = (
+    f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+    f"VALUES (%s, %s, %s, %s, %s)"
+)
+
+
+def fts_available() -> bool:
+    return connection.vendor == "sqlite"
+
+
+def build_match_query(q: str) -> str:
+    """
+    Converte texto livre numa expressão MATCH segura: cada palavra entre aspas
+    com prefixo (*), todas obrigatórias. Devolve "" se não houver palavras.
+    """
+    tokens = _TOKEN_RE.findall(q or "")
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def index_event(event) -> None:
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [event.pk])
+        cursor.execute(
+            _INSERT_SQL,
+            [event.pk] + [getattr(event, col) or "" for col in FTS_COLUMNS],
+        )
+
+
+def unindex_event(pk: int) -> None:
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+
+def search_event_ids(q: str, limit: int = MAX_RESULTS):
+    """
+    IDs dos eventos que correspondem a `q`, do mais para o menos relevante (bm25),
+    cortados em `limit`. Para filtrar listagens usar matching_ids (sem limite).
+    Devolve None quando o FTS não está disponível.
+    """
+    if not fts_available():
+        return None
+
+    match = build_match_query(q)
+    if not match:
+        return []
+
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def matching_ids(q: str):
+    """
+    Subquery com os ids de todos os eventos que correspondem a `q` (sem limite),
+    para filtrar com pk__in=. Devolve None quando o FTS não está disponível.
+    """
+    if not fts_available():
+        return None
+
+    match = build_match_query(q)
+    if not match:
+        return []
+    return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+
+
+def order_by_relevance(qs, q: str, *then):
+    """
+    Ordena `qs` por bm25 (junção com a tabela FTS) e depois por `then`.
+    Só mantém as linhas que correspondem a `q`; sem FTS ordena só por `then`.
+    """
+    match = build_match_query(q)
+    if not fts_available() or not match:
+        return qs.order_by(*then)
+
+    meta = qs.model._meta
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    return qs.extra(
+        tables=[FTS_TABLE],
+        where=[f"{FTS_TABLE}.rowid = {meta.db_table}.{meta.pk.column}", f"{FTS_TABLE} MATCH %s"],
+        params=[match],
+    ).order_by(RawSQL(f"bm25({FTS_TABLE}, {weights})", []).asc(), *then)
+
+
+def rebuild_index(batch_size: int = 1000) -> int:
+    from .models import Event
+
+    if not fts_available():
+        return 0
+
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        qs = Event.objects.order_by("pk").values_list("pk", *FTS_COLUMNS)
+        batch = []
+        for row in qs.iterator(chunk_size=batch_size):
+            batch.append([row[0]] + [v or "" for v in row[1:]])
+            if len(batch) >= batch_size:
+                cursor.executemany(_INSERT_SQL, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(_INSERT_SQL, batch)
+            total += len(batch)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return total
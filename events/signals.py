@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_events_cache
+from .facets import refresh_cities
+from .models import Event, EventMedia
+from .search import index_event, unindex_event
+
+
+# -------------------------
+# Índice FTS5 (pesquisa da agenda)
+# -------------------------
+@receiver(post_save, sender=Event)
+def event_saved_index(sender, instance, **kwargs):
+    index_event(instance)
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted_unindex(sender, instance, **kwargs):
+    unindex_event(instance.pk)
+
+
+# -------------------------
+# Event.updated_at (GET condicional do detalhe)
+# -------------------------
+@receiver(post_save, sender=EventMedia)
+@receiver(post_delete, sender=EventMedia)
+def event_media_changed_touch(sender, instance, **kwargs):
+    # update() não dispara post_save do Event
+    Event.objects.filter(pk=instance.event_id).update(updated_at=timezone.now())
+
+
+# -------------------------
+# Facetas de cidade (filtro da agenda)
+# -------------------------
+@receiver(pre_save, sender=Event)
+def event_saving_remember_city(sender, instance, **kwargs):
+    # se a cidade mudar, a antiga também perde um evento
+    instance._previous_city = (
+        Event.objects.filter(pk=instance.pk).values_list("city", flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def event_changed_refresh_facets(sender, instance, **kwargs):
+    cities = {instance.city, getattr(instance, "_previous_city", None)}
+    transaction.on_commit(lambda: refresh_cities(cities))
+
+
+# -------------------------
+# Cache das listagens (events/cache.py)
+# -------------------------
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def event_changed_bump_cache(sender, **kwargs):
+    # depois do commit: antes disso outro pedido podia pôr em cache os dados antigos
+    transaction.on_commit(bump_events_cache)
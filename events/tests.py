@@ -1,3 +1,206 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import facets, search
+from .cache import cached_listing
+from .models import Event
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def make_event(slug, start_at, **kwargs):
+    return Event.objects.create(
+        title=kwargs.pop("title", slug), slug=slug, poster="events/posters/test.jpg",
+        description=kwargs.pop("description", "Teste"), city=kwargs.pop("city", "Maputo"),
+        start_at=start_at, **kwargs,
+    )
+
+
+@override_settings(CACHES=LOCMEM)
+class CachedListingTests(TransactionTestCase):
+    # fora de TestCase: a cache só guarda listagens calculadas fora de transacções
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.calls = 0
+
+    def _upcoming(self, now=None):
+        def compute(now):
+            self.calls += 1
+            return list(Event.objects.filter(start_at__gte=now).values_list("slug", flat=True))
+        return cached_listing("test", (), compute, now=now or self.now)
+
+    def test_served_from_cache_until_next_start(self):
+        make_event("soon", self.now + timedelta(hours=1))
+        self.assertEqual(self._upcoming(), ["soon"])
+        self.assertEqual(self._upcoming(), ["soon"])
+        self.assertEqual(self.calls, 1)
+
+        # o evento começou: a fronteira avança e a listagem é recalculada
+        self.assertEqual(self._upcoming(self.now + timedelta(hours=2)), [])
+        self.assertEqual(self.calls, 2)
+
+    def test_event_write_invalidates(self):
+        event = make_event("soon", self.now + timedelta(hours=1))
+        self._upcoming()
+        event.start_at = self.now - timedelta(hours=1)
+        event.save()
+        self.assertEqual(self._upcoming(), [])
+
+    def test_rolled_back_rows_are_not_cached(self):
+        with transaction.atomic():
+            make_event("phantom", self.now + timedelta(hours=1))
+            self.assertEqual(self._upcoming(), ["phantom"])
+            transaction.set_rollback(True)
+        self.assertEqual(self._upcoming(), [])
+
+
+@override_settings(CACHES=LOCMEM)
+class CityFacetsTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        for i, city in enumerate(["Maputo", "Maputo", "Beira", "Matola"]):
+            make_event(f"e{i}", self.now + timedelta(days=i - 2, hours=1), city=city)
+
+    def _cached_counts(self):
+        return cache.get(facets.CACHE_KEY)["counts"]
+
+    def test_counts(self):
+        self.assertEqual(facets.city_facets(), [
+            {"city": "Beira", "upcoming": 1, "past": 0},
+            {"city": "Maputo", "upcoming": 0, "past": 2},
+            {"city": "Matola", "upcoming": 1, "past": 0},
+        ])
+
+    def test_signals_keep_cache_equal_to_rebuild(self):
+        facets.city_facets()
+        make_event("new", self.now + timedelta(days=3), city="Nampula")
+        moved = Event.objects.get(slug="e0")
+        moved.city = "Beira"
+        moved.save()
+        Event.objects.get(slug="e3").delete()
+
+        self.assertEqual(self._cached_counts(), facets._counts()[0])
+        self.assertNotIn("Matola", self._cached_counts())
+
+    def test_agenda_reads_facets_from_cache(self):
+        def facet_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse("eventos:agenda"))
+            self.assertContains(response, "Beira (1 próximos · 0 passados)")
+            return [q for q in ctx.captured_queries if "GROUP BY" in q["sql"] and '"city"' in q["sql"]]
+
+        self.assertEqual(len(facet_queries()), 1)
+        self.assertEqual(facet_queries(), [])
+
+
+@override_settings(CACHES=LOCMEM)
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        for i in range(30):
+            # pares à mesma hora, para o desempate por id entrar no keyset
+            make_event(f"past-{i}", now - timedelta(days=40 * (i // 2) + 1), lineup_text="DJ " * 50)
+        make_event("upcoming", now + timedelta(days=1))
+
+    def _walk(self, limit):
+        slugs, params = [], {"limit": limit}
+        while True:
+            data = self.client.get(reverse("eventos:archive_api"), params).json()
+            self.assertTrue(data["success"])
+            for group in data["years"]:
+                slugs += [part.split("/", 1)[0] for part in group["html"].split("/eventos/agenda/")[1:]]
+            if not data["next"]:
+                return slugs
+            params["cursor"] = data["next"]
+
+    def test_api_pages_cover_archive_in_order(self):
+        expected = list(
+            Event.objects.filter(start_at__lt=timezone.now())
+            .order_by("-start_at", "-id").values_list("slug", flat=True)
+        )
+        self.assertEqual(self._walk(limit=4), expected)
+
+    def test_year_starts_at_newest_event_of_that_year(self):
+        oldest = Event.objects.filter(slug__startswith="past-").order_by("start_at").first()
+        year = timezone.localtime(oldest.start_at).year
+        newest = (
+            Event.objects.filter(start_at__lt=timezone.make_aware(datetime(year + 1, 1, 1)))
+            .order_by("-start_at", "-id").first()
+        )
+        group = self.client.get(reverse("eventos:archive_api"), {"year": year}).json()["years"][0]
+        self.assertEqual(group["year"], year)
+        self.assertIn(f"/eventos/agenda/{newest.slug}/", group["html"].split("</a>")[0])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("eventos:archive_api"), {"cursor": "nope"})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()["success"])
+
+    def test_agenda_does_not_read_long_text_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("eventos:agenda"))
+        self.assertFalse([q for q in ctx.captured_queries if '"lineup_text"' in q["sql"]])
+
+
+@override_settings(CACHES=LOCMEM)
+class EventSearchTests(TestCase):
+    def setUp(self):
+        if not search.fts_available():
+            self.skipTest("FTS5 só existe em SQLite")
+        now = timezone.now()
+        self.sunset = make_event("amapiano-sunset", now - timedelta(days=3), title="Amapiano Sunset",
+                                 city="Maputo", lineup_text="DJ Kuduro")
+        self.jazz = make_event("jazz-night", now + timedelta(days=3), title="Jazz Night", city="Beira",
+                               description="Noite longa com amapiano no fim")
+
+    def test_all_words_with_prefix(self):
+        self.assertEqual(search.search_event_ids("amapiano sunset"), [self.sunset.pk])
+        self.assertEqual(search.search_event_ids("kudu"), [self.sunset.pk])
+        self.assertEqual(search.search_event_ids("zzzz"), [])
+        self.assertEqual(search.search_event_ids('"*'), [])
+
+    def test_title_ranks_above_description(self):
+        self.assertEqual(search.search_event_ids("amapiano"), [self.sunset.pk, self.jazz.pk])
+
+    def test_index_follows_writes(self):
+        self.jazz.title = "Marrabenta Night"
+        self.jazz.save()
+        self.assertEqual(search.search_event_ids("marrabenta"), [self.jazz.pk])
+        self.jazz.delete()
+        self.assertEqual(search.search_event_ids("marrabenta"), [])
+
+    def test_agenda_search(self):
+        response = self.client.get(reverse("eventos:agenda"), {"q": "kudu"})
+        self.assertContains(response, "/eventos/agenda/amapiano-sunset/")
+        self.assertNotContains(response, "/eventos/agenda/jazz-night/")
+
+    def test_archive_search_keeps_every_match(self):
+        now = timezone.now()
+        n = search.MAX_RESULTS + 10
+        Event.objects.bulk_create([
+            Event(title=f"Rooftop {i}", slug=f"rooftop-{i}", poster="events/posters/test.jpg",
+                  description="Teste", city="Maputo", start_at=now - timedelta(days=i + 1))
+            for i in range(n)
+        ])
+        search.rebuild_index()
+        response = self.client.get(reverse("eventos:agenda"), {"q": "rooftop"})
+        self.assertEqual(sum(y["count"] for y in response.context["archive_years"]), n)
+        # o mais recente aparece, mesmo sem estar entre os mais relevantes
+        self.assertContains(response, "/eventos/agenda/rooftop-0/")
+
+    def test_upcoming_ordered_by_relevance(self):
+        now = timezone.now()
+        make_event("amapiano-live", now + timedelta(days=5), title="Amapiano Live")
+        response = self.client.get(reverse("eventos:agenda"), {"q": "amapiano"})
+        self.assertEqual([e.slug for e in response.context["upcoming_events"]],
+                         ["amapiano-live", "jazz-night"])
@@ -1,11 +1,12 @@
 from django.urls import path
-from .views import EventsListView,EventDetailView
+from .views import EventsListView, EventDetailView, events_archive_api
 
 app_name = "eventos"
 
 urlpatterns = [
 
     path("agenda/", EventsListView.as_view(), name="agenda"),
+    path("arquivo/", events_archive_api, name="archive_api"),
     path("agenda/<slug:slug>/", EventDetailView.as_view(), name="detail"),
 
 ]
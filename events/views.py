@@ -1,19 +1,178 @@
-from django.db.models import Q
+from datetime import datetime
+from urllib.parse import urlencode
+
+from django.db.models import Count, Q, Subquery
+from django.db.models.functions import ExtractYear
+from django.http import JsonResponse
+from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_GET
 from django.views.generic import TemplateView, DetailView
 
+from core.conditional import conditional_page
+from core.cursors import decode_cursor, encode_cursor
+
+from .cache import cached_listing
+from .facets import city_facets
 from .models import Event
+from .search import matching_ids, order_by_relevance
+
+# Colunas usadas pelos cards da agenda: description e lineup_text (os campos
+# grandes) só são lidos no detalhe.
+EVENT_CARD_FIELDS = ("id", "slug", "title", "poster", "city", "start_at")
+
+# Arquivo: keyset em (start_at, id) descendente, agrupado por ano.
+ARCHIVE_ORDERING = ("-start_at", "-id")
+ARCHIVE_PAGE_SIZE = 12
+ARCHIVE_MAX_PAGE_SIZE = 48
+
+
+def _filters(request) -> dict:
+    """
+    Filtros da agenda via querystring, partilhados pela página e pelo arquivo JSON:
+      ?q=texto  (title, city, description, lineup_text) via FTS5 + bm25
+      ?city=Maputo
+      ?featured=1
+    Só os activos.
+    """
+    values = ((name, (request.GET.get(name) or "").strip()) for name in ("q", "city", "featured"))
+    return {name: value for name, value in values if value}
+
+
+def _filter_events(filters):
+    """Queryset com os filtros da agenda aplicados (a ordem fica para quem o usa)."""
+    q = filters.get("q", "")
+    city = filters.get("city", "")
+    featured = filters.get("featured", "")
+
+    base = Event.objects.only(*EVENT_CARD_FIELDS)
+
+    # todos os eventos que correspondem (FTS5, sem limite): o arquivo é
+    # cronológico, um corte por relevância deixaria eventos de fora
+    matches = matching_ids(q) if q else None
+
+    if matches is not None:
+        base = base.filter(pk__in=matches)
+    elif q:
+        base = base.filter(
+            Q(title__icontains=q) |
+            Q(city__icontains=q) |
+            Q(description__icontains=q) |
+            Q(lineup_text__icontains=q)
+        )
+
+    if city:
+        base = base.filter(city__iexact=city)
+
+    if featured in ("1", "true", "yes", "on"):
+        base = base.filter(is_featured=True)
+
+    return base
+
+
+def _year_start(year: int):
+    return timezone.make_aware(datetime(year, 1, 1))
+
+
+def _archive_page(past, request, limit: int):
+    """
+    Uma página do arquivo a partir de ?cursor= (ou do início de ?year=).
+    Devolve (eventos, cursor seguinte ou None); None em vez da lista se o
+    cursor/ano for inválido.
+    """
+    cursor = request.GET.get("cursor")
+    year = request.GET.get("year")
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            return None, None
+        start_at, pk = position
+        past = past.filter(Q(start_at__lt=start_at) | Q(start_at=start_at, pk__lt=pk))
+    elif year:
+        try:
+            past = past.filter(start_at__lt=_year_start(int(year) + 1))
+        except (ValueError, OverflowError):
+            return None, None
+
+    events = list(past.order_by(*ARCHIVE_ORDERING)[:limit + 1])
+    has_more = len(events) > limit
+    events = events[:limit]
+    return events, encode_cursor(events[-1].start_at, events[-1].pk) if has_more else None
+
+
+def _group_by_year(events):
+    """[(ano, [eventos])] pela ordem em que vêm (start_at descendente)."""
+    groups = []
+    for event in events:
+        year = timezone.localtime(event.start_at).year
+        if not groups or groups[-1][0] != year:
+            groups.append((year, []))
+        groups[-1][1].append(event)
+    return groups
+
+
+def _archive_years(past, filters):
+    """Anos com eventos no arquivo, com contagem e link para saltar para cada um."""
+    rows = (
+        past.annotate(year=ExtractYear("start_at"))
+        .values("year")
+        .annotate(n=Count("id"))
+        .order_by("-year")
+    )
+    return [
+        {"year": row["year"], "count": row["n"], "query": urlencode({**filters, "year": row["year"]})}
+        for row in rows
+    ]
+
+
+def _listing_parts(request, filters, *extra):
+    """Partes da chave de cache de uma listagem: filtros + posição no arquivo."""
+    return (*sorted(filters.items()), request.GET.get("cursor", ""), request.GET.get("year", ""), *extra)
+
+
+def _agenda_listing(request, filters, now) -> dict:
+    base = _filter_events(filters)
+
+    # com pesquisa, os próximos vêm por relevância (bm25) e depois por data
+    upcoming = base.filter(start_at__gte=now)
+    q = filters.get("q", "")
+    upcoming = order_by_relevance(upcoming, q, "start_at") if q else upcoming.order_by("start_at")
+    # o arquivo é sempre cronológico (agrupado por ano); a pesquisa só filtra
+    past = base.filter(start_at__lt=now)
+
+    past_events, next_cursor = _archive_page(past, request, ARCHIVE_PAGE_SIZE)
+    if past_events is None:
+        past_events, next_cursor = [], None
+
+    featured_event = (
+        Event.objects.only(*EVENT_CARD_FIELDS)
+        .filter(is_featured=True, start_at__gte=now)
+        .order_by("start_at")
+        .first()
+    ) or (
+        Event.objects.only(*EVENT_CARD_FIELDS)
+        .filter(is_featured=True, start_at__lt=now)
+        .order_by("-start_at")
+        .first()
+    )
+
+    return {
+        "featured_event": featured_event,
+        "upcoming_events": list(upcoming),
+        "past_groups": _group_by_year(past_events),
+        "archive_years": _archive_years(past, filters),
+        "archive_next": next_cursor,
+    }
 
 
 class EventsListView(TemplateView):
     """
     Página de agenda:
     - Próximos eventos
-    - Eventos passados (arquivo)
-    Filtros opcionais via querystring:
-      ?q=texto  (title, city, description, lineup_text)
-      ?city=Maputo
-      ?featured=1
+    - Eventos passados (arquivo), por anos, em páginas por keyset
+      (?cursor=, ?year=; com JS as seguintes vêm de events_archive_api)
+    Filtros opcionais: ver _filters. As listagens vêm de events/cache.py.
     """
     template_name = "events/events.html"
 
@@ -21,67 +180,117 @@ class EventsListView(TemplateView):
         ctx = super().get_context_data(**kwargs)
 
         now = timezone.now()
+        filters = _filters(self.request)
+        listing = cached_listing(
+            "agenda",
+            _listing_parts(self.request, filters),
+            lambda at: _agenda_listing(self.request, filters, at),
+            now=now,
+        )
+        next_cursor = listing["archive_next"]
 
-        q = (self.request.GET.get("q") or "").strip()
-        city = (self.request.GET.get("city") or "").strip()
-        featured = (self.request.GET.get("featured") or "").strip()
+        ctx.update(
+            listing,
+            q=filters.get("q", ""),
+            city=filters.get("city", ""),
+            featured=filters.get("featured", ""),
+            archive_year=self.request.GET.get("year", ""),
+            archive_next_query=urlencode({**filters, "cursor": next_cursor}) if next_cursor else "",
+            city_facets=city_facets(),
+            now=now,
+        )
+        return ctx
 
-        base = Event.objects.all()
 
-        if q:
-            base = base.filter(
-                Q(title__icontains=q) |
-                Q(city__icontains=q) |
-                Q(description__icontains=q) |
-                Q(lineup_text__icontains=q)
-            )
+def _archive_payload(request, filters, limit, now):
+    base = _filter_events(filters)
+    events, next_cursor = _archive_page(base.filter(start_at__lt=now), request, limit)
+    if events is None:
+        return None
+    return {
+        "success": True,
+        "years": [
+            {
+                "year": year,
+                "html": render_to_string("events/_event_cards.html", {"events": group}),
+            }
+            for year, group in _group_by_year(events)
+        ],
+        "next": next_cursor,
+    }
 
-        if city:
-            base = base.filter(city__iexact=city)
 
-        if featured in ("1", "true", "yes", "on"):
-            base = base.filter(is_featured=True)
+@require_GET
+def events_archive_api(request):
+    """
+    Arquivo da agenda em JSON, para o "carregar mais".
 
-        upcoming = (
-            base.filter(start_at__gte=now)
-            .order_by("start_at")
-        )
-        past = (
-            base.filter(start_at__lt=now)
-            .order_by("-start_at")
-        )
+    ?cursor=<opaco>  continua depois do último evento devolvido
+    ?year=2023       começa no fim desse ano
+    ?q= ?city= ?featured=  os mesmos filtros da página
+    ?limit=12        tamanho da página (máx. 48)
 
-        featured_event = (
-            Event.objects.filter(is_featured=True, start_at__gte=now)
-            .order_by("start_at")
-            .first()
-        ) or (
-            Event.objects.filter(is_featured=True, start_at__lt=now)
-            .order_by("-start_at")
-            .first()
-        )
+    Cada grupo traz o HTML dos cards (o mesmo include da página) e o ano,
+    para o cliente juntar ao ano que já está aberto ou abrir um novo.
+    """
+    try:
+        limit = int(request.GET.get("limit", ARCHIVE_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return JsonResponse({"success": False, "message": "limit inválido."}, status=400)
+    limit = max(1, min(limit, ARCHIVE_MAX_PAGE_SIZE))
 
-        cities = (
-            Event.objects.exclude(city__isnull=True)
-            .exclude(city__exact="")
-            .values_list("city", flat=True)
-            .distinct()
-            .order_by("city")
-        )
+    filters = _filters(request)
+    payload = cached_listing(
+        "archive",
+        _listing_parts(request, filters, limit),
+        lambda at: _archive_payload(request, filters, limit, at),
+    )
+    if payload is None:
+        return JsonResponse({"success": False, "message": "cursor inválido."}, status=400)
+    return JsonResponse(payload)
 
-        ctx.update(
-            q=q,
-            city=city,
-            featured=featured,
-            featured_event=featured_event,
-            upcoming_events=upcoming,
-            past_events=past,
-            cities=list(cities),
-            now=now,
+
+def _event_freshness(request, slug):
+    """
+    O detalhe mostra também as sidebars de próximos/últimos eventos, por isso
+    a versão da página é: o evento mais recentemente alterado em todo o site
+    + o último início de evento já passado (a fronteira upcoming/past).
+    Tudo numa query.
+    """
+    now = timezone.now()
+    row = (
+        Event.objects.filter(slug=slug)
+        .annotate(
+            site_updated_at=Subquery(
+                Event.objects.order_by("-updated_at").values("updated_at")[:1]
+            ),
+            last_started_at=Subquery(
+                Event.objects.filter(start_at__lt=now).order_by("-start_at").values("start_at")[:1]
+            ),
         )
-        return ctx
+        .values_list("site_updated_at", "last_started_at")
+        .first()
+    )
+    if row is None:
+        return None
 
+    site_updated_at, last_started_at = row
+    last_modified = max(t for t in (site_updated_at, last_started_at) if t is not None)
+    return (("event", slug, site_updated_at.isoformat(), last_started_at), last_modified)
 
+
+SIDEBAR_SIZE = 6
+
+
+def _sidebars(now):
+    events = Event.objects.only(*EVENT_CARD_FIELDS)
+    return (
+        list(events.filter(start_at__gte=now).order_by("start_at")[:SIDEBAR_SIZE + 1]),
+        list(events.filter(start_at__lt=now).order_by("-start_at")[:SIDEBAR_SIZE + 1]),
+    )
+
+
+@method_decorator(conditional_page(_event_freshness), name="dispatch")
 class EventDetailView(DetailView):
     """
     Detalhe do evento por slug.
@@ -103,19 +312,11 @@ class EventDetailView(DetailView):
         ctx = super().get_context_data(**kwargs)
         now = timezone.now()
 
-        # Próximos eventos (sidebar)
-        related_upcoming = (
-            Event.objects.filter(start_at__gte=now)
-            .exclude(pk=self.object.pk)
-            .order_by("start_at")[:6]
-        )
-
-        # Últimos eventos (arquivo)
-        related_recent = (
-            Event.objects.filter(start_at__lt=now)
-            .exclude(pk=self.object.pk)
-            .order_by("-start_at")[:6]
-        )
+        # Próximos / últimos eventos: as mesmas listas (em cache) para todos
+        # os detalhes, com um a mais para tirar o evento actual
+        upcoming, recent = cached_listing("sidebars", (), _sidebars, now=now)
+        related_upcoming = [e for e in upcoming if e.pk != self.object.pk][:SIDEBAR_SIZE]
+        related_recent = [e for e in recent if e.pk != self.object.pk][:SIDEBAR_SIZE]
 
         ctx.update(
             now=now,
@@ -100,10 +100,44 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # BEGIN IMMEDIATE: transações que lêem e depois escrevem (checkout,
+            # reservas) esperam pelo lock em vez de falharem com
+            # "database is locked" ao promover o lock.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
 
+# Cache
+# Ficheiros partilhados entre workers do gunicorn e comandos de gestão,
+# para que os bumps de versão do catálogo cheguem a todos os processos.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / ".cache",
+        "TIMEOUT": 60 * 60 * 24,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    }
+}
+
+# Páginas de catálogo renderizadas (merch / detalhe de produto)
+CATALOGUE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Carrinho de visitantes anónimos (cookie assinado, sem linhas na BD)
+GUEST_CART_COOKIE_NAME = "guest_cart"
+
+# Reservas de stock (carrinho/checkout); expiradas são libertadas por
+# `manage.py sweep_reservations`
+STOCK_HOLD_MINUTES = 15
+
+# Números de encomenda reservados por processo de cada vez (shop/sequences.py)
+ORDER_NUMBER_BLOCK_SIZE = 20
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -5,11 +5,16 @@ from .models import (
     Product,
     ProductImage,
     ProductVariant,
+    StockReservation,
+    StockMovement,
+    StockSnapshot,
     Cart,
     CartItem,
     Order,
     OrderItem,
 )
+from .exports import streaming_export
+from .orders import transition_orders
 
 
 class ProductImageInline(admin.TabularInline):
@@ -22,7 +27,8 @@ class ProductImageInline(admin.TabularInline):
 class ProductVariantInline(admin.TabularInline):
     model = ProductVariant
     extra = 0
-    fields = ("size", "price_override", "stock_qty", "is_active")
+    fields = ("size", "price_override", "stock_qty", "reserved_qty", "is_active")
+    readonly_fields = ("reserved_qty",)
     ordering = ("size",)
 
 
@@ -46,16 +52,67 @@ class ProductAdmin(admin.ModelAdmin):
 
 @admin.register(ProductVariant)
 class ProductVariantAdmin(admin.ModelAdmin):
-    list_display = ("product", "size", "effective_price_display", "stock_qty", "is_active")
+    list_display = ("product", "size", "effective_price_display", "stock_qty", "reserved_qty", "is_active")
     list_filter = ("size", "is_active", "product")
     search_fields = ("product__name", "product__slug")
     ordering = ("product", "size")
+    # mantido por shop.reservations com UPDATEs condicionais
+    readonly_fields = ("reserved_qty",)
 
     def effective_price_display(self, obj: ProductVariant):
         return obj.effective_price()
     effective_price_display.short_description = "Effective price"
 
 
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ("variant", "user", "quantity", "expires_at", "created_at")
+    search_fields = ("variant__product__name", "user__username", "user__email")
+    ordering = ("expires_at",)
+    readonly_fields = ("user", "variant", "quantity", "expires_at", "created_at")
+
+    def has_add_permission(self, request):
+        # criar/apagar à mão desalinhava ProductVariant.reserved_qty
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "variant", "kind", "quantity", "order")
+    list_filter = ("kind",)
+    search_fields = ("variant__product__name", "order__order_number")
+    date_hierarchy = "created_at"
+    ordering = ("-created_at",)
+    raw_id_fields = ("variant", "order")
+
+    # o ledger só cresce: correcções entram como movimentos ADJUST (reconcile_stock --fix)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("taken_at", "variant", "quantity")
+    date_hierarchy = "taken_at"
+    ordering = ("-taken_at",)
+    raw_id_fields = ("variant",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
@@ -105,11 +162,18 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ("status", "created_at", "fulfillment_method")
     search_fields = ("order_number", "customer_name", "customer_email", "customer_phone", "shipping_address")
     ordering = ("-created_at",)
-    readonly_fields = ("order_number", "created_at", "subtotal_amount", "delivery_fee", "total_amount")
+    # o estado só muda pelas acções (transições condicionais + devolução de stock)
+    readonly_fields = (
+        "order_number", "status", "created_at", "subtotal_amount", "delivery_fee", "total_amount",
+        "item_count", "item_names",
+    )
+    raw_id_fields = ("user",)
+    actions = ("confirm_orders", "cancel_orders", "export_csv", "export_jsonl")
 
     fieldsets = (
         ("Identificação", {"fields": ("order_number", "created_at", "placed_at")}),
-        ("Cliente", {"fields": ("customer_name", "customer_email", "customer_phone")}),
+        ("Cliente", {"fields": ("user", "customer_name", "customer_email", "customer_phone")}),
+        ("Resumo", {"fields": ("item_count", "item_names")}),
         ("Entrega / Levantamento", {"fields": ("fulfillment_method", "shipping_address")}),
         ("Estado", {"fields": ("status",)}),
         ("Totais", {"fields": ("subtotal_amount", "delivery_fee", "total_amount")}),
@@ -117,6 +181,24 @@ class OrderAdmin(admin.ModelAdmin):
 
     inlines = (OrderItemInline,)
 
+    @admin.action(description="Confirmar encomendas pendentes")
+    def confirm_orders(self, request, queryset):
+        changed = transition_orders(queryset, "confirmed")
+        self.message_user(request, f"{changed} encomendas confirmadas.")
+
+    @admin.action(description="Cancelar encomendas pendentes (devolve o stock)")
+    def cancel_orders(self, request, queryset):
+        changed = transition_orders(queryset, "cancelled")
+        self.message_user(request, f"{changed} encomendas canceladas.")
+
+    @admin.action(description="Exportar CSV (encomendas + itens)")
+    def export_csv(self, request, queryset):
+        return streaming_export(queryset, "csv")
+
+    @admin.action(description="Exportar JSONL (encomendas + itens)")
+    def export_jsonl(self, request, queryset):
+        return streaming_export(queryset, "jsonl")
+
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
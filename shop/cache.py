@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.conditional import is_shared_view
+from core.pagecache import cached_page_response
+
+# Namespaces do catálogo. Cada um tem um contador de versão na cache; as chaves
+# das páginas incluem a versão, por isso um bump torna-as inalcançáveis sem
+# ser preciso procurar/apagar chaves (expiram sozinhas pelo TIMEOUT).
+PRODUCT_LIST = "product_list"
+PRODUCT_DETAIL = "product_detail"
+CATALOGUE_NAMESPACES = (PRODUCT_LIST, PRODUCT_DETAIL)
+
+
+def _version_key(namespace: str) -> str:
+    return f"catalogue:v:{namespace}"
+
+
+def _initial_version() -> int:
+    # Baseado no relógio: se o contador for despejado da cache, a nova versão
+    # nunca coincide com uma anterior e não ressuscita páginas antigas.
+    return int(time.time() * 1000)
+
+
+def namespace_version(namespace: str) -> int:
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        version = _initial_version()
+        if not cache.add(_version_key(namespace), version, timeout=None):
+            version = cache.get(_version_key(namespace), version)
+    return version
+
+
+def bump_namespaces(*namespaces: str) -> None:
+    for namespace in namespaces:
+        try:
+            cache.incr(_version_key(namespace))
+        except ValueError:
+            cache.set(_version_key(namespace), _initial_version(), timeout=None)
+
+
+def page_cache_key(namespace: str, *parts) -> str:
+    raw = "|".join(str(p) for p in parts)
+    digest = hashlib.md5(raw.encode("utf-8")).hexdigest()
+    return f"catalogue:{namespace}:{namespace_version(namespace)}:{digest}"
+
+
+class CataloguePageCacheMixin:
+    """
+    Cache de página inteira para visitantes anónimos, versionada por namespace.
+
+    Só GETs anónimos com resposta 200 são guardados (utilizadores autenticados
+    e visitantes com carrinho têm navbar/carrinho personalizados). O token CSRF dos formulários é
+    substituído por um token do pedido actual quando a página vem da cache.
+    """
+    cache_namespace: str = ""
+
+    def get_cache_key_parts(self):
+        return ()
+
+    def _page_cacheable(self, request) -> bool:
+        return request.method == "GET" and is_shared_view(request)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self._page_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        # setup() já correu, por isso self.kwargs / self.request estão disponíveis
+        key = page_cache_key(self.cache_namespace, *self.get_cache_key_parts())
+        content = cache.get(key)
+        if content is not None:
+            return cached_page_response(request, content)
+
+        response = super().dispatch(request, *args, **kwargs)
+
+        if response.status_code == 200 and hasattr(response, "add_post_render_callback"):
+            timeout = getattr(settings, "CATALOGUE_CACHE_TIMEOUT", 60 * 60 * 24)
+
+            def _store(rendered):
+                cache.set(key, rendered.content, timeout)
+
+            response.add_post_render_callback(_store)
+        return response
+
+
+# -------------------------
+# Resumo do carrinho (context processor)
+# -------------------------
+# Write-through: cada view que altera o carrinho grava o resumo novo.
+# A chave inclui a versão do catálogo, por isso mudanças de preço/stock
+# invalidam os resumos sem ser preciso percorrer carrinhos.
+CART_SUMMARY_TIMEOUT = 60 * 60 * 24
+
+EMPTY_CART_SUMMARY = {"count": 0, "quantity": 0, "total": "0.00"}
+
+
+def _cart_summary_key(user_id: int) -> str:
+    return f"cart:summary:{namespace_version(PRODUCT_LIST)}:{user_id}"
+
+
+def compute_cart_summary(user_id: int) -> dict:
+    from .models import Cart
+
+    totals = Cart.objects.filter(user_id=user_id).totals()
+    return {**totals, "total": str(totals["total"])}
+
+
+def refresh_cart_summary(user_id: int) -> dict:
+    summary = compute_cart_summary(user_id)
+    cache.set(_cart_summary_key(user_id), summary, CART_SUMMARY_TIMEOUT)
+    return summary
+
+
+def get_cart_summary(user_id: int) -> dict:
+    summary = cache.get(_cart_summary_key(user_id))
+    if summary is None:
+        summary = refresh_cart_summary(user_id)
+    return summary
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from django.db import transaction
+
+from .models import Product, ProductCard, ProductImage, ProductVariant
+
+
+def _card_fields(product: Product, images, variants) -> dict:
+    """
+    Calcula os campos do card a partir do produto, das imagens (ordenadas por id)
+    e das variantes activas com stock (ordenadas por tamanho).
+    """
+    main_image = images[0] if images else None
+
+    prices = [
+        v.price_override if v.price_override is not None else product.price
+        for v in variants
+    ] or [product.price]
+
+    return {
+        "name": product.name,
+        "slug": product.slug,
+        "main_image_url": main_image.image.url if main_image and main_image.image else "",
+        "main_image_name": main_image.image.name if main_image and main_image.image else "",
+        "sizes": ",".join(v.size for v in variants),
+        "min_price": min(prices),
+        "max_price": max(prices),
+        "is_active": product.is_active,
+        "is_featured": product.is_featured,
+        "created_at": product.created_at,
+    }
+
+
+def _in_stock_variants(product_ids):
+    return (
+        ProductVariant.objects.filter(
+            product_id__in=product_ids,
+            is_active=True,
+            stock_qty__gt=0,
+        )
+        .only("product_id", "size", "price_override")
+        .order_by("size")
+    )
+
+
+def refresh_product_card(product_id: int) -> None:
+    """
+    Recalcula o card de um produto. Se o produto já não existir, remove o card.
+    """
+    product = Product.objects.filter(pk=product_id).first()
+    if product is None:
+        ProductCard.objects.filter(pk=product_id).delete()
+        return
+
+    images = list(ProductImage.objects.filter(product_id=product_id).order_by("id")[:1])
+    variants = list(_in_stock_variants([product_id]))
+
+    ProductCard.objects.update_or_create(
+        product_id=product_id,
+        defaults=_card_fields(product, images, variants),
+    )
+
+
+def _build_cards(product_ids) -> list:
+    products = Product.objects.filter(pk__in=product_ids).order_by("pk")
+
+    first_image = {}
+    for img in ProductImage.objects.filter(product_id__in=product_ids).order_by("id"):
+        first_image.setdefault(img.product_id, img)
+
+    variants_by_product = {}
+    for v in _in_stock_variants(product_ids):
+        variants_by_product.setdefault(v.product_id, []).append(v)
+
+    cards = []
+    for product in products:
+        img = first_image.get(product.pk)
+        fields = _card_fields(
+            product,
+            [img] if img else [],
+            variants_by_product.get(product.pk, []),
+        )
+        cards.append(ProductCard(product=product, **fields))
+    return cards
+
+
+def refresh_product_cards(product_ids, batch_size: int = 500) -> int:
+    """
+    Recalcula os cards de vários produtos (ex: depois de um bulk_create, que
+    não dispara signals). Devolve o número de cards escritos.
+    """
+    product_ids = list(product_ids)
+    written = 0
+    with transaction.atomic():
+        for start in range(0, len(product_ids), batch_size):
+            chunk = product_ids[start:start + batch_size]
+            ProductCard.objects.filter(pk__in=chunk).delete()
+            cards = _build_cards(chunk)
+            ProductCard.objects.bulk_create(cards, batch_size=batch_size)
+            written += len(cards)
+    return written
+
+
+def rebuild_product_cards(batch_size: int = 500) -> int:
+    """
+    Reconstrói todos os cards em lotes. Devolve o número de cards escritos.
+    """
+    written = 0
+    with transaction.atomic():
+        ProductCard.objects.all().delete()
+
+        ids = list(Product.objects.order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(ids), batch_size):
+            cards = _build_cards(ids[start:start + batch_size])
+            ProductCard.objects.bulk_create(cards, batch_size=batch_size)
+            written += len(cards)
+
+    return written
@@ -1,26 +1,32 @@
-from decimal import Decimal
-from .models import Cart
+from django.utils.functional import SimpleLazyObject, lazy
+
+from . import guest_cart
+from .cache import EMPTY_CART_SUMMARY, get_cart_summary
+from .models import CartItem
 
 
 def cart_context(request):
     cart_data = {
-        "count": 0,
-        "total": "0",
+        **EMPTY_CART_SUMMARY,
         "pickup": "Triunfo, Maputo",
         "items": [],
     }
 
     if not request.user.is_authenticated:
+        # visitante: contagens vêm do cookie; total/itens só vão à BD se usados
+        items = guest_cart.load(request)
+        if items:
+            cart_data["count"] = len(items)
+            cart_data["quantity"] = sum(items.values())
+            cart_data["total"] = lazy(lambda: guest_cart.summary(items)["total"], str)()
+            cart_data["items"] = SimpleLazyObject(lambda: guest_cart.build_items(items))
         return {"cart": cart_data}
 
-    try:
-        cart = request.user.cart  # OneToOne (pode não existir)
-    except Cart.DoesNotExist:
-        return {"cart": cart_data}
-
-    items_qs = cart.items.select_related("variant__product")
-    cart_data["count"] = items_qs.count()
-    cart_data["items"] = items_qs
-    cart_data["total"] = str(cart.get_total_price())  # já tens esse método
+    # resumo vem da cache (write-through nas views do carrinho): zero queries
+    cart_data.update(get_cart_summary(request.user.id))
+    # lazy: só vai à BD se algum template iterar os itens
+    cart_data["items"] = CartItem.objects.filter(
+        cart__user_id=request.user.id
+    ).select_related("variant__product")
 
     return {"cart": cart_data}
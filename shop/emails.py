@@ -0,0 +1,35 @@
+"""
+Emails da loja. Só constroem a mensagem; o envio é do outbox (core/mail.py).
+"""
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+ORDER_FROM_EMAIL = "yuransaraiva.ys@gmail.com"
+
+
+def order_confirmation(order) -> dict:
+    """
+    Argumentos de `core.mail.enqueue` para a confirmação da encomenda.
+    Não precisa de order.pk: pode ser renderizado antes da transação.
+    """
+    context = {
+        'order': order,
+        'customer_name': order.customer_name,
+        'order_number': order.order_number,
+        'order_date': order.placed_at,
+        'subtotal': order.subtotal_amount,
+        'delivery_fee': order.delivery_fee,
+        'total_amount': order.total_amount,
+        'shipping_address': order.shipping_address,
+        'fulfillment_method': order.get_fulfillment_method_display(),
+        'customer_email': order.customer_email,
+        'customer_phone': order.customer_phone,
+    }
+    html_message = render_to_string('shop/order_confirmation.html', context)
+    return {
+        "subject": f'Confirmação da sua Encomenda #{order.order_number}',
+        "body": strip_tags(html_message),
+        "html_body": html_message,
+        "from_email": ORDER_FROM_EMAIL,
+        "to": [order.customer_email],
+    }
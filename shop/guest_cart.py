@@ -0,0 +1,141 @@
+"""
+Carrinho de visitantes anónimos num cookie assinado.
+
+Não cria linhas na BD nem grava a sessão (o SESSION_ENGINE é a BD): o
+conteúdo é {"<variant_id>": quantidade} no cookie GUEST_CART_COOKIE_NAME.
+No login/signup é fundido no Cart do utilizador com um bulk upsert
+(`merge_guest_cart`) e o cookie é apagado.
+
+Nas views, o `item_id` de um item de visitante é o id da variante.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+
+from .cache import refresh_cart_summary
+from .models import Cart, CartItem, ProductVariant
+
+SALT = "shop.guest_cart"
+MAX_AGE = 60 * 60 * 24 * 30
+MAX_ITEMS = 30
+MAX_QUANTITY = 99
+
+
+def _cookie_name() -> str:
+    return getattr(settings, "GUEST_CART_COOKIE_NAME", "guest_cart")
+
+
+def load(request) -> dict[int, int]:
+    """{variant_id: quantidade}; cookie inválido/adulterado conta como vazio."""
+    raw = request.get_signed_cookie(_cookie_name(), default=None, salt=SALT, max_age=MAX_AGE)
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+        items = {int(k): int(v) for k, v in data.items()}
+    except (ValueError, TypeError, AttributeError):
+        return {}
+    return {k: min(v, MAX_QUANTITY) for k, v in items.items() if v > 0}
+
+
+def save(response, items: dict[int, int]) -> None:
+    if not items:
+        response.delete_cookie(_cookie_name(), samesite="Lax")
+        return
+    payload = json.dumps({str(k): v for k, v in items.items()}, separators=(",", ":"))
+    response.set_signed_cookie(
+        _cookie_name(),
+        payload,
+        salt=SALT,
+        max_age=MAX_AGE,
+        httponly=True,
+        samesite="Lax",
+        secure=settings.SESSION_COOKIE_SECURE,
+    )
+
+
+@dataclass
+class GuestCartItem:
+    """Equivalente de CartItem para os templates do carrinho."""
+    variant: ProductVariant
+    quantity: int
+
+    @property
+    def id(self) -> int:
+        return self.variant.id
+
+    def get_total_price(self) -> Decimal:
+        return Decimal(str(self.variant.get_final_price())) * self.quantity
+
+
+def variants(items: dict[int, int]) -> dict[int, ProductVariant]:
+    if not items:
+        return {}
+    return {
+        v.id: v
+        for v in ProductVariant.objects.filter(id__in=items, is_active=True).select_related("product")
+    }
+
+
+def build_items(items: dict[int, int]) -> list[GuestCartItem]:
+    """Itens do carrinho (uma query); variantes entretanto inactivas são ignoradas."""
+    found = variants(items)
+    return [GuestCartItem(found[vid], qty) for vid, qty in items.items() if vid in found]
+
+
+def summary(items: dict[int, int], cart_items=None) -> dict:
+    """Mesmo formato do resumo cacheado dos utilizadores autenticados."""
+    if cart_items is None:
+        cart_items = build_items(items)
+    total = sum((i.get_total_price() for i in cart_items), Decimal("0.00"))
+    return {
+        "count": len(cart_items),
+        "quantity": sum(i.quantity for i in cart_items),
+        "total": str(total.quantize(Decimal("0.01"))),
+    }
+
+
+def merge_guest_cart(request, response) -> int:
+    """
+    Funde o carrinho do cookie no Cart do utilizador acabado de autenticar.
+    Quantidades somadas e limitadas ao stock; uma leitura de stock, uma de
+    itens existentes e um INSERT ... ON CONFLICT DO UPDATE. Devolve o nº de
+    linhas fundidas.
+    """
+    items = load(request)
+    if not items:
+        return 0
+
+    user = request.user
+    with transaction.atomic():
+        stock = dict(
+            ProductVariant.objects.filter(id__in=items, is_active=True).values_list("id", "stock_qty")
+        )
+        cart, _ = Cart.objects.get_or_create(user=user)
+        existing = dict(
+            CartItem.objects.filter(cart=cart, variant_id__in=stock).values_list("variant_id", "quantity")
+        )
+
+        rows = []
+        for variant_id, quantity in items.items():
+            available = stock.get(variant_id, 0)
+            merged = min(existing.get(variant_id, 0) + quantity, available)
+            if merged > 0:
+                rows.append(CartItem(cart=cart, variant_id=variant_id, quantity=merged))
+
+        CartItem.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["cart", "variant"],
+            update_fields=["quantity"],
+        )
+
+    refresh_cart_summary(user.id)
+    save(response, {})
+    return len(rows)
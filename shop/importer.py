@@ -0,0 +1,277 @@
+"""
+Importação em massa do catálogo (produtos, variantes, imagens) a partir de
+CSV ou JSONL, usada por `manage.py import_catalogue`.
+
+JSONL: um produto por linha
+    {"ref": "moon-tee-black", "name": "Moon Man Tee", "price": "1500",
+     "description": "...", "is_featured": false, "slug": "opcional",
+     "variants": [{"size": "M", "stock_qty": 10, "price_override": null}],
+     "images": ["shop/products/moon-black.jpg"]}
+
+CSV: uma linha por variante/imagem; linhas seguidas com o mesmo `ref`
+pertencem ao mesmo produto. Colunas: ref, name, slug, description, price,
+is_active, is_featured, size, price_override, stock_qty, variant_active, image.
+
+Os slugs são alocados com uma query por nome base (core.slugs.SlugAllocator)
+e as escritas vão por bulk_create/bulk_update em lotes. Como o bulk não
+dispara signals, no fim de cada lote os cards, o índice de pesquisa e a cache
+do catálogo são actualizados explicitamente.
+"""
+from __future__ import annotations
+
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.home import HERO_PRODUCT, refresh_slots
+from core.slugs import SlugAllocator
+
+from .cache import CATALOGUE_NAMESPACES, bump_namespaces
+from .cards import refresh_product_cards
+from . import ledger
+from .models import Product, ProductImage, ProductVariant, StockMovement
+from .search import index_products
+
+PRODUCT_FIELDS = ("name", "description", "price", "is_active", "is_featured")
+TRUE_VALUES = ("1", "true", "yes", "sim", "y")
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    products_created: int = 0
+    products_updated: int = 0
+    variants: int = 0
+    images: int = 0
+    errors: list = field(default_factory=list)
+
+
+def _bool(value, default=False) -> bool:
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def _decimal(value, label, required=True):
+    if value is None or value == "":
+        if required:
+            raise ImportRowError(f"{label} em falta")
+        return None
+    try:
+        return Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ImportRowError(f"{label} inválido: {value!r}")
+
+
+def _variant(data) -> dict:
+    size = (data.get("size") or "").strip().upper()
+    if size not in ProductVariant.Size.values:
+        raise ImportRowError(f"tamanho inválido: {size!r}")
+    try:
+        stock_qty = int(data.get("stock_qty") or 0)
+    except (TypeError, ValueError):
+        raise ImportRowError(f"stock_qty inválido: {data.get('stock_qty')!r}")
+    return {
+        "size": size,
+        "price_override": _decimal(data.get("price_override"), "price_override", required=False),
+        "stock_qty": stock_qty,
+        "is_active": _bool(data.get("is_active", data.get("variant_active")), default=True),
+    }
+
+
+def _product(data) -> dict:
+    name = (data.get("name") or "").strip()
+    if not name:
+        raise ImportRowError("name em falta")
+    return {
+        "name": name,
+        "slug": (data.get("slug") or "").strip(),
+        "description": data.get("description") or "",
+        "price": _decimal(data.get("price"), "price"),
+        "is_active": _bool(data.get("is_active"), default=True),
+        "is_featured": _bool(data.get("is_featured")),
+    }
+
+
+def iter_jsonl(fh):
+    """Produz (linha, registo normalizado | ImportRowError)."""
+    for lineno, line in enumerate(fh, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+            record = _product(data)
+            record["variants"] = [_variant(v) for v in data.get("variants") or []]
+            record["images"] = [str(i).strip() for i in data.get("images") or [] if str(i).strip()]
+            record["rows"] = 1
+        except (json.JSONDecodeError, ImportRowError) as exc:
+            yield lineno, ImportRowError(str(exc))
+            continue
+        yield lineno, record
+
+
+def iter_csv(fh):
+    """Agrupa linhas consecutivas com o mesmo `ref` num registo."""
+    reader = csv.DictReader(fh)
+    current, current_ref, start_line, failed = None, None, 0, None
+
+    def _flush():
+        if failed is not None:
+            return start_line, failed
+        return start_line, current
+
+    for lineno, row in enumerate(reader, start=2):
+        ref = (row.get("ref") or row.get("slug") or row.get("name") or "").strip()
+        if current is not None and ref != current_ref:
+            yield _flush()
+            current = None
+
+        if current is None:
+            current_ref, start_line, failed = ref, lineno, None
+            try:
+                current = _product(row)
+            except ImportRowError as exc:
+                current, failed = {}, ImportRowError(str(exc))
+            current.update(variants=[], images=[], rows=0)
+
+        current["rows"] += 1
+        if failed is not None:
+            continue
+        try:
+            if (row.get("size") or "").strip():
+                current["variants"].append(_variant(row))
+            image = (row.get("image") or "").strip()
+            if image:
+                current["images"].append(image)
+        except ImportRowError as exc:
+            failed = ImportRowError(f"{exc} (linha {lineno})")
+
+    if current is not None:
+        yield _flush()
+
+
+class CatalogueImporter:
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        self.slugs = SlugAllocator(Product, "product")
+        self.stats = ImportStats()
+
+    def run(self, records) -> ImportStats:
+        batch = []
+        for lineno, record in records:
+            if isinstance(record, ImportRowError):
+                self.stats.errors.append((lineno, str(record)))
+                continue
+            # slugs explícitos reservados já aqui: têm prioridade sobre os alocados
+            # no lote, e um repetido fica como erro da linha em vez de rebentar
+            # o bulk_create com IntegrityError
+            if record["slug"] and not self.slugs.reserve(record["slug"]):
+                self.stats.errors.append((lineno, f"slug repetido na importação: {record['slug']!r}"))
+                continue
+            self.stats.rows += record["rows"]
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+        # só depois do commit: com --dry-run (rollback) a cache ficava a apontar
+        # para linhas que já não existem
+        transaction.on_commit(lambda: bump_namespaces(*CATALOGUE_NAMESPACES))
+        # o bulk não dispara os signals que recalculam o destaque da homepage
+        transaction.on_commit(lambda: refresh_slots(HERO_PRODUCT))
+        return self.stats
+
+    def _variant_stock(self, product_ids):
+        """{(product_id, size): (variant_id, stock_qty)}, com lock nas variantes existentes."""
+        return {
+            (product_id, size): (pk, stock_qty)
+            for pk, product_id, size, stock_qty in ProductVariant.objects.select_for_update()
+            .filter(product_id__in=product_ids)
+            .values_list("pk", "product_id", "size", "stock_qty")
+        }
+
+    def _record_stock(self, before, after):
+        restock, adjust = {}, {}
+        for key, (pk, stock_qty) in after.items():
+            delta = stock_qty - before.get(key, (pk, 0))[1]
+            if delta > 0:
+                restock[pk] = delta
+            elif delta < 0:
+                adjust[pk] = delta
+        ledger.record(StockMovement.Kind.RESTOCK, restock)
+        ledger.record(StockMovement.Kind.ADJUST, adjust)
+
+    @transaction.atomic
+    def _write(self, batch):
+        now = timezone.now()
+
+        explicit = {r["slug"] for r in batch if r["slug"]}
+        existing = {p.slug: p for p in Product.objects.filter(slug__in=explicit)}
+
+        to_create, to_update, by_record = [], [], []
+        for record in batch:
+            product = existing.get(record["slug"]) if record["slug"] else None
+            if product is None:
+                slug = record["slug"] or self.slugs.allocate(record["name"])
+                product = Product(slug=slug, **{f: record[f] for f in PRODUCT_FIELDS})
+                to_create.append(product)
+            else:
+                for f in PRODUCT_FIELDS:
+                    setattr(product, f, record[f])
+                product.updated_at = now
+                to_update.append(product)
+            by_record.append((record, product))
+
+        Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+        if to_update:
+            Product.objects.bulk_update(
+                to_update, PRODUCT_FIELDS + ("updated_at",), batch_size=self.batch_size
+            )
+
+        product_ids = [product.pk for _, product in by_record]
+        variants = [
+            ProductVariant(product_id=product.pk, **v)
+            for record, product in by_record
+            for v in record["variants"]
+        ]
+        stock_before = self._variant_stock(product_ids)
+        ProductVariant.objects.bulk_create(
+            variants,
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=["product", "size"],
+            update_fields=["price_override", "stock_qty", "is_active"],
+        )
+        self._record_stock(stock_before, self._variant_stock(product_ids))
+
+        have_images = set(
+            ProductImage.objects.filter(product_id__in=product_ids).values_list("product_id", "image")
+        )
+        images = []
+        for record, product in by_record:
+            for name in record["images"]:
+                if (product.pk, name) not in have_images:
+                    have_images.add((product.pk, name))
+                    images.append(ProductImage(product_id=product.pk, image=name))
+        ProductImage.objects.bulk_create(images, batch_size=self.batch_size)
+
+        refresh_product_cards(product_ids)
+        index_products(product_ids)
+
+        self.stats.products_created += len(to_create)
+        self.stats.products_updated += len(to_update)
+        self.stats.variants += len(variants)
+        self.stats.images += len(images)
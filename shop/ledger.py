@@ -0,0 +1,147 @@
+"""
+Ledger de stock: StockMovement (só de acrescentar) + StockSnapshot.
+
+Quem altera ProductVariant.stock_qty escreve os movimentos em bulk na mesma
+transação (vendas e reposições de encomendas em shop/reservations.py e
+shop/orders.py, importações em shop/importer.py, edições à mão em
+ProductVariant.save()).
+
+O saldo numa data vem do snapshot mais próximo antes dela mais os movimentos
+entre os dois, por isso nunca é preciso somar a história toda:
+
+    saldo(v, t) = snapshot(v, s).quantity + Σ movimentos(v, s < created_at <= t)
+
+`take_snapshot()` (cron, `manage.py snapshot_stock`) tira o snapshot com um
+atraso de SNAPSHOT_LAG, para não deixar de fora movimentos de transações que
+ainda não fizeram commit. `reconcile()` (`manage.py reconcile_stock`) compara
+o saldo do ledger com stock_qty.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import ProductVariant, StockMovement, StockSnapshot
+
+SNAPSHOT_LAG = timedelta(minutes=5)
+BATCH_SIZE = 1000
+
+
+def record(kind: str, deltas: dict[int, int], order_id: int | None = None) -> None:
+    """Um movimento por variante (`deltas[variant_id]`, com sinal), num INSERT."""
+    now = timezone.now()
+    StockMovement.objects.bulk_create([
+        StockMovement(variant_id=variant_id, kind=kind, quantity=quantity, order_id=order_id, created_at=now)
+        for variant_id, quantity in deltas.items()
+        if quantity
+    ], batch_size=BATCH_SIZE)
+
+
+def record_rows(kind: str, rows) -> None:
+    """Vários movimentos de uma vez: `rows` = [(variant_id, quantidade, order_id)]."""
+    now = timezone.now()
+    StockMovement.objects.bulk_create([
+        StockMovement(variant_id=variant_id, kind=kind, quantity=quantity, order_id=order_id, created_at=now)
+        for variant_id, quantity, order_id in rows
+        if quantity
+    ], batch_size=BATCH_SIZE)
+
+
+def _movements_after(since, until=None, variant_ids=None) -> dict[int, int]:
+    movements = StockMovement.objects.all()
+    if since is not None:
+        movements = movements.filter(created_at__gt=since)
+    if until is not None:
+        movements = movements.filter(created_at__lte=until)
+    if variant_ids is not None:
+        movements = movements.filter(variant_id__in=variant_ids)
+    return dict(movements.values("variant_id").annotate(total=Sum("quantity")).order_by()
+                .values_list("variant_id", "total"))
+
+
+def _latest_snapshot(at=None):
+    """(taken_at, {variant_id: quantidade}) do último snapshot até `at`, ou (None, {})."""
+    snapshots = StockSnapshot.objects.all()
+    if at is not None:
+        snapshots = snapshots.filter(taken_at__lte=at)
+    taken_at = snapshots.aggregate(latest=Max("taken_at"))["latest"]
+    if taken_at is None:
+        return None, {}
+    return taken_at, dict(
+        StockSnapshot.objects.filter(taken_at=taken_at).values_list("variant_id", "quantity")
+    )
+
+
+def on_hand(variant_ids, at=None) -> dict[int, int]:
+    """Saldo de cada variante em `at` (por omissão agora): snapshot + delta limitado."""
+    variant_ids = list(variant_ids)
+    snapshots = StockSnapshot.objects.filter(variant_id__in=variant_ids)
+    if at is not None:
+        snapshots = snapshots.filter(taken_at__lte=at)
+    latest = dict(snapshots.values("variant_id").annotate(t=Max("taken_at")).order_by()
+                  .values_list("variant_id", "t"))
+
+    # normalmente todas partilham o mesmo snapshot: uma volta
+    groups = {}
+    for v in variant_ids:
+        groups.setdefault(latest.get(v), []).append(v)
+
+    result = {}
+    for taken_at, ids in groups.items():
+        base = {} if taken_at is None else dict(
+            StockSnapshot.objects.filter(taken_at=taken_at, variant_id__in=ids).values_list("variant_id", "quantity")
+        )
+        delta = _movements_after(taken_at, at, ids)
+        for v in ids:
+            result[v] = base.get(v, 0) + delta.get(v, 0)
+    return result
+
+
+@transaction.atomic
+def take_snapshot(at=None) -> int:
+    """
+    Grava o saldo de todas as variantes em `at` (por omissão agora - SNAPSHOT_LAG)
+    a partir do snapshot anterior + movimentos entretanto. Devolve as linhas gravadas.
+    """
+    at = at or timezone.now() - SNAPSHOT_LAG
+    previous_at, previous = _latest_snapshot()
+    if previous_at is not None and previous_at >= at:
+        return 0
+
+    delta = _movements_after(previous_at, at)
+    snapshots = [
+        StockSnapshot(variant_id=pk, taken_at=at, quantity=previous.get(pk, 0) + delta.get(pk, 0))
+        for pk in ProductVariant.objects.values_list("pk", flat=True).iterator(chunk_size=BATCH_SIZE)
+    ]
+    StockSnapshot.objects.bulk_create(snapshots, batch_size=BATCH_SIZE)
+    return len(snapshots)
+
+
+def reconcile(full: bool = False) -> tuple[int, list[tuple[int, int, int]]]:
+    """
+    Compara o saldo do ledger com stock_qty. Com `full` soma a história toda
+    (verifica também os snapshots). Devolve (variantes verificadas,
+    [(variant_id, ledger, stock_qty)] das que não batem).
+    """
+    taken_at, base = (None, {}) if full else _latest_snapshot()
+    delta = _movements_after(taken_at)
+
+    checked, suspects = 0, []
+    for pk, stock_qty in ProductVariant.objects.values_list("pk", "stock_qty").iterator(chunk_size=BATCH_SIZE):
+        checked += 1
+        if base.get(pk, 0) + delta.get(pk, 0) != stock_qty:
+            suspects.append(pk)
+    if not suspects:
+        return checked, []
+
+    # uma encomenda pode ter feito commit entre as duas leituras: confirmar de novo
+    expected = on_hand(suspects) if not full else _movements_after(None, variant_ids=suspects)
+    stock = dict(ProductVariant.objects.filter(pk__in=suspects).values_list("pk", "stock_qty"))
+    return checked, [
+        (pk, expected.get(pk, 0), stock[pk])
+        for pk in suspects
+        if pk in stock and expected.get(pk, 0) != stock[pk]
+    ]
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from shop.orders import BACKFILL_BATCH_SIZE, backfill_order_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Liga as encomendas antigas ao utilizador (pelo email) e grava o resumo usado "
+        "no histórico, em lotes. Pode ser repetido."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        linked, summarized = backfill_order_history(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{linked} encomendas ligadas a utilizadores, {summarized} resumos gravados."
+        ))
@@ -0,0 +1,101 @@
+import re
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.utils import timezone
+
+from core.bench import scratch_database
+from shop.models import Order
+from shop.sequences import BlockSequence
+
+BENCH_EMAIL = "bench-orders@example.com"
+BENCH_SEQUENCE = "bench_order_number"
+
+
+def _create_order(order_number):
+    return Order.objects.create(
+        order_number=order_number,
+        customer_name="Bench",
+        customer_email=BENCH_EMAIL,
+        fulfillment_method=Order.FulfillmentMethod.PICKUP,
+        shipping_address="PICKUP: Bench",
+        subtotal_amount=Decimal("100.00"),
+        total_amount=Decimal("100.00"),
+        placed_at=timezone.now(),
+    )
+
+
+def _legacy_checkout(_sequence):
+    """Caminho antigo: lock no último Order, regex, +1 e retry em IntegrityError."""
+    with transaction.atomic():
+        for _ in range(5):
+            last = Order.objects.select_for_update().order_by("-id").first()
+            m = re.search(r"PLA-(\d+)$", last.order_number.strip()) if last else None
+            number = f"PLA-{int(m.group(1)) + 1:04d}" if m else "PLA-0001"
+            try:
+                with transaction.atomic():
+                    return _create_order(number)
+            except IntegrityError:
+                continue
+        raise IntegrityError("Falha ao gerar número de encomenda único.")
+
+
+def _sequence_checkout(sequence):
+    """Caminho novo: número do bloco em memória, transação só com o INSERT."""
+    number = f"BENCH-{sequence.next():06d}"
+    with transaction.atomic():
+        return _create_order(number)
+
+
+class Command(BaseCommand):
+    help = (
+        "Throughput de criação de encomendas com N escritores concorrentes: número via "
+        "último Order (antigo) vs sequência hi/lo, numa base SQLite descartável (core/bench.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--orders", type=int, default=50, help="Encomendas por escritor.")
+        parser.add_argument("--block-size", type=int, default=20)
+
+    def _run(self, label, checkout, writers, per_writer, block_size):
+        created, failures = [], []
+        barrier = threading.Barrier(writers)
+
+        def target():
+            # cada thread faz de processo/worker: o seu próprio bloco
+            sequence = BlockSequence(BENCH_SEQUENCE, block_size=block_size)
+            barrier.wait()
+            try:
+                for _ in range(per_writer):
+                    try:
+                        created.append(checkout(sequence).order_number)
+                    except DatabaseError as exc:
+                        failures.append(str(exc))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=target) for _ in range(writers)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        duplicates = len(created) - len(set(created))
+        self.stdout.write(
+            f"{label:<18} {len(created):>5} encomendas em {elapsed:.2f}s "
+            f"({len(created) / elapsed:.0f}/s) falhas={len(failures)} duplicados={duplicates}"
+        )
+
+    def handle(self, *args, **options):
+        writers, per_writer = options["writers"], options["orders"]
+        with scratch_database():
+            self.stdout.write(f"{writers} escritores x {per_writer} encomendas")
+            self._run("último Order + lock", _legacy_checkout, writers, per_writer, options["block_size"])
+            Order.objects.filter(customer_email=BENCH_EMAIL).delete()
+            self._run("sequência hi/lo", _sequence_checkout, writers, per_writer, options["block_size"])
@@ -0,0 +1,115 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.bench import scratch_database
+from shop.models import Cart, CartItem, Order, OrderItem, Product, ProductVariant
+from shop.orders import place_order
+from shop.reservations import hold
+
+SIZES = (1, 10, 30)
+STOCK = 1_000_000
+
+
+def _order_fields(tag):
+    return dict(
+        order_number=f"BENCH-{tag}",
+        customer_name="Bench",
+        customer_email="bench-pipeline@example.com",
+        fulfillment_method=Order.FulfillmentMethod.PICKUP,
+        shipping_address="PICKUP: Bench",
+        subtotal_amount=Decimal("0.00"),
+        total_amount=Decimal("0.00"),
+        placed_at=timezone.now(),
+    )
+
+
+def _legacy(user, cart, cart_items, tag):
+    """Caminho antigo: por item, OrderItem.create + variant.save (com signals)."""
+    with transaction.atomic():
+        order = Order.objects.create(**_order_fields(tag))
+        for cart_item in cart_items:
+            variant = cart_item.variant
+            unit_price = Decimal(str(variant.get_final_price()))
+            OrderItem.objects.create(
+                order=order,
+                product_variant=variant,
+                quantity=cart_item.quantity,
+                unit_price=unit_price,
+                total_price=unit_price * cart_item.quantity,
+            )
+            variant.stock_qty = variant.stock_qty - cart_item.quantity
+            variant.save(update_fields=["stock_qty"])
+        cart.items.all().delete()
+
+
+def _pipeline(user, cart, cart_items, tag):
+    place_order(user.id, cart.id, cart_items, **_order_fields(tag))
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o tempo dentro da transação de criação de encomenda (= tempo com o lock "
+        "de escrita do SQLite) e o nº de instruções, antigo vs pipeline em lote. "
+        "Corre numa base SQLite descartável (core/bench.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def _seed(self, n):
+        products = Product.objects.bulk_create(
+            [Product(name=f"Bench Pipeline {n}-{i}", slug=f"bench-pipeline-{n}-{i}", price=Decimal("500"))
+             for i in range(n)]
+        )
+        variants = ProductVariant.objects.bulk_create(
+            [ProductVariant(product=p, size="M", stock_qty=STOCK) for p in products]
+        )
+        user = User.objects.create_user(username=f"bench-pipeline-{n}")
+        cart = Cart.objects.create(user=user)
+        return user, cart, variants
+
+    def _fill_cart(self, user, cart, variants):
+        CartItem.objects.bulk_create([CartItem(cart=cart, variant=v, quantity=2) for v in variants])
+        for v in variants:
+            hold(user.id, v.id, 2)
+        return list(cart.items.select_related("variant__product"))
+
+    def _measure(self, fn, user, cart, variants, repeat, label):
+        timings, statements = [], None
+        for i in range(repeat):
+            cart_items = self._fill_cart(user, cart, variants)
+            connection.queries_log.clear()
+            released = []
+            with CaptureQueriesContext(connection) as ctx, transaction.atomic():
+                # BEGIN IMMEDIATE já correu: o lock de escrita é nosso a partir daqui
+                # até ao COMMIT, que corre logo antes do primeiro on_commit
+                start = time.perf_counter()
+                transaction.on_commit(lambda: released.append(time.perf_counter()))
+                fn(user, cart, cart_items, f"{label}-{len(variants)}-{i}")
+            timings.append((released[0] - start) * 1000)
+            if statements is None:
+                statements = sum(
+                    1 for q in ctx.captured_queries
+                    if q["sql"].split(None, 1)[0].upper() in ("INSERT", "UPDATE", "DELETE")
+                )
+        return statements, statistics.median(timings), max(timings)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            for n in SIZES:
+                user, cart, variants = self._seed(n)
+                for label, fn in (("antigo", _legacy), ("pipeline", _pipeline)):
+                    writes, median, worst = self._measure(fn, user, cart, variants, options["repeat"], label)
+                    self.stdout.write(
+                        f"{n:>3} itens  {label:<9} escritas={writes:<4} "
+                        f"lock mediana={median:.2f}ms pior={worst:.2f}ms"
+                    )
+                if CartItem.objects.filter(cart=cart).exists():
+                    raise CommandError("O carrinho não foi limpo.")
@@ -0,0 +1,126 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Prefetch
+from django.test.utils import CaptureQueriesContext
+
+from core.bench import scratch_database
+from shop.cards import rebuild_product_cards
+from shop.models import Product, ProductCard, ProductImage, ProductVariant
+
+PAGE_SIZE = 24
+
+
+def _legacy_page(number, featured=False):
+    """Caminho antigo: Product + prefetch de imagens e variantes, card montado por produto."""
+    qs = (
+        Product.objects.filter(is_active=True)
+        .prefetch_related("images")
+        .prefetch_related(
+            Prefetch(
+                "variants",
+                queryset=ProductVariant.objects.filter(
+                    is_active=True,
+                    stock_qty__gt=0,
+                ).order_by("size"),
+            )
+        )
+    )
+    if featured:
+        qs = qs.filter(is_featured=True)
+
+    page = Paginator(qs, PAGE_SIZE).get_page(number)
+    cards = []
+    for p in page:
+        img = p.images.all()[:1]
+        cards.append((
+            p.slug,
+            img[0].image.url if img else "",
+            [v.size for v in p.variants.all()],
+            p.price,
+        ))
+    return cards
+
+
+def _card_page(number, featured=False):
+    """Caminho novo: uma query na projeção ProductCard."""
+    qs = ProductCard.objects.filter(is_active=True)
+    if featured:
+        qs = qs.filter(is_featured=True)
+
+    page = Paginator(qs.order_by("-created_at"), PAGE_SIZE).get_page(number)
+    return [(c.slug, c.main_image_url, c.size_list, c.min_price) for c in page]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara queries e latência da listagem de merch (Product + prefetch vs ProductCard). "
+        "Os dados de teste são criados numa base SQLite descartável (core/bench.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def _seed(self, n):
+        products = [
+            Product(
+                name=f"Bench Tee {i}",
+                slug=f"bench-tee-{i}",
+                description="Bench " * 20,
+                price=Decimal("1500.00"),
+                is_featured=(i % 10 == 0),
+            )
+            for i in range(n)
+        ]
+        Product.objects.bulk_create(products, batch_size=1000)
+        ids = list(
+            Product.objects.filter(slug__startswith="bench-tee-").values_list("pk", flat=True)
+        )
+
+        ProductImage.objects.bulk_create(
+            [ProductImage(product_id=pk, image=f"shop/products/bench-{pk}-{k}.jpg")
+             for pk in ids for k in range(2)],
+            batch_size=1000,
+        )
+        ProductVariant.objects.bulk_create(
+            [ProductVariant(product_id=pk, size=size, stock_qty=(pk + j) % 3)
+             for pk in ids for j, size in enumerate(ProductVariant.Size.values)],
+            batch_size=1000,
+        )
+        rebuild_product_cards()
+
+    def _measure(self, fn, pages, repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            fn(pages[0])
+        queries = len(ctx.captured_queries)
+
+        timings = []
+        for _ in range(repeat):
+            for number in pages:
+                start = time.perf_counter()
+                fn(number)
+                timings.append((time.perf_counter() - start) * 1000)
+        return queries, statistics.median(timings), max(timings)
+
+    def handle(self, *args, **options):
+        n = options["products"]
+        repeat = options["repeat"]
+
+        with scratch_database():
+            self.stdout.write(f"A criar {n} produtos de teste...")
+            self._seed(n)
+
+            last = max(1, (n + PAGE_SIZE - 1) // PAGE_SIZE)
+            pages = [1, last // 2 or 1, last]
+
+            for label, fn in (("Product + prefetch", _legacy_page), ("ProductCard", _card_page)):
+                queries, median, worst = self._measure(fn, pages, repeat)
+                self.stdout.write(
+                    f"{label:<20} queries/página={queries:<3} "
+                    f"mediana={median:.2f}ms pior={worst:.2f}ms"
+                )
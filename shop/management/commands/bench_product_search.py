@@ -0,0 +1,87 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from core.bench import scratch_database
+from shop.cards import rebuild_product_cards
+from shop.models import Product, ProductCard
+from shop.search import fts_available, order_by_relevance, rebuild_index, search_product_ids
+
+WORDS = (
+    "tee camisola hoodie calças boné meias saco casaco oversized algodão orgânico "
+    "preto branco lua planeta órbita edição limitada bordado estampado vintage"
+).split()
+QUERIES = ("hoodie", "camisolas pretas", "algod", "edição limitada", "orb", "zzzz")
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a pesquisa de produtos (icontains vs índice FTS5). "
+        "Os produtos de teste são criados numa base SQLite descartável (core/bench.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def _seed(self, n):
+        rnd = random.Random(7)
+        syllables = ("ka", "lu", "mo", "ze", "ti", "ra", "no", "vi", "sa", "pe")
+        filler = ["".join(rnd.choice(syllables) for _ in range(3)) for _ in range(5000)]
+        # nomes com uma palavra de catálogo + nomes de colecção, como num catálogo real
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=f"{rnd.choice(WORDS)} {' '.join(rnd.sample(filler, 2))} {i}".title(),
+                    slug=f"bench-search-{i}",
+                    description=" ".join(
+                        rnd.choice(WORDS) if rnd.random() < 0.05 else rnd.choice(filler)
+                        for _ in range(40)
+                    ),
+                    price=Decimal("1000.00"),
+                )
+                for i in range(n)
+            ],
+            batch_size=1000,
+        )
+        rebuild_index()
+        rebuild_product_cards()
+
+    def _time(self, fn, repeat):
+        timings = []
+        for _ in range(repeat):
+            for q in QUERIES:
+                start = time.perf_counter()
+                fn(q)
+                timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), max(timings)
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError("FTS5 só está disponível em SQLite.")
+
+        def icontains(q):
+            return list(
+                Product.objects.filter(Q(name__icontains=q) | Q(description__icontains=q))
+                .values_list("pk", flat=True)[:20]
+            )
+
+        def fts(q):
+            return search_product_ids(q, limit=20)
+
+        # a listagem do merch: todos os cards que correspondem, ordenados em SQL
+        def fts_page(q):
+            qs = order_by_relevance(ProductCard.objects.filter(is_active=True), q)
+            return qs.count(), list(qs.values_list("pk", flat=True)[:24])
+
+        with scratch_database():
+            self.stdout.write(f"A criar {options['products']} produtos de teste...")
+            self._seed(options["products"])
+
+            for label, fn in (("icontains", icontains), ("FTS5 + bm25", fts), ("FTS5 página", fts_page)):
+                median, worst = self._time(fn, options["repeat"])
+                self.stdout.write(f"{label:<12} mediana={median:.2f}ms pior={worst:.2f}ms")
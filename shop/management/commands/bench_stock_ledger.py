@@ -0,0 +1,103 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from django.utils import timezone
+
+from core.bench import scratch_database
+from shop import ledger
+from shop.models import Product, ProductVariant, StockMovement
+
+DAYS = 365
+KINDS = [StockMovement.Kind.SALE] * 8 + [StockMovement.Kind.CANCEL, StockMovement.Kind.RESTOCK]
+
+
+class Command(BaseCommand):
+    help = (
+        "Ledger de stock: reconciliação e saldo numa data a somar a história toda vs a partir "
+        "de snapshots mensais, com verificação de uma diferença injectada. Corre numa "
+        "base SQLite descartável (core/bench.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movements", type=int, default=1_000_000)
+        parser.add_argument("--variants", type=int, default=2000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def _time(self, fn, repeat):
+        timings, result = [], None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), result
+
+    def _seed(self, n_variants, n_movements, now):
+        products = Product.objects.bulk_create(
+            [Product(name=f"Bench Ledger {i}", slug=f"bench-ledger-{i}", price=Decimal("10"))
+             for i in range(n_variants)], batch_size=2000,
+        )
+        variants = ProductVariant.objects.bulk_create(
+            [ProductVariant(product=p, size="M") for p in products], batch_size=2000,
+        )
+        ids = [v.pk for v in variants]
+        rnd = random.Random(0)
+        balance = dict.fromkeys(ids, 0)
+        batch = []
+        for i in range(n_movements):
+            pk = rnd.choice(ids)
+            kind = rnd.choice(KINDS)
+            quantity = -rnd.randint(1, 3) if kind == StockMovement.Kind.SALE else rnd.randint(1, 5)
+            balance[pk] += quantity
+            batch.append(StockMovement(variant_id=pk, kind=kind, quantity=quantity,
+                                       created_at=now - timedelta(seconds=rnd.randrange(DAYS * 86400))))
+            if len(batch) == 5000:
+                StockMovement.objects.bulk_create(batch)
+                batch = []
+        StockMovement.objects.bulk_create(batch)
+        for v in variants:
+            v.stock_qty = balance[v.pk]
+        ProductVariant.objects.bulk_update(variants, ["stock_qty"], batch_size=2000)
+        return ids
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        now = timezone.now()
+        with scratch_database():
+            start = time.perf_counter()
+            ids = self._seed(options["variants"], options["movements"], now)
+            self.stdout.write(f"seed: {options['movements']} movimentos, {len(ids)} variantes "
+                              f"({time.perf_counter() - start:.1f}s)")
+
+            full_ms, (checked, full_bad) = self._time(lambda: ledger.reconcile(full=True), repeat)
+
+            start = time.perf_counter()
+            for months in range(12, 0, -1):
+                ledger.take_snapshot(at=now - timedelta(days=30 * months - 29))
+            snapshot_ms = (time.perf_counter() - start) * 1000 / 12
+            snap_ms, (_, snap_bad) = self._time(lambda: ledger.reconcile(), repeat)
+            self.stdout.write(f"reconcile ({checked} variantes): história toda={full_ms:.0f}ms  "
+                              f"snapshot + último dia={snap_ms:.0f}ms  (take_snapshot={snapshot_ms:.0f}ms)")
+            if full_bad or snap_bad:
+                raise CommandError(f"Diferenças sem as ter injectado: {full_bad[:5]} {snap_bad[:5]}")
+
+            at = now - timedelta(days=45)
+            sample = ids[:200]
+            raw_ms, raw = self._time(lambda: ledger._movements_after(None, at, sample), repeat)
+            hand_ms, hand = self._time(lambda: ledger.on_hand(sample, at), repeat)
+            self.stdout.write(f"saldo a -45 dias ({len(sample)} variantes): história toda={raw_ms:.1f}ms  "
+                              f"snapshot + delta={hand_ms:.1f}ms")
+            if any(raw.get(pk, 0) != hand[pk] for pk in sample):
+                raise CommandError("on_hand() diferente da soma da história toda.")
+
+            broken = ids[len(ids) // 2]
+            ProductVariant.objects.filter(pk=broken).update(stock_qty=F("stock_qty") + 1)
+            for full in (True, False):
+                _, bad = ledger.reconcile(full=full)
+                if [pk for pk, _, _ in bad] != [broken]:
+                    raise CommandError(f"Diferença injectada não detectada (full={full}): {bad[:5]}")
+            self.stdout.write("diferença injectada detectada nos dois modos")
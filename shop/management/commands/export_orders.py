@@ -0,0 +1,32 @@
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from shop.exports import CHUNK_SIZE, export_lines, orders_since
+
+
+class Command(BaseCommand):
+    help = "Exporta encomendas com os itens em CSV ou JSONL, em streaming (ver shop/exports.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, help="Encomendas criadas a partir deste dia (AAAA-MM-DD).")
+        parser.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+        parser.add_argument("--output", help="Ficheiro de destino; por omissão stdout.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        lines = export_lines(orders_since(options["since"]), options["format"], chunk_size=options["chunk_size"])
+
+        if not options["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        path = Path(options["output"])
+        written = 0
+        with path.open("w", encoding="utf-8", newline="") as fh:
+            for line in lines:
+                fh.write(line)
+                written += 1
+        self.stderr.write(f"{written} linhas escritas em {path}.")
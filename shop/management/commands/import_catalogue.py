@@ -0,0 +1,57 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shop.importer import CatalogueImporter, iter_csv, iter_jsonl
+
+
+class Command(BaseCommand):
+    help = "Importa produtos, variantes e imagens de um ficheiro CSV ou JSONL (ver shop/importer.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "jsonl"),
+            help="Por omissão é deduzido da extensão do ficheiro.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Corre a importação completa e faz rollback no fim.",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"Ficheiro não encontrado: {path}")
+
+        fmt = options["format"] or path.suffix.lstrip(".").lower()
+        if fmt not in ("csv", "jsonl"):
+            raise CommandError("Formato desconhecido; use --format csv|jsonl.")
+
+        importer = CatalogueImporter(batch_size=options["batch_size"])
+        started = time.perf_counter()
+
+        with path.open(encoding="utf-8", newline="") as fh:
+            records = iter_csv(fh) if fmt == "csv" else iter_jsonl(fh)
+            with transaction.atomic():
+                stats = importer.run(records)
+                if options["dry_run"]:
+                    transaction.set_rollback(True)
+
+        elapsed = time.perf_counter() - started
+        rate = stats.rows / elapsed if elapsed else 0
+
+        for lineno, message in stats.errors:
+            self.stderr.write(f"linha {lineno}: {message}")
+
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(
+            f"{prefix}{stats.rows} linhas em {elapsed:.2f}s ({rate:.0f} linhas/s): "
+            f"{stats.products_created} produtos criados, {stats.products_updated} actualizados, "
+            f"{stats.variants} variantes, {stats.images} imagens, {len(stats.errors)} erros."
+        )
@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from shop.rollups import REBUILD_BATCH_SIZE, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recalcula os rollups diários de vendas (DailyVariantSales) a partir das encomendas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, help="Só a partir deste dia (AAAA-MM-DD).")
+        parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(since=options["since"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{written} linhas de rollup gravadas."))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shop import ledger
+from shop.models import StockMovement
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara ProductVariant.stock_qty com o saldo do ledger de stock (último snapshot + "
+        "movimentos). Com --fix regista as diferenças como movimentos ADJUST."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true",
+                            help="Soma a história toda em vez de partir do último snapshot.")
+        parser.add_argument("--fix", action="store_true",
+                            help="Acerta o ledger pelo stock_qty actual (movimentos ADJUST).")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        checked, mismatches = ledger.reconcile(full=options["full"])
+        elapsed = (time.perf_counter() - start) * 1000
+        self.stdout.write(f"{checked} variantes verificadas em {elapsed:.0f}ms, {len(mismatches)} diferenças.")
+        for pk, expected, stock_qty in mismatches[:50]:
+            self.stdout.write(f"  variante {pk}: ledger={expected} stock_qty={stock_qty}")
+
+        if not mismatches:
+            return
+        if not options["fix"]:
+            raise CommandError("O ledger não bate com stock_qty.")
+        with transaction.atomic():
+            ledger.record(StockMovement.Kind.ADJUST, {pk: stock_qty - expected for pk, expected, stock_qty in mismatches})
+        self.stdout.write(self.style.SUCCESS(f"{len(mismatches)} movimentos ADJUST registados."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from shop.ledger import take_snapshot
+
+
+class Command(BaseCommand):
+    help = "Grava um snapshot do saldo de stock de todas as variantes (correr no cron, ex: de hora a hora)."
+
+    def handle(self, *args, **options):
+        written = take_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"{written} variantes no snapshot."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from shop.reservations import SWEEP_BATCH_SIZE, release_expired
+
+
+class Command(BaseCommand):
+    help = "Liberta em lote as reservas de stock expiradas (correr no cron, ex: a cada minuto)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SWEEP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        released = release_expired(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{released} reservas expiradas libertadas."))
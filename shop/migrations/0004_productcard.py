@@ -0,0 +1,71 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_product_cards(apps, schema_editor):
+    Product = apps.get_model("shop", "Product")
+    ProductImage = apps.get_model("shop", "ProductImage")
+    ProductVariant = apps.get_model("shop", "ProductVariant")
+    ProductCard = apps.get_model("shop", "ProductCard")
+
+    first_image = {}
+    for img in ProductImage.objects.order_by("id"):
+        first_image.setdefault(img.product_id, img)
+
+    variants = {}
+    for v in ProductVariant.objects.filter(is_active=True, stock_qty__gt=0).order_by("size"):
+        variants.setdefault(v.product_id, []).append(v)
+
+    cards = []
+    for product in Product.objects.all():
+        in_stock = variants.get(product.pk, [])
+        prices = [
+            v.price_override if v.price_override is not None else product.price
+            for v in in_stock
+        ] or [product.price]
+        img = first_image.get(product.pk)
+        cards.append(ProductCard(
+            product_id=product.pk,
+            name=product.name,
+            slug=product.slug,
+            main_image_url=img.image.url if img and img.image else "",
+            sizes=",".join(v.size for v in in_stock),
+            min_price=min(prices),
+            max_price=max(prices),
+            is_active=product.is_active,
+            is_featured=product.is_featured,
+            created_at=product.created_at,
+        ))
+    ProductCard.objects.bulk_create(cards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_remove_order_payment_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='shop.product')),
+                ('name', models.CharField(max_length=200)),
+                ('slug', models.SlugField(max_length=220)),
+                ('main_image_url', models.CharField(blank=True, max_length=500)),
+                ('sizes', models.CharField(blank=True, max_length=60)),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_featured', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ('-created_at',),
+                'indexes': [models.Index(fields=['is_active', '-created_at'], name='shop_produc_is_acti_8adc2b_idx'), models.Index(fields=['is_active', 'is_featured', '-created_at'], name='shop_produc_is_acti_3a0256_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_product_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:38
+
+from django.db import migrations, models
+
+
+def backfill_main_image_name(apps, schema_editor):
+    ProductImage = apps.get_model("shop", "ProductImage")
+    ProductCard = apps.get_model("shop", "ProductCard")
+
+    first_image = {}
+    for img in ProductImage.objects.order_by("id"):
+        first_image.setdefault(img.product_id, img.image.name)
+
+    cards = list(ProductCard.objects.filter(product_id__in=first_image))
+    for card in cards:
+        card.main_image_name = first_image[card.product_id]
+    ProductCard.objects.bulk_update(cards, ["main_image_name"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_productcard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcard',
+            name='main_image_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(backfill_main_image_name, migrations.RunPython.noop),
+    ]
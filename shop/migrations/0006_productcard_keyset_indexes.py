@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_productcard_main_image_name'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='shop_produc_is_acti_8adc2b_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='shop_produc_is_acti_3a0256_idx',
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['is_active', '-created_at', '-product'], name='shop_produc_is_acti_430857_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['is_active', 'is_featured', '-created_at', '-product'], name='shop_produc_is_acti_553aa4_idx'),
+        ),
+    ]
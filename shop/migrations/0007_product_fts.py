@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:52
+
+from django.db import migrations
+
+FTS_TABLE = "shop_product_fts"
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    from shop.search import normalize_text
+
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, description, sizes, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+
+    Product = apps.get_model("shop", "Product")
+    ProductVariant = apps.get_model("shop", "ProductVariant")
+
+    sizes = {}
+    for product_id, size in (
+        ProductVariant.objects.filter(is_active=True)
+        .order_by("size")
+        .values_list("product_id", "size")
+    ):
+        sizes.setdefault(product_id, []).append(size.lower())
+
+    rows = [
+        (pk, normalize_text(name), normalize_text(description), " ".join(sizes.get(pk, [])))
+        for pk, name, description in Product.objects.values_list("pk", "name", "description")
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, sizes) VALUES (%s, %s, %s, %s)",
+            rows,
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_productcard_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
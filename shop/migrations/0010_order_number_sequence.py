@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-18 00:10
+
+import re
+
+from django.db import migrations, models
+
+
+def seed_order_number_sequence(apps, schema_editor):
+    # Continua a partir do maior PLA-NNNN já emitido.
+    Order = apps.get_model("shop", "Order")
+    Sequence = apps.get_model("shop", "Sequence")
+
+    highest = 0
+    for number in Order.objects.filter(order_number__startswith="PLA-").values_list("order_number", flat=True):
+        m = re.match(r"^PLA-(\d+)$", number.strip())
+        if m:
+            highest = max(highest, int(m.group(1)))
+    Sequence.objects.update_or_create(name="order_number", defaults={"next_value": highest + 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(seed_order_number_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 6.0.1 on 2026-10-18 00:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+from django.db.models.functions import Lower
+
+BATCH_SIZE = 500
+
+
+def backfill_order_history(apps, schema_editor):
+    # Mesma lógica que shop.orders.backfill_order_history, com os modelos históricos.
+    Order = apps.get_model("shop", "Order")
+    OrderItem = apps.get_model("shop", "OrderItem")
+    ProductCard = apps.get_model("shop", "ProductCard")
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+
+    user_by_email = dict(
+        User.objects.annotate(email_lower=Lower("email"))
+        .values("email_lower")
+        .annotate(n=Count("id"), user_id=Max("id"))
+        .filter(n=1)
+        .values_list("email_lower", "user_id")
+    )
+    thumbnails = dict(ProductCard.objects.exclude(main_image_url="").values_list("product_id", "main_image_url"))
+
+    last_pk = 0
+    while True:
+        orders = list(Order.objects.filter(pk__gt=last_pk).order_by("pk")[:BATCH_SIZE])
+        if not orders:
+            return
+        last_pk = orders[-1].pk
+
+        lines = {}
+        for order_id, product_id, name, quantity in (
+            OrderItem.objects.filter(order__in=orders).order_by("order_id", "id")
+            .values_list("order_id", "product_variant__product_id", "product_variant__product__name", "quantity")
+        ):
+            lines.setdefault(order_id, []).append((product_id, name, quantity))
+
+        for order in orders:
+            order.user_id = user_by_email.get(order.customer_email.lower())
+            order_lines = lines.get(order.pk, [])
+            names = ", ".join(dict.fromkeys(name for _, name, _ in order_lines))
+            order.item_names = names if len(names) <= 255 else names[:254] + "…"
+            order.item_count = sum(q for _, _, q in order_lines)
+            order.thumbnail_url = next((thumbnails[p] for p, _, _ in order_lines if p in thumbnails), "")
+        Order.objects.bulk_update(orders, ["user", "item_count", "thumbnail_url", "item_names"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_order_number_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='item_names',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='thumbnail_url',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_history_idx'),
+        ),
+        migrations.RunPython(backfill_order_history, migrations.RunPython.noop),
+    ]
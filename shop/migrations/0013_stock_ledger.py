@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-18 00:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def opening_balances(apps, schema_editor):
+    # O ledger começa com o stock actual de cada variante como ajuste inicial.
+    ProductVariant = apps.get_model("shop", "ProductVariant")
+    StockMovement = apps.get_model("shop", "StockMovement")
+    now = timezone.now()
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(variant_id=pk, kind="adjust", quantity=qty, created_at=now)
+            for pk, qty in ProductVariant.objects.exclude(stock_qty=0).values_list("pk", "stock_qty")
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_daily_variant_sales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sale', 'Venda'), ('cancel', 'Cancelamento'), ('restock', 'Reposição'), ('adjust', 'Ajuste manual')], max_length=10)),
+                ('quantity', models.IntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='shop.order')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='shop.productvariant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['variant', 'created_at'], name='stockmove_variant_time_idx'), models.Index(fields=['created_at'], name='stockmove_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('quantity', models.IntegerField()),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='shop.productvariant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['taken_at'], name='stocksnap_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('variant', 'taken_at'), name='uniq_snapshot_variant_time')],
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
@@ -5,9 +5,12 @@ from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from django.utils.text import slugify
+
+from core.slugs import unique_slug
 
 
 class Product(models.Model):
@@ -24,6 +27,8 @@ class Product(models.Model):
     is_featured = models.BooleanField(default=False, db_index=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # também actualizado quando mudam imagens/variantes (ver shop/signals.py)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ("-created_at",)
@@ -33,13 +38,7 @@ class Product(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            base = slugify(self.name)[:200] or "product"
-            candidate = base
-            i = 2
-            while Product.objects.filter(slug=candidate).exclude(pk=self.pk).exists():
-                candidate = f"{base}-{i}"
-                i += 1
-            self.slug = candidate
+            self.slug = unique_slug(Product, self.name, "product", exclude_pk=self.pk)
         super().save(*args, **kwargs)
 
         def get_main_image(self):
@@ -70,6 +69,9 @@ class ProductVariant(models.Model):
     )
 
     stock_qty = models.IntegerField(default=0)
+    # Soma das StockReservation activas; só é alterado por shop.reservations
+    # com UPDATEs condicionais (nunca por save()).
+    reserved_qty = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
 
     class Meta:
@@ -77,6 +79,44 @@ class ProductVariant(models.Model):
             models.UniqueConstraint(fields=["product", "size"], name="uniq_product_size"),
         ]
 
+    @property
+    def available_qty(self) -> int:
+        return max(self.stock_qty - self.reserved_qty, 0)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                if self.stock_qty:
+                    StockMovement.objects.create(
+                        variant=self, kind=StockMovement.Kind.RESTOCK, quantity=self.stock_qty
+                    )
+            return
+
+        # Um save() completo (admin, scripts) não pode repor um reserved_qty lido antes
+        # de uma reserva concorrente: nas actualizações fica de fora.
+        if kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != "reserved_qty"
+            ]
+        if "stock_qty" not in kwargs["update_fields"]:
+            super().save(*args, **kwargs)
+            return
+
+        # stock escrito à mão (admin, scripts): a diferença para o valor actual
+        # na BD entra no ledger como ajuste
+        with transaction.atomic():
+            current = (
+                ProductVariant.objects.select_for_update()
+                .filter(pk=self.pk).values_list("stock_qty", flat=True).first()
+            )
+            super().save(*args, **kwargs)
+            if current is not None and current != self.stock_qty:
+                StockMovement.objects.create(
+                    variant=self, kind=StockMovement.Kind.ADJUST, quantity=self.stock_qty - current
+                )
+
     def get_final_price(self):
         """Retorna o preço específico da variante ou usa o preço do produto."""
         if self.price_override is not None:
@@ -88,19 +128,103 @@ class ProductVariant(models.Model):
         return f"{self.product.name} - {self.size}"
 
 
+class ProductCard(models.Model):
+    """
+    Projeção desnormalizada do card de produto usado na listagem de merch.
+    Mantida por signals (ver shop/signals.py) e reconstruída com
+    `manage.py rebuild_product_cards`.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="card",
+    )
+    name = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=220)
+
+    main_image_url = models.CharField(max_length=500, blank=True)
+    main_image_name = models.CharField(max_length=255, blank=True)  # nome no storage (renditions)
+    sizes = models.CharField(max_length=60, blank=True)  # tamanhos em stock, ex: "L,M,S"
+
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    is_active = models.BooleanField(default=True)
+    is_featured = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            # (created_at, product) para paginação por keyset (ver shop/views.py)
+            models.Index(fields=["is_active", "-created_at", "-product"]),
+            models.Index(fields=["is_active", "is_featured", "-created_at", "-product"]),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def size_list(self):
+        return self.sizes.split(",") if self.sizes else []
+
+    @property
+    def has_price_range(self):
+        return self.min_price != self.max_price
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_line_totals(self):
+        """Anota `unit_price` (price_override ou preço do produto) e `line_total`."""
+        return self.annotate(
+            unit_price=Coalesce("variant__price_override", "variant__product__price"),
+            line_total=ExpressionWrapper(
+                F("quantity") * F("unit_price"),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
+    def totals(self) -> dict:
+        """Nº de linhas, soma das quantidades e total (Decimal) numa só query."""
+        totals = self.with_line_totals().aggregate(
+            n_items=Count("id"),
+            n_units=Coalesce(Sum("quantity"), 0),
+            total=Coalesce(
+                Sum("line_total"),
+                Value(Decimal("0.00")),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+        return {
+            "count": totals["n_items"],
+            "quantity": totals["n_units"],
+            "total": Decimal(totals["total"]).quantize(Decimal("0.01")),
+        }
+
+
+class CartQuerySet(models.QuerySet):
+    def totals(self) -> dict:
+        """Totais agregados dos itens dos carrinhos deste queryset (uma query)."""
+        return CartItem.objects.filter(cart__in=self).totals()
+
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     session_key = models.CharField(max_length=64, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartQuerySet.as_manager()
+
+    def totals(self) -> dict:
+        return self.items.totals()
+
     def get_total_price(self):
-        total = Decimal('0.00')  # Iniciar com Decimal
-        for item in self.items.all():
-            total += item.get_total_price()
-        return total
+        return self.totals()["total"]
 
     def get_total_quantity(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.totals()["quantity"]
 
     def __str__(self):
         return f"Cart {self.id}"
@@ -112,12 +236,17 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=["cart", "variant"], name="uniq_cart_variant"),
         ]
 
     def get_total_price(self):
+        # Usa a anotação de with_line_totals() quando existe (evita ir ao produto)
+        if getattr(self, "line_total", None) is not None:
+            return self.line_total
         # Garantir que retorna Decimal
         price = self.variant.get_final_price()
         if isinstance(price, (int, float)):
@@ -128,6 +257,90 @@ class CartItem(models.Model):
         return f"{self.quantity} x {self.variant}"
 
 
+class StockReservation(models.Model):
+    """
+    Retenção temporária de stock de uma variante por um utilizador (carrinho /
+    checkout). Expira em `expires_at`; as expiradas são libertadas em lote
+    por `manage.py sweep_reservations`.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="stock_reservations")
+    variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name="reservations")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "variant"], name="uniq_reservation_user_variant"),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.variant} ({self.user})"
+
+
+class StockMovement(models.Model):
+    """
+    Ledger de stock, só de acrescentar: cada alteração a ProductVariant.stock_qty
+    escreve aqui o delta (negativo nas vendas). Ver shop/ledger.py.
+    """
+    class Kind(models.TextChoices):
+        SALE = "sale", "Venda"
+        CANCEL = "cancel", "Cancelamento"
+        RESTOCK = "restock", "Reposição"
+        ADJUST = "adjust", "Ajuste manual"
+
+    variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name="movements")
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    quantity = models.IntegerField()
+    order = models.ForeignKey(
+        "Order", on_delete=models.SET_NULL, null=True, blank=True, related_name="stock_movements"
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # saldo numa data = snapshot + movimentos (variant, created_at > snapshot)
+            models.Index(fields=["variant", "created_at"], name="stockmove_variant_time_idx"),
+            models.Index(fields=["created_at"], name="stockmove_time_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.variant} {self.quantity:+d} ({self.kind})"
+
+
+class StockSnapshot(models.Model):
+    """
+    Saldo de cada variante num instante (`taken_at`): a soma dos movimentos
+    com created_at <= taken_at. Tirado periodicamente por `manage.py snapshot_stock`.
+    """
+    variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name="stock_snapshots")
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["variant", "taken_at"], name="uniq_snapshot_variant_time"),
+        ]
+        indexes = [
+            models.Index(fields=["taken_at"], name="stocksnap_time_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.variant} @ {self.taken_at}: {self.quantity}"
+
+
+class Sequence(models.Model):
+    """
+    Contador nomeado (ex: números de encomenda). Cada processo reserva blocos
+    de valores de uma vez; ver shop/sequences.py.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} -> {self.next_value}"
+
+
 class Order(models.Model):
     class FulfillmentMethod(models.TextChoices):
         DELIVERY = "delivery", "Delivery"
@@ -135,6 +348,10 @@ class Order(models.Model):
 
     order_number = models.CharField(max_length=32, unique=True, db_index=True)
 
+    user = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="orders"
+    )
+
     customer_name = models.CharField(max_length=180)
     customer_email = models.EmailField()
     customer_phone = models.CharField(max_length=40, blank=True)
@@ -164,9 +381,20 @@ class Order(models.Model):
     delivery_fee = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
 
+    # Resumo gravado ao criar a encomenda, para o histórico não tocar nos itens
+    item_count = models.PositiveIntegerField(default=0)
+    thumbnail_url = models.CharField(max_length=500, blank=True)
+    item_names = models.CharField(max_length=255, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     placed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # histórico do cliente: WHERE user_id = %s ORDER BY created_at DESC
+            models.Index(fields=["user", "-created_at"], name="order_user_history_idx"),
+        ]
+
     def __str__(self):
         return f"Order #{self.order_number}"
 
@@ -188,3 +416,27 @@ class OrderItem(models.Model):
     def save(self, *args, **kwargs):
         self.total_price = self.unit_price * self.quantity
         super().save(*args, **kwargs)
+
+
+class DailyVariantSales(models.Model):
+    """
+    Vendas por dia (data de colocação da encomenda) e variante, só de
+    encomendas não canceladas. Mantido incrementalmente por shop/rollups.py ao
+    criar/cancelar encomendas; `manage.py rebuild_rollups` recalcula.
+    """
+    date = models.DateField()
+    variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name="daily_sales")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_sales")
+
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # também serve os filtros por intervalo de datas
+            models.UniqueConstraint(fields=["date", "variant"], name="uniq_daily_sales_date_variant"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.variant}: {self.units}"
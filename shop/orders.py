@@ -0,0 +1,204 @@
+"""
+Materialização de uma encomenda a partir do carrinho.
+
+Tudo o que não precisa do lock de escrita (preços, linhas) é preparado antes;
+dentro da transação ficam só instruções em lote, em número fixo seja qual for
+o tamanho do carrinho:
+
+    INSERT order · INSERT order_items (bulk) · SELECT/DELETE reservas ·
+    UPDATE stock (CASE) · DELETE cart_items · INSERT email (outbox) ·
+    rollups de vendas (shop/rollups.py)
+
+As mudanças de estado (`transition_orders`) seguem a mesma ideia: UPDATEs
+condicionais sobre o estado actual e stock devolvido em lote.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Max, Sum, Value, When
+from django.db.models.functions import Lower
+
+from core import mail
+
+from .emails import order_confirmation
+from .models import CartItem, Order, OrderItem, ProductCard
+from .reservations import commit_stock, restore_stock
+from .rollups import record_cancellations, record_order
+
+
+def build_order_items(cart_items) -> list[OrderItem]:
+    """OrderItems por gravar (bulk_create não chama OrderItem.save: total calculado aqui)."""
+    items = []
+    for cart_item in cart_items:
+        unit_price = Decimal(str(cart_item.variant.get_final_price()))
+        items.append(OrderItem(
+            product_variant=cart_item.variant,
+            quantity=cart_item.quantity,
+            unit_price=unit_price,
+            total_price=unit_price * cart_item.quantity,
+        ))
+    return items
+
+
+ITEM_NAMES_MAX = 255
+BACKFILL_BATCH_SIZE = 500
+TRANSITION_BATCH_SIZE = 500
+
+# estado destino -> estados de onde se pode lá chegar
+ORDER_TRANSITIONS = {
+    "confirmed": ("pending",),
+    "cancelled": ("pending",),
+}
+
+
+def _thumbnails(product_ids) -> dict[int, str]:
+    return dict(
+        ProductCard.objects.filter(product_id__in=set(product_ids))
+        .exclude(main_image_url="")
+        .values_list("product_id", "main_image_url")
+    )
+
+
+def order_summary(lines, thumbnails: dict[int, str]) -> dict:
+    """
+    Campos de resumo da encomenda (item_count, thumbnail_url, item_names).
+    `lines` = [(product_id, nome, quantidade)] pela ordem dos itens.
+    """
+    lines = list(lines)
+    names = ", ".join(dict.fromkeys(name for _, name, _ in lines))
+    if len(names) > ITEM_NAMES_MAX:
+        names = names[:ITEM_NAMES_MAX - 1] + "…"
+    return {
+        "item_count": sum(quantity for _, _, quantity in lines),
+        "thumbnail_url": next((thumbnails[pid] for pid, _, _ in lines if pid in thumbnails), ""),
+        "item_names": names,
+    }
+
+
+def place_order(user_id: int, cart_id: int, cart_items, **order_fields) -> Order:
+    """
+    Cria a encomenda, as linhas, baixa o stock e põe a confirmação no outbox
+    numa transação curta.
+    `cart_items` já avaliados com select_related("variant__product").
+    Levanta reservations.InsufficientStock (com rollback) se faltar stock.
+    """
+    cart_items = list(cart_items)
+    items = build_order_items(cart_items)
+    lines = [(ci.variant.product_id, ci.variant.product.name, ci.quantity) for ci in cart_items]
+    order = Order(
+        user_id=user_id,
+        **order_summary(lines, _thumbnails(pid for pid, _, _ in lines)),
+        **order_fields,
+    )
+    email = order_confirmation(order)
+
+    with transaction.atomic():
+        order.save()
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        record_order(order, items)
+
+        commit_stock(user_id, [(ci.variant, ci.quantity) for ci in cart_items], order_id=order.pk)
+
+        CartItem.objects.filter(cart_id=cart_id).delete()
+
+        # mesma transação: sem encomenda não há email, com encomenda há sempre
+        mail.enqueue(**email)
+
+    return order
+
+
+def _link_users(orders) -> int:
+    """Liga encomendas sem user ao utilizador com o mesmo email (ignora emails ambíguos)."""
+    emails = {email.lower() for _, email in orders}
+    matches = (
+        User.objects.annotate(email_lower=Lower("email"))
+        .filter(email_lower__in=emails)
+        .values("email_lower")
+        .annotate(n=Count("id"), user_id=Max("id"))
+        .filter(n=1)
+        .values_list("email_lower", "user_id")
+    )
+    user_by_email = dict(matches)
+    owners = {pk: user_by_email[email.lower()] for pk, email in orders if email.lower() in user_by_email}
+    if not owners:
+        return 0
+    return Order.objects.filter(pk__in=owners).update(
+        user_id=Case(*[When(pk=pk, then=Value(uid)) for pk, uid in owners.items()],
+                     output_field=IntegerField())
+    )
+
+
+def _summarize(order_ids) -> int:
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by("order_id", "id")
+        .values_list("order_id", "product_variant__product_id",
+                     "product_variant__product__name", "quantity")
+    )
+    lines = {}
+    for order_id, product_id, name, quantity in rows:
+        lines.setdefault(order_id, []).append((product_id, name, quantity))
+    thumbnails = _thumbnails(pid for order_lines in lines.values() for pid, _, _ in order_lines)
+
+    orders = [Order(pk=order_id, **order_summary(order_lines, thumbnails))
+              for order_id, order_lines in lines.items()]
+    Order.objects.bulk_update(orders, ["item_count", "thumbnail_url", "item_names"])
+    return len(orders)
+
+
+def backfill_order_history(batch_size: int = BACKFILL_BATCH_SIZE) -> tuple[int, int]:
+    """
+    Preenche, em lotes por pk, o user (pelo email) e o resumo das encomendas
+    antigas. Idempotente. Devolve (encomendas ligadas, resumos gravados).
+    """
+    linked = summarized = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            Order.objects.filter(pk__gt=last_pk).order_by("pk")
+            .values_list("pk", "customer_email", "user_id", "item_count")[:batch_size]
+        )
+        if not batch:
+            return linked, summarized
+        last_pk = batch[-1][0]
+        with transaction.atomic():
+            linked += _link_users([(pk, email) for pk, email, user_id, _ in batch if user_id is None])
+            summarized += _summarize([pk for pk, _, _, item_count in batch if not item_count])
+
+
+def _restore_order_stock(order_ids) -> None:
+    restore_stock(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values("order_id", "product_variant_id", "product_variant__product_id")
+        .annotate(quantity=Sum("quantity"))
+        .order_by()
+        .values_list("order_id", "product_variant_id", "product_variant__product_id", "quantity")
+    )
+
+
+def transition_orders(queryset, status: str) -> int:
+    """
+    Passa para `status` as encomendas do queryset em que a transição é válida,
+    com UPDATE ... WHERE status IN (origens): nunca há ler-verificar-gravar em
+    Python, por isso duas chamadas concorrentes não transitam a mesma encomenda.
+    Cancelar devolve o stock, num UPDATE por lote. Devolve quantas mudaram.
+    """
+    sources = ORDER_TRANSITIONS[status]
+    if status != "cancelled":
+        return queryset.filter(status__in=sources).update(status=status)
+
+    changed = 0
+    with transaction.atomic():
+        # lock nas linhas (PostgreSQL); no SQLite a transação IMMEDIATE já serializa
+        ids = list(queryset.select_for_update().filter(status__in=sources).values_list("pk", flat=True))
+        for start in range(0, len(ids), TRANSITION_BATCH_SIZE):
+            batch = ids[start:start + TRANSITION_BATCH_SIZE]
+            changed += Order.objects.filter(pk__in=batch, status__in=sources).update(status=status)
+            _restore_order_stock(batch)
+            record_cancellations(batch)
+    return changed
@@ -0,0 +1,266 @@
+"""
+Reservas de stock (holds) com TTL.
+
+`ProductVariant.reserved_qty` é a soma das StockReservation ainda não
+libertadas; o disponível para os outros clientes é `stock_qty - reserved_qty`.
+Todas as alterações ao stock/reservado são UPDATEs condicionais numa única
+instrução, por isso checkouts concorrentes não reservam nem vendem a mesma
+unidade:
+
+    UPDATE shop_productvariant SET reserved_qty = reserved_qty + n
+     WHERE id = %s AND stock_qty >= reserved_qty + n
+
+As reservas são colocadas quando um utilizador autenticado põe/actualiza
+itens no carrinho e renovadas ao abrir o checkout. As expiradas são libertadas
+em lote por `release_expired()` (`manage.py sweep_reservations`, no cron).
+Carrinhos de visitantes (cookie) não reservam: só no checkout, já com login.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from . import ledger
+from .cache import CATALOGUE_NAMESPACES, bump_namespaces
+from .cards import refresh_product_cards
+from .models import CartItem, Product, ProductVariant, StockMovement, StockReservation
+
+SWEEP_BATCH_SIZE = 500
+
+
+class _PartialUpdate(Exception):
+    pass
+
+
+class InsufficientStock(Exception):
+    def __init__(self, variant_ids):
+        self.variant_ids = list(variant_ids)
+        super().__init__(f"Stock insuficiente para as variantes {self.variant_ids}")
+
+
+def hold_ttl() -> timedelta:
+    return timedelta(minutes=getattr(settings, "STOCK_HOLD_MINUTES", 15))
+
+
+def _case(amounts: dict[int, int]) -> Case:
+    """CASE id WHEN .. THEN n END, para UPDATEs de várias variantes numa instrução."""
+    return Case(
+        *[When(pk=pk, then=Value(n)) for pk, n in amounts.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _shrink(amounts: dict[int, int]) -> None:
+    """Retira `amounts[variant_id]` ao reservado de várias variantes num só UPDATE."""
+    if not amounts:
+        return
+    ProductVariant.objects.filter(pk__in=amounts).update(reserved_qty=F("reserved_qty") - _case(amounts))
+
+
+def _sum_by_variant(rows) -> dict[int, int]:
+    amounts = {}
+    for variant_id, quantity in rows:
+        amounts[variant_id] = amounts.get(variant_id, 0) + quantity
+    return amounts
+
+
+def available_for(user_id: int, variant_id: int) -> int:
+    """Unidades que este utilizador pode ter: livre + o que já tem reservado."""
+    variant = ProductVariant.objects.only("stock_qty", "reserved_qty").get(pk=variant_id)
+    held = (
+        StockReservation.objects.filter(user_id=user_id, variant_id=variant_id)
+        .values_list("quantity", flat=True)
+        .first()
+    ) or 0
+    return max(variant.stock_qty - variant.reserved_qty + held, 0)
+
+
+def _grow_many(amounts: dict[int, int]) -> set[int]:
+    """
+    Soma `amounts[variant_id]` ao reservado de várias variantes: uma leitura
+    (com lock) do stock livre e um UPDATE condicional com CASE para as que o
+    têm. Devolve as que não tinham stock livre, que ficam como estavam.
+    """
+    if not amounts:
+        return set()
+    free = dict(
+        ProductVariant.objects.select_for_update()
+        .filter(pk__in=amounts)
+        .values_list("pk", F("stock_qty") - F("reserved_qty"))
+    )
+    failed = {pk for pk, n in amounts.items() if free.get(pk, 0) < n}
+    ok = {pk: n for pk, n in amounts.items() if pk not in failed}
+    if ok:
+        ProductVariant.objects.filter(pk__in=ok, stock_qty__gte=F("reserved_qty") + _case(ok)).update(
+            reserved_qty=F("reserved_qty") + _case(ok)
+        )
+    return failed
+
+
+@transaction.atomic
+def hold_many(user_id: int, quantities: dict[int, int]) -> set[int]:
+    """
+    Fixa as reservas do utilizador em `quantities` ({variant_id: quantidade},
+    0 liberta) e renova o prazo, com o mesmo nº de queries para 1 ou 50
+    variantes. Devolve as variantes sem stock livre, que ficam como estavam.
+    """
+    if not quantities:
+        return set()
+    current = {
+        r.variant_id: r
+        for r in StockReservation.objects.select_for_update().filter(user_id=user_id, variant_id__in=quantities)
+    }
+    deltas = {pk: q - (current[pk].quantity if pk in current else 0) for pk, q in quantities.items()}
+
+    grow = {pk: d for pk, d in deltas.items() if d > 0}
+    failed = _grow_many(grow)
+    # reservas expiradas ainda por varrer podem estar a ocupar o stock
+    if failed and release_expired(variant_ids=failed, exclude_user_id=user_id):
+        failed = _grow_many({pk: grow[pk] for pk in failed})
+    _shrink({pk: -d for pk, d in deltas.items() if d < 0})
+
+    held = {pk: q for pk, q in quantities.items() if pk not in failed}
+    expires_at = timezone.now() + hold_ttl()
+    StockReservation.objects.filter(
+        pk__in=[current[pk].pk for pk, q in held.items() if q <= 0 and pk in current]
+    ).delete()
+    renewed = {current[pk].pk: q for pk, q in held.items() if q > 0 and pk in current}
+    if renewed:
+        StockReservation.objects.filter(pk__in=renewed).update(quantity=_case(renewed), expires_at=expires_at)
+    StockReservation.objects.bulk_create([
+        StockReservation(user_id=user_id, variant_id=pk, quantity=q, expires_at=expires_at)
+        for pk, q in held.items()
+        if q > 0 and pk not in current
+    ])
+    return failed
+
+
+def hold(user_id: int, variant_id: int, quantity: int) -> bool:
+    """
+    Fixa a reserva do utilizador para a variante em `quantity` (0 liberta) e
+    renova o prazo. Devolve False, sem alterar nada, se não houver stock livre.
+    """
+    return not hold_many(user_id, {variant_id: quantity})
+
+
+@transaction.atomic
+def release(user_id: int, variant_ids=None) -> int:
+    """Liberta as reservas do utilizador (todas ou só destas variantes)."""
+    qs = StockReservation.objects.select_for_update().filter(user_id=user_id)
+    if variant_ids is not None:
+        qs = qs.filter(variant_id__in=variant_ids)
+    rows = list(qs.values_list("id", "variant_id", "quantity"))
+    if not rows:
+        return 0
+    _shrink(_sum_by_variant((v, q) for _, v, q in rows))
+    StockReservation.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+    return len(rows)
+
+
+def hold_cart(user_id: int) -> list:
+    """
+    (Re)coloca reservas para todo o carrinho, ex: ao abrir o checkout.
+    Devolve os CartItem que não foi possível reservar.
+    """
+    items = list(CartItem.objects.filter(cart__user_id=user_id).select_related("variant__product"))
+    failed = hold_many(user_id, {item.variant_id: item.quantity for item in items})
+    return [item for item in items if item.variant_id in failed]
+
+
+def release_expired(now=None, variant_ids=None, exclude_user_id=None,
+                    batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """
+    Liberta em lote as reservas expiradas: por lote, um UPDATE com CASE no
+    reservado das variantes e um DELETE. Devolve quantas foram libertadas.
+    """
+    now = now or timezone.now()
+    qs = StockReservation.objects.filter(expires_at__lte=now)
+    if variant_ids is not None:
+        qs = qs.filter(variant_id__in=variant_ids)
+    if exclude_user_id is not None:
+        qs = qs.exclude(user_id=exclude_user_id)
+
+    released = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                qs.select_for_update().order_by("pk").values_list("id", "variant_id", "quantity")[:batch_size]
+            )
+            if not rows:
+                return released
+            _shrink(_sum_by_variant((v, q) for _, v, q in rows))
+            StockReservation.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+        released += len(rows)
+
+
+def _stock_changed(product_ids) -> None:
+    # os UPDATEs não disparam signals: cards, detalhe e cache à mão
+    product_ids = list(set(product_ids))
+    refresh_product_cards(product_ids)
+    Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+    bump_namespaces(*CATALOGUE_NAMESPACES)
+
+
+def commit_stock(user_id: int, lines, order_id: int | None = None) -> None:
+    """
+    Baixa o stock de uma encomenda, consumindo as reservas do utilizador, num
+    único UPDATE com CASE para todas as variantes:
+
+        UPDATE ... SET stock_qty = stock_qty - CASE id WHEN .. THEN n END,
+                       reserved_qty = reserved_qty - CASE id WHEN .. THEN held END
+         WHERE id IN (...) AND stock_qty >= n AND stock_qty >= reserved_qty - held + n
+
+    `lines` = [(variant, quantidade)]. Tem de correr dentro da transação da
+    encomenda; se alguma variante já não tiver stock levanta InsufficientStock.
+    As saídas ficam no ledger (StockMovement) ligadas a `order_id`.
+    """
+    lines = list(lines)
+    need = _sum_by_variant((variant.pk, n) for variant, n in lines)
+    reservations = StockReservation.objects.filter(user_id=user_id, variant_id__in=need)
+    held = dict(reservations.select_for_update().values_list("variant_id", "quantity"))
+    held_case = _case({pk: held.get(pk, 0) for pk in need})
+    need_case = _case(need)
+
+    # livre para nós = stock - reservado pelos outros = stock - (reserved - held)
+    enough = Q(stock_qty__gte=need_case) & Q(stock_qty__gte=F("reserved_qty") - held_case + need_case)
+    try:
+        with transaction.atomic():
+            updated = ProductVariant.objects.filter(enough, pk__in=need).update(
+                stock_qty=F("stock_qty") - need_case,
+                reserved_qty=F("reserved_qty") - held_case,
+            )
+            if updated != len(need):
+                raise _PartialUpdate
+    except _PartialUpdate:
+        # o savepoint desfez as linhas que passaram; só agora se lê quais falharam
+        failed = ProductVariant.objects.filter(pk__in=need).exclude(enough).values_list("pk", flat=True)
+        raise InsufficientStock(list(failed) or list(need))
+
+    reservations.delete()
+    ledger.record(StockMovement.Kind.SALE, {pk: -n for pk, n in need.items()}, order_id=order_id)
+    product_ids = [variant.product_id for variant, _ in lines]
+    transaction.on_commit(lambda: _stock_changed(product_ids))
+
+
+def restore_stock(rows) -> None:
+    """
+    Devolve ao stock as unidades de encomendas canceladas num só UPDATE com
+    CASE, e regista-as no ledger. `rows` = [(order_id, variant_id, product_id,
+    quantidade)]. Corre dentro da transação de quem chama.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    amounts = _sum_by_variant((variant_id, quantity) for _, variant_id, _, quantity in rows)
+    ProductVariant.objects.filter(pk__in=amounts).update(stock_qty=F("stock_qty") + _case(amounts))
+    ledger.record_rows(
+        StockMovement.Kind.CANCEL,
+        [(variant_id, quantity, order_id) for order_id, variant_id, _, quantity in rows],
+    )
+    product_ids = [product_id for _, _, product_id, _ in rows]
+    transaction.on_commit(lambda: _stock_changed(product_ids))
@@ -0,0 +1,191 @@
+"""
+Rollups diários de vendas (DailyVariantSales).
+
+Mantidos na mesma transação que muda as vendas, com deltas agregados por
+(dia, variante) e um número fixo de instruções por encomenda ou lote:
+
+    SELECT chaves existentes · UPDATE ... SET units = units + CASE ... ·
+    INSERT (bulk) das chaves novas
+
+- `place_order` soma a encomenda (`record_order`);
+- cancelar subtrai (`record_cancellations`), no dia em que foi colocada;
+- confirmar não mexe: pending e confirmed contam ambos como venda.
+
+O dashboard lê só esta tabela (uma linha por dia e variante), por isso o custo
+de um intervalo de datas não cresce com o nº de encomendas. `rebuild_rollups()`
+recalcula a partir de OrderItem (backfill, ou depois de apagar encomendas).
+"""
+from __future__ import annotations
+
+import operator
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import reduce
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyVariantSales, OrderItem, Product
+
+APPLY_BATCH_SIZE = 200
+REBUILD_BATCH_SIZE = 1000
+
+# (dia, variant_id) -> [product_id, unidades, receita, encomendas]
+Deltas = dict[tuple[date, int], list]
+
+
+def _add(deltas: Deltas, day, variant_id, product_id, units, revenue, orders) -> None:
+    row = deltas.setdefault((day, variant_id), [product_id, 0, Decimal("0.00"), 0])
+    row[1] += units
+    row[2] += revenue
+    row[3] += orders
+
+
+def _case(keys, deltas: Deltas, index: int, output_field):
+    return Case(
+        *[When(date=day, variant_id=vid, then=Value(deltas[(day, vid)][index])) for day, vid in keys],
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
+def _update(keys, deltas: Deltas) -> None:
+    for start in range(0, len(keys), APPLY_BATCH_SIZE):
+        batch = keys[start:start + APPLY_BATCH_SIZE]
+        match = reduce(operator.or_, (Q(date=day, variant_id=vid) for day, vid in batch))
+        DailyVariantSales.objects.filter(match).update(
+            units=F("units") + _case(batch, deltas, 1, IntegerField()),
+            revenue=F("revenue") + _case(batch, deltas, 2, DecimalField(max_digits=14, decimal_places=2)),
+            orders=F("orders") + _case(batch, deltas, 3, IntegerField()),
+        )
+
+
+def apply_deltas(deltas: Deltas) -> None:
+    """Soma os deltas aos rollups: UPDATE para as chaves que existem, INSERT para as outras."""
+    if not deltas:
+        return
+    days = {day for day, _ in deltas}
+    variant_ids = {vid for _, vid in deltas}
+    existing = set(
+        DailyVariantSales.objects.filter(date__in=days, variant_id__in=variant_ids)
+        .values_list("date", "variant_id")
+    ) & deltas.keys()
+    missing = [key for key in deltas if key not in existing]
+
+    _update(sorted(existing), deltas)
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            DailyVariantSales.objects.bulk_create([
+                DailyVariantSales(date=day, variant_id=vid, product_id=deltas[(day, vid)][0],
+                                  units=deltas[(day, vid)][1], revenue=deltas[(day, vid)][2],
+                                  orders=deltas[(day, vid)][3])
+                for day, vid in missing
+            ])
+    except IntegrityError:
+        # outra transação criou a linha entretanto: agora já é um UPDATE
+        _update(missing, deltas)
+
+
+def record_order(order, items) -> None:
+    """Soma uma encomenda acabada de criar (`items` = OrderItems com product_variant)."""
+    day = timezone.localdate(order.placed_at or timezone.now())
+    deltas: Deltas = {}
+    for item in items:
+        _add(deltas, day, item.product_variant_id, item.product_variant.product_id,
+             item.quantity, item.total_price, 0)
+    for row in deltas.values():
+        row[3] = 1
+    apply_deltas(deltas)
+
+
+def _sales_by_day(items):
+    return (
+        items.annotate(day=TruncDate(Coalesce("order__placed_at", "order__created_at")))
+        .values("day", "product_variant_id", "product_variant__product_id")
+        .annotate(n_units=Sum("quantity"), n_revenue=Sum("total_price"),
+                  n_orders=Count("order_id", distinct=True))
+        .order_by()
+    )
+
+
+def record_cancellations(order_ids) -> None:
+    """Subtrai encomendas canceladas (uma query de agregação + apply_deltas)."""
+    deltas: Deltas = {}
+    for row in _sales_by_day(OrderItem.objects.filter(order_id__in=order_ids)):
+        _add(deltas, row["day"], row["product_variant_id"], row["product_variant__product_id"],
+             -row["n_units"], -row["n_revenue"], -row["n_orders"])
+    apply_deltas(deltas)
+
+
+def rebuild_rollups(since: date | None = None, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """Recalcula os rollups (todos ou a partir de `since`) a partir de OrderItem."""
+    rollups = DailyVariantSales.objects.all()
+    sales = _sales_by_day(OrderItem.objects.exclude(order__status="cancelled"))
+    if since is not None:
+        rollups = rollups.filter(date__gte=since)
+        sales = sales.filter(day__gte=since)
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in sales.iterator(chunk_size=batch_size):
+            batch.append(DailyVariantSales(
+                date=row["day"],
+                variant_id=row["product_variant_id"],
+                product_id=row["product_variant__product_id"],
+                units=row["n_units"],
+                revenue=row["n_revenue"],
+                orders=row["n_orders"],
+            ))
+            if len(batch) >= batch_size:
+                DailyVariantSales.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        DailyVariantSales.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def sales_report(start: date, end: date, top: int = 10) -> dict:
+    """
+    Dados do dashboard de vendas entre `start` e `end` (inclusive), só a
+    partir dos rollups: série diária (dias sem vendas a zero), totais e top
+    de produtos por receita.
+    """
+    rows = DailyVariantSales.objects.filter(date__range=(start, end))
+
+    per_day = {
+        row["date"]: row
+        for row in rows.values("date").annotate(n_units=Sum("units"), n_revenue=Sum("revenue")).order_by()
+    }
+    days = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = per_day.get(day, {})
+        days.append({
+            "date": day,
+            "units": row.get("n_units") or 0,
+            "revenue": row.get("n_revenue") or Decimal("0.00"),
+        })
+
+    products = list(
+        rows.values("product_id")
+        .annotate(n_units=Sum("units"), n_revenue=Sum("revenue"))
+        .filter(n_units__gt=0)
+        .order_by("-n_revenue")[:top]
+    )
+    names = dict(Product.objects.filter(pk__in=[p["product_id"] for p in products]).values_list("pk", "name"))
+    for p in products:
+        p["name"] = names.get(p["product_id"], "")
+
+    return {
+        "days": days,
+        "products": products,
+        "units": sum(d["units"] for d in days),
+        "revenue": sum((d["revenue"] for d in days), Decimal("0.00")),
+    }
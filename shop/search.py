@@ -0,0 +1,220 @@
+"""
+Pesquisa de produtos com um índice invertido SQLite FTS5.
+
+A tabela virtual `shop_product_fts` (rowid = Product.id) guarda nome,
+descrição e tamanhos das variantes activas, já normalizados para português
+(minúsculas, sem acentos, plurais simples reduzidos ao singular). Tem índices
+de prefixo para a pesquisa "à medida que se escreve". É mantida pelos signals
+de Product/ProductVariant (ver shop/signals.py) e reconstruída com
+`manage.py rebuild_product_search`.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "shop_product_fts"
+FTS_COLUMNS = ("name", "description", "sizes")
+
+# Pesos bm25 por coluna: nome >> tamanhos > descrição.
+BM25_WEIGHTS = (10.0, 1.0, 2.0)
+
+MAX_RESULTS = 500
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Plurais regulares do português -> singular (aplicado só a palavras > 3 letras).
+_PLURAL_RULES = (
+    ("oes", "ao"),
+    ("aes", "ao"),
+    ("ais", "al"),
+    ("eis", "el"),
+    ("ois", "ol"),
+    ("uis", "ul"),
+    ("ns", "m"),
+    ("res", "r"),
+    ("zes", "z"),
+    ("ses", "s"),
+    ("s", ""),
+)
+
+_INSERT_SQL = (
+    f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+    f"VALUES (%s, %s, %s, %s)"
+)
+
+
+def fts_available() -> bool:
+    return connection.vendor == "sqlite"
+
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _singular(token: str) -> str:
+    if len(token) <= 3:
+        return token
+    for suffix, replacement in _PLURAL_RULES:
+        if token.endswith(suffix):
+            return token[: -len(suffix)] + replacement
+    return token
+
+
+def normalize_tokens(text: str) -> list[str]:
+    text = _strip_accents((text or "").lower())
+    return [_singular(t) for t in _TOKEN_RE.findall(text)]
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(normalize_tokens(text))
+
+
+def build_match_query(q: str) -> str:
+    """
+    Expressão MATCH segura: cada palavra normalizada entre aspas com prefixo (*),
+    todas obrigatórias. Devolve "" se não houver palavras.
+    """
+    return " ".join(f'"{t}"*' for t in normalize_tokens(q))
+
+
+def _document(product, sizes) -> list:
+    return [
+        product.pk,
+        normalize_text(product.name),
+        normalize_text(product.description),
+        " ".join(s.lower() for s in sizes),
+    ]
+
+
+def index_product(product) -> None:
+    from .models import ProductVariant
+
+    if not fts_available():
+        return
+    sizes = (
+        ProductVariant.objects.filter(product_id=product.pk, is_active=True)
+        .order_by("size")
+        .values_list("size", flat=True)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+        cursor.execute(_INSERT_SQL, _document(product, sizes))
+
+
+def index_product_id(product_id: int) -> None:
+    from .models import Product
+
+    product = Product.objects.filter(pk=product_id).only("pk", "name", "description").first()
+    if product is None:
+        unindex_product(product_id)
+    else:
+        index_product(product)
+
+
+def unindex_product(pk: int) -> None:
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+
+def search_product_ids(q: str, limit: int = MAX_RESULTS):
+    """
+    IDs dos produtos que correspondem a `q`, do mais para o menos relevante (bm25),
+    cortados em `limit`. As listagens usam order_by_relevance (sem limite).
+    Devolve None quando o FTS não está disponível.
+    """
+    if not fts_available():
+        return None
+
+    match = build_match_query(q)
+    if not match:
+        return []
+
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def order_by_relevance(qs, q: str):
+    """
+    Filtra `qs` (Product ou ProductCard, rowid = id do produto) pelos produtos
+    que correspondem a `q`, sem limite, e ordena por bm25 em SQL (junção com a
+    tabela FTS). Devolve None quando o FTS não está disponível.
+    """
+    if not fts_available():
+        return None
+
+    match = build_match_query(q)
+    if not match:
+        return qs.none()
+
+    meta = qs.model._meta
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    return qs.extra(
+        tables=[FTS_TABLE],
+        where=[f"{FTS_TABLE}.rowid = {meta.db_table}.{meta.pk.column}", f"{FTS_TABLE} MATCH %s"],
+        params=[match],
+    ).order_by(RawSQL(f"bm25({FTS_TABLE}, {weights})", []).asc(), f"-{meta.pk.attname}")
+
+
+def _index_chunk(cursor, chunk) -> None:
+    from .models import Product, ProductVariant
+
+    sizes = {}
+    for product_id, size in (
+        ProductVariant.objects.filter(product_id__in=chunk, is_active=True)
+        .order_by("size")
+        .values_list("product_id", "size")
+    ):
+        sizes.setdefault(product_id, []).append(size)
+
+    products = Product.objects.filter(pk__in=chunk).only("pk", "name", "description")
+    cursor.executemany(
+        _INSERT_SQL,
+        [_document(p, sizes.get(p.pk, [])) for p in products],
+    )
+
+
+def index_products(product_ids, batch_size: int = 1000) -> None:
+    """Reindexa vários produtos de uma vez (ex: depois de um bulk_create)."""
+    if not fts_available():
+        return
+
+    product_ids = list(product_ids)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(product_ids), batch_size):
+            chunk = product_ids[start:start + batch_size]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+            _index_chunk(cursor, chunk)
+
+
+def rebuild_index(batch_size: int = 1000) -> int:
+    from .models import Product
+
+    if not fts_available():
+        return 0
+
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+        ids = list(Product.objects.order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            _index_chunk(cursor, chunk)
+            total += len(chunk)
+
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return total
@@ -0,0 +1,75 @@
+"""
+Sequências com reserva de blocos (hi/lo) para os números de encomenda.
+
+Cada processo reserva `block_size` valores de uma vez com um único UPDATE na
+linha da sequência (`next_value = next_value + block_size`) e vai-os
+entregando da memória. A tabela de encomendas nunca é bloqueada nem lida
+para gerar o número; a linha da sequência só é tocada uma vez por bloco.
+
+Os números são únicos e crescentes por processo, mas não contíguos entre
+processos, e um reinício perde o resto do bloco (ficam buracos na numeração).
+"""
+from __future__ import annotations
+
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Sequence
+
+ORDER_NUMBER_SEQUENCE = "order_number"
+
+
+class BlockSequence:
+    def __init__(self, name: str, block_size: int | None = None):
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0  # exclusivo
+        self._pid = None
+
+    def _size(self) -> int:
+        return self.block_size or getattr(settings, "ORDER_NUMBER_BLOCK_SIZE", 20)
+
+    def _reserve_block(self) -> None:
+        # Tem de ser commitado logo: se fizesse parte da transação da encomenda,
+        # um rollback devolvia o bloco e outro processo voltava a recebê-lo.
+        if connection.in_atomic_block:
+            raise RuntimeError(
+                f"A sequência {self.name!r} tem de reservar blocos fora de transaction.atomic()."
+            )
+
+        size = self._size()
+        with transaction.atomic():
+            updated = Sequence.objects.filter(name=self.name).update(next_value=F("next_value") + size)
+            if not updated:
+                Sequence.objects.get_or_create(name=self.name, defaults={"next_value": 1})
+                Sequence.objects.filter(name=self.name).update(next_value=F("next_value") + size)
+            end = Sequence.objects.values_list("next_value", flat=True).get(name=self.name)
+
+        self._next, self._end, self._pid = end - size, end, os.getpid()
+
+    def next(self) -> int:
+        with self._lock:
+            # depois de um fork (gunicorn --preload) o bloco herdado é do pai
+            if self._next >= self._end or self._pid != os.getpid():
+                self._reserve_block()
+            value = self._next
+            self._next += 1
+            return value
+
+
+order_numbers = BlockSequence(ORDER_NUMBER_SEQUENCE)
+
+
+def format_order_number(n: int) -> str:
+    return f"PLA-{n:04d}"
+
+
+def next_order_number() -> str:
+    """PLA-0001, PLA-0002... Chamar fora da transação da encomenda."""
+    return format_order_number(order_numbers.next())
@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import CATALOGUE_NAMESPACES, bump_namespaces
+from .cards import refresh_product_card
+from .search import index_product, index_product_id, unindex_product
+from .models import Product, ProductImage, ProductVariant
+
+
+def _deleting_product(origin) -> bool:
+    """
+    True quando o delete vem em cascata de um Product: o card é apagado junto
+    e não deve ser recriado pelos signals dos filhos.
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model is Product
+    return isinstance(origin, Product)
+
+
+# -------------------------
+# ProductCard (listagem de merch)
+# -------------------------
+@receiver(post_save, sender=Product)
+def product_saved_refresh_card(sender, instance, **kwargs):
+    refresh_product_card(instance.pk)
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+def product_child_saved_refresh_card(sender, instance, **kwargs):
+    refresh_product_card(instance.product_id)
+
+
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_delete, sender=ProductImage)
+def product_child_deleted_refresh_card(sender, instance, origin=None, **kwargs):
+    if _deleting_product(origin):
+        return
+    refresh_product_card(instance.product_id)
+
+
+# -------------------------
+# Cache de páginas do catálogo
+# -------------------------
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def catalogue_changed_bump_cache(sender, **kwargs):
+    # depois do commit: antes disso outro pedido podia pôr em cache os dados antigos
+    transaction.on_commit(lambda: bump_namespaces(*CATALOGUE_NAMESPACES))
+
+
+# -------------------------
+# Índice de pesquisa de produtos
+# -------------------------
+@receiver(post_save, sender=Product)
+def product_saved_index(sender, instance, **kwargs):
+    index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted_unindex(sender, instance, **kwargs):
+    unindex_product(instance.pk)
+
+
+@receiver(post_save, sender=ProductVariant)
+def variant_saved_reindex(sender, instance, update_fields=None, **kwargs):
+    # só o stock mudou (ex: checkout): os tamanhos indexados não mudam
+    if update_fields is not None and set(update_fields) <= {"stock_qty"}:
+        return
+    index_product_id(instance.product_id)
+
+
+@receiver(post_delete, sender=ProductVariant)
+def variant_deleted_reindex(sender, instance, origin=None, **kwargs):
+    if _deleting_product(origin):
+        return
+    index_product_id(instance.product_id)
+
+
+# -------------------------
+# Product.updated_at (GET condicional do detalhe)
+# -------------------------
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_child_changed_touch(sender, instance, **kwargs):
+    # update() não dispara post_save do Product
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
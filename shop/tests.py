@@ -1,3 +1,567 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.db.models import F, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import EmailOutbox
+
+from . import ledger, reservations
+from .cards import rebuild_product_cards
+from .exports import CSV_HEADER, export_lines
+from .importer import CatalogueImporter, iter_jsonl
+from .models import (
+    Cart, CartItem, DailyVariantSales, Order, OrderItem, Product, ProductCard, ProductImage, ProductVariant,
+    Sequence, StockMovement, StockReservation,
+)
+from .orders import place_order, transition_orders
+from .rollups import rebuild_rollups, record_order, sales_report
+from .search import MAX_RESULTS, fts_available, rebuild_index, search_product_ids
+from .sequences import BlockSequence, next_order_number
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def make_variants(n, prefix="p", stock=100, **kwargs):
+    products = Product.objects.bulk_create([
+        Product(name=f"{prefix} {i}", slug=f"{prefix}-{i}", price=Decimal("150.00") + i)
+        for i in range(n)
+    ])
+    return ProductVariant.objects.bulk_create([
+        ProductVariant(product=p, size="M", stock_qty=stock,
+                       price_override=Decimal("99.90") if i % 3 == 0 else None, **kwargs)
+        for i, p in enumerate(products)
+    ])
+
+
+def make_cart(user, variants):
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.bulk_create([CartItem(cart=cart, variant=v, quantity=1 + i % 4) for i, v in enumerate(variants)])
+    return cart
+
+
+@override_settings(CACHES=LOCMEM)
+class CartTotalsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cliente", email="cliente@example.com")
+
+    def test_totals_in_one_query(self):
+        variants = make_variants(20)
+        cart = make_cart(self.user, variants)
+        expected_total = sum(v.get_final_price() * (1 + i % 4) for i, v in enumerate(variants))
+        expected_quantity = sum(1 + i % 4 for i in range(20))
+
+        with self.assertNumQueries(1):
+            totals = cart.totals()
+        self.assertEqual(totals["total"], expected_total)
+        self.assertEqual(totals["quantity"], expected_quantity)
+
+    def test_empty_cart_totals(self):
+        cart = Cart.objects.create(user=self.user)
+        with self.assertNumQueries(1):
+            totals = cart.totals()
+        self.assertEqual((totals["total"], totals["quantity"]), (0, 0))
+
+    def _cart_page_queries(self, n):
+        user = User.objects.create_user(f"cliente-{n}")
+        variants = make_variants(n, prefix=f"c{n}")
+        ProductImage.objects.bulk_create([ProductImage(product_id=v.product_id, image=f"shop/products/{v.pk}.jpg")
+                                          for v in variants])
+        make_cart(user, variants)
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("shop:cart_detail"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_cart_page_queries_do_not_grow_with_items(self):
+        self.assertEqual(self._cart_page_queries(1), self._cart_page_queries(25))
+
+    def test_cart_page_query_count(self):
+        make_cart(self.user, make_variants(10))
+        self.client.force_login(self.user)
+        self.client.get(reverse("shop:cart_detail"))
+        # sessão, utilizador, carrinho, itens, imagens, totais (o resumo do header já está em cache)
+        with self.assertNumQueries(6):
+            self.client.get(reverse("shop:cart_detail"))
+
+    def test_guest_cart_page_shows_first_image(self):
+        variants = make_variants(2, prefix="g")
+        for v in variants:
+            ProductImage.objects.create(product_id=v.product_id, image=f"shop/products/{v.pk}-a.jpg")
+            ProductImage.objects.create(product_id=v.product_id, image=f"shop/products/{v.pk}-b.jpg")
+            self.client.post(reverse("shop:add_to_cart"), {"variant_id": v.pk, "quantity": 1})
+
+        response = self.client.get(reverse("shop:cart_detail"))
+        for v in variants:
+            self.assertContains(response, f"{v.pk}-a.jpg")
+            self.assertNotContains(response, f"{v.pk}-b.jpg")
+
+
+class HoldManyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cliente", email="cliente@example.com")
+        self.other = User.objects.create_user("outro")
+
+    def _state(self, variant):
+        variant.refresh_from_db()
+        held = dict(StockReservation.objects.filter(variant=variant).values_list("user__username", "quantity"))
+        return variant.reserved_qty, held
+
+    def test_queries_do_not_grow_with_variants(self):
+        def queries(n):
+            quantities = {v.pk: 2 for v in make_variants(n, prefix=f"q{n}", stock=5)}
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(reservations.hold_many(self.user.pk, quantities), set())
+            return len(ctx)
+
+        self.assertEqual(queries(1), queries(20))
+
+    def test_grow_shrink_and_release(self):
+        a, b, c = make_variants(3, stock=5)
+        reservations.hold_many(self.user.pk, {a.pk: 2, b.pk: 3, c.pk: 1})
+        self.assertEqual(reservations.hold_many(self.user.pk, {a.pk: 4, b.pk: 1, c.pk: 0}), set())
+
+        self.assertEqual(self._state(a), (4, {"cliente": 4}))
+        self.assertEqual(self._state(b), (1, {"cliente": 1}))
+        self.assertEqual(self._state(c), (0, {}))
+
+    def test_variant_without_free_stock_is_left_alone(self):
+        a, b = make_variants(2, stock=3)
+        reservations.hold(self.other.pk, a.pk, 2)
+        reservations.hold(self.user.pk, a.pk, 1)
+
+        self.assertEqual(reservations.hold_many(self.user.pk, {a.pk: 2, b.pk: 3}), {a.pk})
+        self.assertEqual(self._state(a), (3, {"outro": 2, "cliente": 1}))
+        self.assertEqual(self._state(b), (3, {"cliente": 3}))
+
+    def test_expired_holds_of_others_are_reclaimed(self):
+        (a,) = make_variants(1, stock=2)
+        reservations.hold(self.other.pk, a.pk, 2)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertTrue(reservations.hold(self.user.pk, a.pk, 2))
+        self.assertEqual(self._state(a), (2, {"cliente": 2}))
+
+    def test_update_cart_items_conflict(self):
+        a, b = make_variants(2, stock=3)
+        cart = Cart.objects.create(user=self.user)
+        item_a = CartItem.objects.create(cart=cart, variant=a, quantity=1)
+        item_b = CartItem.objects.create(cart=cart, variant=b, quantity=1)
+        reservations.hold_cart(self.user.pk)
+        self.client.force_login(self.user)
+
+        response = self.client.post(
+            reverse("shop:update_cart_items"),
+            json.dumps({"items": [{"item_id": item_a.pk, "quantity": 5}, {"item_id": item_b.pk, "quantity": 3}]}),
+            content_type="application/json",
+        )
+        data = response.json()
+        self.assertEqual([c["item_id"] for c in data["conflicts"]], [item_a.pk])
+        self.assertEqual(data["conflicts"][0]["available"], 3)
+        self.assertEqual(dict(CartItem.objects.values_list("variant_id", "quantity")), {a.pk: 1, b.pk: 3})
+        self.assertEqual(self._state(b), (3, {"cliente": 3}))
+
+
+class StockRaceTests(TransactionTestCase):
+    # threads com ligações próprias: os dados têm de estar gravados
+
+    def test_concurrent_checkouts_do_not_oversell(self):
+        stock, threads, attempts = 10, 8, 4
+        (variant,) = make_variants(1, stock=stock)
+        users = [User.objects.create_user(f"comprador-{i}") for i in range(threads)]
+        sold, barrier = [], threading.Barrier(threads)
+
+        def buy(user):
+            barrier.wait()
+            try:
+                for _ in range(attempts):
+                    try:
+                        if not reservations.hold(user.pk, variant.pk, 1):
+                            continue
+                        with transaction.atomic():
+                            reservations.commit_stock(user.pk, [(variant, 1)])
+                        sold.append(user.pk)
+                    except (reservations.InsufficientStock, OperationalError):
+                        pass
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=buy, args=(u,)) for u in users]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+
+        variant.refresh_from_db()
+        self.assertGreater(len(sold), 0)
+        self.assertLessEqual(len(sold), stock)
+        self.assertEqual(variant.stock_qty, stock - len(sold))
+        self.assertEqual(variant.reserved_qty, StockReservation.objects.aggregate(n=Sum("quantity"))["n"] or 0)
+
+    def test_checkout_reports_insufficient_stock(self):
+        (variant,) = make_variants(1, stock=5)
+        self.client.force_login(User.objects.create_user("cliente", email="cliente@example.com"))
+        self.client.post(reverse("shop:add_to_cart"), {"variant_id": variant.pk, "quantity": 2})
+        ProductVariant.objects.filter(pk=variant.pk).update(stock_qty=1)
+
+        response = self.client.post(reverse("shop:create_order"),
+                                    {"delivery_type": "pickup", "pickup_location": "Triunfo"}, follow=True)
+        self.assertRedirects(response, reverse("shop:cart_detail"))
+        self.assertIn("Stock insuficiente", " ".join(str(m) for m in response.context["messages"]))
+        self.assertFalse(Order.objects.exists())
+
+
+class BlockSequenceTests(TransactionTestCase):
+    # os blocos são reservados fora de transacções
+
+    def test_refuses_inside_transaction(self):
+        with transaction.atomic(), self.assertRaises(RuntimeError):
+            BlockSequence("test_inside", block_size=5).next()
+
+    def test_one_update_per_block(self):
+        sequence = BlockSequence("test_blocks", block_size=5)
+        self.assertEqual(sequence.next(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual([sequence.next() for _ in range(4)], [2, 3, 4, 5])
+        self.assertEqual(sequence.next(), 6)
+        self.assertEqual(Sequence.objects.get(name="test_blocks").next_value, 11)
+
+    def test_concurrent_writers_get_unique_numbers(self):
+        writers, per_writer = 6, 15
+        values, barrier = [], threading.Barrier(writers)
+
+        def take():
+            # cada thread faz de processo/worker: o seu próprio bloco
+            sequence = BlockSequence("test_concurrent", block_size=4)
+            barrier.wait()
+            try:
+                for _ in range(per_writer):
+                    try:
+                        values.append(sequence.next())
+                    except OperationalError:
+                        pass
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=take) for _ in range(writers)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+
+        self.assertGreater(len(values), 0)
+        self.assertEqual(len(values), len(set(values)))
+
+    def test_order_numbers_are_formatted(self):
+        self.assertRegex(next_order_number(), r"^PLA-\d{4,}$")
+
+    def test_checkout_gets_distinct_numbers(self):
+        (variant,) = make_variants(1, stock=10)
+        self.client.force_login(User.objects.create_user("cliente", email="cliente@example.com"))
+        for _ in range(2):
+            self.client.post(reverse("shop:add_to_cart"), {"variant_id": variant.pk, "quantity": 1})
+            self.client.post(reverse("shop:create_order"), {"delivery_type": "pickup", "pickup_location": "Triunfo"})
+
+        numbers = list(Order.objects.values_list("order_number", flat=True))
+        self.assertEqual(len(numbers), 2)
+        self.assertEqual(len(set(numbers)), 2)
+        self.assertTrue(all(n.startswith("PLA-") for n in numbers))
+
+
+def make_orders(variants, n, placed_at=None, prefix="o", quantity=None, **fields):
+    """
+    `n` encomendas com um item de cada variante (quantidade `quantity`, ou de 1 a 3).
+    `fields` substitui campos da encomenda (ex: user, customer_email).
+    """
+    fields = {"customer_name": "Cliente", "customer_email": "cliente@example.com", **fields}
+    orders = Order.objects.bulk_create([
+        Order(order_number=f"{prefix}-{i}", shipping_address="Rua do Teste, 1\nMaputo",
+              placed_at=placed_at or timezone.now(), **fields)
+        for i in range(n)
+    ])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=o, product_variant=v, quantity=quantity or 1 + (i + k) % 3,
+                  unit_price=Decimal("250"), total_price=Decimal("250") * (quantity or 1 + (i + k) % 3))
+        for i, o in enumerate(orders) for k, v in enumerate(variants)
+    ])
+    return orders
+
+
+class SalesRollupTests(TestCase):
+    FIELDS = ("date", "variant_id", "units", "revenue", "orders")
+
+    def setUp(self):
+        self.variants = make_variants(4, prefix="s", stock=1000)
+        today = timezone.localdate()
+        self.start = today - timedelta(days=29)
+        self.orders = []
+        for days_ago in (0, 3, 40):
+            placed_at = timezone.now() - timedelta(days=days_ago)
+            self.orders += make_orders(self.variants[days_ago % 2:], 5, placed_at, prefix=f"s{days_ago}")
+        for order in self.orders:
+            record_order(order, list(order.items.select_related("product_variant")))
+
+    def test_incremental_equals_rebuild(self):
+        transition_orders(Order.objects.filter(pk__in=[o.pk for o in self.orders[::4]]), "cancelled")
+        incremental = set(DailyVariantSales.objects.exclude(units=0).values_list(*self.FIELDS))
+
+        rebuild_rollups()
+        self.assertEqual(set(DailyVariantSales.objects.values_list(*self.FIELDS)), incremental)
+
+    def test_report_matches_order_items(self):
+        transition_orders(Order.objects.filter(pk=self.orders[0].pk), "cancelled")
+        items = OrderItem.objects.exclude(order__status="cancelled").filter(
+            order__placed_at__date__gte=self.start
+        )
+        expected = items.aggregate(units=Sum("quantity"), revenue=Sum("total_price"))
+
+        report = sales_report(self.start, timezone.localdate())
+        self.assertEqual(len(report["days"]), 30)
+        self.assertEqual((report["units"], report["revenue"]), (expected["units"], expected["revenue"]))
+        self.assertEqual(report["products"][0]["n_revenue"], max(p["n_revenue"] for p in report["products"]))
+
+    def test_report_queries_do_not_grow_with_orders(self):
+        with CaptureQueriesContext(connection) as ctx:
+            sales_report(self.start, timezone.localdate())
+        orders = make_orders(self.variants, 50, prefix="extra")
+        for order in orders:
+            record_order(order, list(order.items.select_related("product_variant")))
+        with self.assertNumQueries(len(ctx)):
+            sales_report(self.start, timezone.localdate())
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.variants = make_variants(3, prefix="e")
+        self.orders = make_orders(self.variants, 7)
+
+    def test_csv_has_one_row_per_item(self):
+        # blocos pequenos: uma encomenda fica partida entre dois blocos
+        rows = list(csv.reader(io.StringIO("".join(export_lines(Order.objects.all(), "csv", chunk_size=4)))))
+        self.assertEqual(rows[0], CSV_HEADER)
+        self.assertEqual(len(rows), 1 + 7 * 3)
+        self.assertEqual(rows[1][CSV_HEADER.index("shipping_address")], "Rua do Teste, 1\nMaputo")
+
+    def test_jsonl_has_one_line_per_order(self):
+        lines = list(export_lines(Order.objects.all(), "jsonl", chunk_size=4))
+        orders = [json.loads(line) for line in lines]
+        self.assertEqual([o["order_number"] for o in orders], [o.order_number for o in self.orders])
+        self.assertTrue(all(len(o["items"]) == 3 for o in orders))
+
+    def test_export_reads_in_chunks(self):
+        with CaptureQueriesContext(connection) as ctx:
+            lines = export_lines(Order.objects.all(), "csv", chunk_size=4)
+            next(lines)
+        self.assertEqual(len(ctx), 0)  # nada é lido antes de consumir as linhas
+        self.assertEqual(sum(1 for _ in lines), 7 * 3)
+
+
+class PlaceOrderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cliente", email="cliente@example.com")
+        self.cart = Cart.objects.create(user=self.user)
+
+    def _order_fields(self, number):
+        return dict(order_number=number, customer_name="Cliente", customer_email=self.user.email,
+                    fulfillment_method=Order.FulfillmentMethod.PICKUP, shipping_address="PICKUP: Triunfo",
+                    subtotal_amount=Decimal("0.00"), total_amount=Decimal("0.00"), placed_at=timezone.now())
+
+    def _fill_cart(self, variants, quantity=2):
+        CartItem.objects.bulk_create([CartItem(cart=self.cart, variant=v, quantity=quantity) for v in variants])
+        reservations.hold_cart(self.user.pk)
+        return list(self.cart.items.select_related("variant__product"))
+
+    def _writes(self, n):
+        variants = make_variants(n, prefix=f"w{n}", stock=10)
+        cart_items = self._fill_cart(variants)
+        with CaptureQueriesContext(connection) as ctx:
+            place_order(self.user.pk, self.cart.pk, cart_items, **self._order_fields(f"PLA-{n}"))
+        return sum(1 for q in ctx.captured_queries if q["sql"].split(None, 1)[0] in ("INSERT", "UPDATE", "DELETE"))
+
+    def test_writes_do_not_grow_with_items(self):
+        self._writes(1)  # cria as linhas dos rollups do dia
+        self.assertEqual(self._writes(2), self._writes(15))
+
+    def test_order_consumes_cart_reservations_and_stock(self):
+        variants = make_variants(3, stock=10)
+        order = place_order(self.user.pk, self.cart.pk, self._fill_cart(variants), **self._order_fields("PLA-1"))
+
+        self.assertEqual(order.items.count(), 3)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(set(ProductVariant.objects.values_list("stock_qty", "reserved_qty")), {(8, 0)})
+        self.assertEqual(EmailOutbox.objects.filter(to=[self.user.email]).count(), 1)
+
+    def test_insufficient_stock_rolls_back_everything(self):
+        a, b = make_variants(2, stock=10)
+        cart_items = self._fill_cart([a, b])
+        ProductVariant.objects.filter(pk=b.pk).update(stock_qty=1)
+
+        with self.assertRaises(reservations.InsufficientStock) as ctx:
+            place_order(self.user.pk, self.cart.pk, cart_items, **self._order_fields("PLA-1"))
+        self.assertEqual(ctx.exception.variant_ids, [b.pk])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 2)
+        self.assertEqual(ProductVariant.objects.get(pk=a.pk).stock_qty, 10)
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.variants = make_variants(5, prefix="l", stock=0)
+        movements, balance = [], dict.fromkeys((v.pk for v in self.variants), 0)
+        for i in range(200):
+            pk = self.variants[i % 5].pk
+            quantity = -(1 + i % 3) if i % 4 else 5
+            balance[pk] += quantity
+            movements.append(StockMovement(variant_id=pk, kind=StockMovement.Kind.SALE if quantity < 0
+                                           else StockMovement.Kind.RESTOCK,
+                                           quantity=quantity, created_at=self.now - timedelta(days=i * 300 // 200)))
+        StockMovement.objects.bulk_create(movements)
+        for pk, quantity in balance.items():
+            ProductVariant.objects.filter(pk=pk).update(stock_qty=quantity)
+        for months in range(10, 0, -1):
+            ledger.take_snapshot(at=self.now - timedelta(days=30 * months))
+
+    def test_on_hand_matches_full_history(self):
+        at = self.now - timedelta(days=45)
+        ids = [v.pk for v in self.variants]
+        full = ledger._movements_after(None, at, ids)
+        self.assertEqual(ledger.on_hand(ids, at), {pk: full.get(pk, 0) for pk in ids})
+
+    def test_reconcile_is_clean(self):
+        self.assertEqual(ledger.reconcile(full=True), (5, []))
+        self.assertEqual(ledger.reconcile(), (5, []))
+
+    def test_reconcile_finds_unrecorded_change(self):
+        broken = self.variants[2].pk
+        ProductVariant.objects.filter(pk=broken).update(stock_qty=F("stock_qty") + 1)
+        for full in (True, False):
+            _, bad = ledger.reconcile(full=full)
+            self.assertEqual([pk for pk, _, _ in bad], [broken])
+
+    def test_save_records_manual_edit(self):
+        variant = ProductVariant.objects.get(pk=self.variants[0].pk)
+        variant.stock_qty += 7
+        variant.save()
+        self.assertEqual(ledger.reconcile(), (5, []))
+
+
+@override_settings(CACHES=LOCMEM)
+class ProductListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _page_queries(self, n):
+        for v in make_variants(n, prefix=f"m{n}"):
+            ProductImage.objects.create(product_id=v.product_id, image=f"shop/products/m-{v.pk}.jpg")
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("shop:product_list"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_queries_do_not_grow_with_products(self):
+        self.assertEqual(self._page_queries(2), self._page_queries(30))
+
+    def test_cards_api_renders_the_page_partial(self):
+        for v in make_variants(3, prefix="api"):
+            ProductImage.objects.create(product_id=v.product_id, image=f"shop/products/api-{v.pk}.jpg")
+        page = self.client.get(reverse("shop:product_list")).content.decode()
+
+        data = self.client.get(reverse("shop:product_cards_api"), {"limit": 2}).json()
+        more = self.client.get(reverse("shop:product_cards_api"), {"cursor": data["next"]}).json()
+        self.assertIsNone(more["next"])
+        for card in data["results"] + more["results"]:
+            self.assertIn(f'href="{card["url"]}"', data["html"] + more["html"])
+        # o HTML do scroll é o mesmo dos cards da página (imagem responsiva incluída)
+        self.assertIn(data["html"].split("<a", 1)[1].strip()[:200], page)
+
+    def test_card_follows_variants(self):
+        (variant,) = make_variants(1, stock=5)
+        ProductVariant.objects.create(product_id=variant.product_id, size="L", stock_qty=0)
+        card = ProductCard.objects.get(product_id=variant.product_id)
+        self.assertEqual((card.size_list, card.min_price), (["M"], Decimal("99.90")))
+
+        variant.stock_qty = 0
+        variant.save()
+        card.refresh_from_db()
+        self.assertEqual(card.size_list, [])
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        if not fts_available():
+            self.skipTest("FTS5 só existe em SQLite")
+        self.hoodie = Product.objects.create(name="Hoodie Órbita", description="Algodão orgânico preto",
+                                             slug="hoodie-orbita", price=Decimal("2500"))
+        self.tee = Product.objects.create(name="Tee Lua", description="Camisola com hoodie estampado",
+                                          slug="tee-lua", price=Decimal("1500"))
+
+    def test_prefix_accents_and_plurals(self):
+        self.assertEqual(search_product_ids("orb"), [self.hoodie.pk])
+        self.assertEqual(search_product_ids("algodao"), [self.hoodie.pk])
+        self.assertEqual(search_product_ids("camisolas"), [self.tee.pk])
+        self.assertEqual(search_product_ids("zzzz"), [])
+
+    def test_name_ranks_above_description(self):
+        self.assertEqual(search_product_ids("hoodie"), [self.hoodie.pk, self.tee.pk])
+
+    def test_listing_counts_every_active_match(self):
+        # inactivos mais relevantes do que os activos não podem gastar a quota
+        Product.objects.bulk_create(
+            [Product(name=f"Hoodie Hoodie Arquivo {i}", slug=f"arquivo-{i}", price=Decimal("100"),
+                     is_active=False) for i in range(MAX_RESULTS)]
+            + [Product(name=f"Casaco {i}", description="hoodie", slug=f"casaco-{i}", price=Decimal("100"))
+               for i in range(30)]
+        )
+        rebuild_index()
+        rebuild_product_cards()
+
+        response = self.client.get(reverse("shop:product_list"), {"q": "hoodie"})
+        page = response.context["page_obj"]
+        self.assertEqual(page.paginator.count, 32)
+        self.assertEqual(page.object_list[0].product_id, self.hoodie.pk)
+
+    def test_index_follows_writes(self):
+        self.tee.name = "Tee Planeta"
+        self.tee.save()
+        self.assertEqual(search_product_ids("planeta"), [self.tee.pk])
+        self.tee.delete()
+        self.assertEqual(search_product_ids("planeta"), [])
+
+
+class CatalogueImportTests(TestCase):
+    def _run(self, *records, batch_size=500):
+        lines = io.StringIO("".join(json.dumps({"price": "100", **r}) + "\n" for r in records))
+        return CatalogueImporter(batch_size=batch_size).run(iter_jsonl(lines))
+
+    def test_repeated_explicit_slug_is_a_row_error(self):
+        stats = self._run({"name": "Moon Tee", "slug": "moon"}, {"name": "Outra", "slug": "moon"})
+        self.assertEqual(stats.products_created, 1)
+        self.assertEqual([lineno for lineno, _ in stats.errors], [2])
+
+    def test_explicit_slug_wins_over_allocated(self):
+        stats = self._run({"name": "Tee"}, {"name": "Moon", "slug": "tee"}, {"name": "Tee 2"})
+        self.assertEqual(stats.errors, [])
+        self.assertEqual(
+            dict(Product.objects.values_list("name", "slug")),
+            {"Moon": "tee", "Tee": "tee-2", "Tee 2": "tee-2-2"},
+        )
+
+    def test_explicit_slug_taken_by_earlier_batch(self):
+        stats = self._run({"name": "Tee"}, {"name": "Moon", "slug": "tee"}, batch_size=1)
+        self.assertEqual([lineno for lineno, _ in stats.errors], [2])
+        self.assertEqual(Product.objects.get(slug="tee").name, "Tee")
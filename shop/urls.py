@@ -2,18 +2,21 @@ from django.urls import path
 
 from .models import Cart
 from .views import (
-    ProductListView, ProductDetailView, add_to_cart, cart_detail,
-    clear_cart, update_cart_item, remove_from_cart, checkout, create_order
+    ProductListView, ProductDetailView, product_cards_api, product_search_api, add_to_cart, cart_detail,
+    clear_cart, update_cart_item, update_cart_items, remove_from_cart, checkout, create_order
 )
 
 app_name = "shop"
 
 urlpatterns = [
     path("merch/", ProductListView.as_view(), name="product_list"),
+    path("merch/api/", product_cards_api, name="product_cards_api"),
+    path("merch/search/", product_search_api, name="product_search_api"),
     path("merch/<slug:slug>/", ProductDetailView.as_view(), name="product_detail"),
 
     path("cart/", cart_detail, name="cart_detail"),
     path("cart/add/", add_to_cart, name="add_to_cart"),
+    path("cart/items/update/", update_cart_items, name="update_cart_items"),
     path("cart/item/<int:item_id>/update/", update_cart_item, name="update_cart_item"),
     path("cart/item/<int:item_id>/remove/", remove_from_cart, name="remove_from_cart"),
     path("cart/clear/", clear_cart, name="clear_cart"),
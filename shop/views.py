@@ -1,56 +1,211 @@
 from __future__ import annotations
 from decimal import Decimal
-import re
 import json
 import traceback
 from django.contrib import messages
-from django.db.models import Prefetch
+from django.db.models import Prefetch, Q, prefetch_related_objects
 from django.core.exceptions import ValidationError
 from django.http import HttpRequest, JsonResponse, HttpResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views.generic import DetailView, ListView, TemplateView
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from django.db import IntegrityError, transaction
+from django.db import transaction
+from core.conditional import conditional_page
+from core.cursors import decode_cursor, encode_cursor
+
+from .cache import (
+    PRODUCT_DETAIL, PRODUCT_LIST, CataloguePageCacheMixin,
+    get_cart_summary, refresh_cart_summary,
+)
+from . import guest_cart, reservations
 from .forms import AddToCartForm, CheckoutForm
-from .models import Cart, CartItem, Order, OrderItem, Product, ProductVariant
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from .models import Cart, CartItem, Order, Product, ProductCard, ProductImage, ProductVariant
+from .orders import place_order
+from .search import order_by_relevance
+from .sequences import next_order_number
 
 
 # -------------------------
 # Product catalogue
 # -------------------------
-class ProductListView(ListView):
-    model = Product
+class ProductListView(CataloguePageCacheMixin, ListView):
+    """
+    Listagem de merch servida a partir da projeção ProductCard
+    (uma query indexada numa só tabela por página).
+    """
+    cache_namespace = PRODUCT_LIST
+    model = ProductCard
     template_name = "shop/merch.html"
     context_object_name = "products"
     paginate_by = 24
 
     def get_queryset(self):
-        qs = (
-            Product.objects.filter(is_active=True)
-            .prefetch_related("images")
-            .prefetch_related(
-                Prefetch(
-                    "variants",
-                    queryset=ProductVariant.objects.filter(
-                        is_active=True,
-                        stock_qty__gt=0,  # ✅ aqui
-                    ).order_by("size"),
-                )
-            )
-        )
+        qs = ProductCard.objects.filter(is_active=True)
 
-        if self.request.GET.get("featured") in ("1", "true", "yes"):
+        if _wants_featured(self.request):
             qs = qs.filter(is_featured=True)
 
-        return qs
+        q = _search_term(self.request)
+        if q:
+            return _search_cards(qs, q)
+
+        return qs.order_by(*CARD_ORDERING)
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        page = ctx.get("page_obj")
+        q = _search_term(self.request)
+        # cursor para o modo infinite scroll continuar a partir desta página
+        # (resultados de pesquisa vêm por relevância, não por keyset)
+        if page is not None and page.has_next() and not q:
+            ctx["next_cursor"] = _encode_cursor(page.object_list[len(page.object_list) - 1])
+        ctx["featured_filter"] = _wants_featured(self.request)
+        ctx["q"] = q
+        return ctx
+
+    def get_cache_key_parts(self):
+        return (
+            self.request.GET.get("featured", ""),
+            self.request.GET.get(self.page_kwarg, ""),
+            _search_term(self.request),
+        )
+
 
+# Ordem estável para keyset: (created_at, id) descendente.
+CARD_ORDERING = ("-created_at", "-product_id")
+CARD_API_PAGE_SIZE = 24
+CARD_API_MAX_PAGE_SIZE = 60
 
-class ProductDetailView(DetailView):
+
+SEARCH_API_LIMIT = 20
+
+
+def _wants_featured(request) -> bool:
+    return request.GET.get("featured") in ("1", "true", "yes")
+
+
+def _search_term(request) -> str:
+    return (request.GET.get("q") or "").strip()[:100]
+
+
+def _search_cards(qs, q: str):
+    """
+    Filtra os cards pela pesquisa e ordena por relevância (bm25 do índice FTS5).
+    Sem FTS5 (outra BD) cai para icontains em nome/descrição.
+    """
+    ranked = order_by_relevance(qs, q)
+    if ranked is None:
+        matches = Product.objects.filter(
+            Q(name__icontains=q) | Q(description__icontains=q)
+        ).values("pk")
+        return qs.filter(product_id__in=matches).order_by(*CARD_ORDERING)
+    return ranked
+
+
+def _encode_cursor(card: ProductCard) -> str:
+    return encode_cursor(card.created_at, card.product_id)
+
+
+def _card_json(card: ProductCard) -> dict:
+    return {
+        "id": card.product_id,
+        "name": card.name,
+        "url": reverse("shop:product_detail", args=[card.slug]),
+        "image": card.main_image_url,
+        "sizes": card.size_list,
+        "min_price": str(card.min_price),
+        "max_price": str(card.max_price),
+        "is_featured": card.is_featured,
+    }
+
+
+@require_GET
+def product_search_api(request):
+    """
+    Pesquisa de produtos em JSON (?q=texto, ?featured=1, ?limit=20).
+    Resultados ordenados por relevância.
+    """
+    q = _search_term(request)
+    if not q:
+        return JsonResponse({"success": True, "q": q, "results": []})
+
+    try:
+        limit = int(request.GET.get("limit", SEARCH_API_LIMIT))
+    except (TypeError, ValueError):
+        return JsonResponse({"success": False, "message": "limit inválido."}, status=400)
+    limit = max(1, min(limit, CARD_API_MAX_PAGE_SIZE))
+
+    qs = ProductCard.objects.filter(is_active=True)
+    if _wants_featured(request):
+        qs = qs.filter(is_featured=True)
+
+    cards = _search_cards(qs, q)[:limit]
+    return JsonResponse({
+        "success": True,
+        "q": q,
+        "results": [_card_json(c) for c in cards],
+    })
+
+
+@require_GET
+def product_cards_api(request):
+    """
+    Catálogo em JSON com paginação por keyset (infinite scroll do merch).
+
+    ?cursor=<opaco>  continua depois do último card devolvido
+    ?featured=1      só destaques
+    ?limit=24        tamanho da página (máx. 60)
+    """
+    try:
+        limit = int(request.GET.get("limit", CARD_API_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return JsonResponse({"success": False, "message": "limit inválido."}, status=400)
+    limit = max(1, min(limit, CARD_API_MAX_PAGE_SIZE))
+
+    qs = ProductCard.objects.filter(is_active=True)
+    if _wants_featured(request):
+        qs = qs.filter(is_featured=True)
+
+    cursor = request.GET.get("cursor")
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            return JsonResponse({"success": False, "message": "cursor inválido."}, status=400)
+        created_at, pk = position
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, product_id__lt=pk))
+
+    cards = list(qs.order_by(*CARD_ORDERING)[:limit + 1])
+    has_more = len(cards) > limit
+    cards = cards[:limit]
+
+    return JsonResponse({
+        "success": True,
+        "results": [_card_json(c) for c in cards],
+        # mesmo partial da primeira página, com srcset/sizes das renditions
+        "html": render_to_string("shop/_product_cards.html", {"products": cards}),
+        "next": _encode_cursor(cards[-1]) if has_more else None,
+    })
+
+
+def _product_freshness(request, slug):
+    updated_at = (
+        Product.objects.filter(slug=slug, is_active=True)
+        .values_list("updated_at", flat=True)
+        .first()
+    )
+    if updated_at is None:
+        return None
+    return (("product", slug, updated_at.isoformat()), updated_at)
+
+
+@method_decorator(conditional_page(_product_freshness), name="dispatch")
+class ProductDetailView(CataloguePageCacheMixin, DetailView):
+    cache_namespace = PRODUCT_DETAIL
     model = Product
     template_name = "shop/product_detail.html"
     context_object_name = "product"
@@ -77,11 +232,185 @@ class ProductDetailView(DetailView):
         ctx["add_to_cart_form"] = AddToCartForm()
         return ctx
 
+    def get_cache_key_parts(self):
+        return (self.kwargs[self.slug_url_kwarg],)
+
 
 def _is_ajax(request) -> bool:
     return request.headers.get("X-Requested-With") == "XMLHttpRequest"
 
 
+def _ajax_quantity(request) -> int:
+    """Quantidade do corpo JSON de um pedido AJAX; ValueError com a mensagem para o cliente."""
+    try:
+        payload = json.loads(request.body.decode("utf-8") or "{}")
+    except json.JSONDecodeError:
+        raise ValueError("JSON inválido.")
+
+    quantity = payload.get("quantity", None)
+    if quantity is None:
+        raise ValueError("Quantidade não informada.")
+    try:
+        return int(quantity)
+    except (TypeError, ValueError):
+        raise ValueError("Quantidade inválida.")
+
+
+# -------------------------
+# Carrinho de visitantes (cookie assinado, ver shop/guest_cart.py)
+# -------------------------
+def _cart_images(lookup="variant__product__images"):
+    # miniatura do carrinho: a 1.ª imagem de cada produto, numa query para todos os itens
+    return Prefetch(lookup, queryset=ProductImage.objects.order_by("id"), to_attr="cart_images")
+
+
+def _guest_cart_detail(request):
+    cart_items = guest_cart.build_items(guest_cart.load(request))
+    prefetch_related_objects([item.variant for item in cart_items], _cart_images("product__images"))
+    summary = guest_cart.summary({}, cart_items)
+    context = {
+        'cart_items': cart_items,
+        'total_price': Decimal(summary["total"]),
+    }
+    return render(request, 'shop/cart_detail.html', context)
+
+
+def _guest_add_to_cart(request, variant, quantity):
+    items = guest_cart.load(request)
+    if variant.id not in items and len(items) >= guest_cart.MAX_ITEMS:
+        msg = f"O carrinho tem um máximo de {guest_cart.MAX_ITEMS} artigos diferentes."
+        messages.error(request, msg)
+        if _is_ajax(request):
+            return JsonResponse({"success": False, "message": msg})
+        return redirect("shop:cart_detail")
+
+    new_quantity = items.get(variant.id, 0) + quantity
+    if new_quantity > variant.stock_qty:
+        messages.warning(request, f"Quantidade ajustada para o estoque disponível: {variant.stock_qty}.")
+        new_quantity = variant.stock_qty
+    items[variant.id] = min(new_quantity, guest_cart.MAX_QUANTITY)
+
+    messages.success(request, f"{variant.product.name} adicionado ao carrinho!")
+    if _is_ajax(request):
+        response = JsonResponse({
+            "success": True,
+            "cart_total_quantity": sum(items.values()),
+            "message": f"{variant.product.name} adicionado ao carrinho!",
+        })
+    else:
+        response = redirect(request.POST.get("next") or "shop:cart_detail")
+    guest_cart.save(response, items)
+    return response
+
+
+def _guest_apply(request, ops: dict[int, int]):
+    """
+    Aplica {variant_id: quantidade} ao carrinho do cookie (uma leitura de stock).
+    Devolve (resultados por item, conflitos, itens, itens do carrinho).
+    """
+    items = guest_cart.load(request)
+    found = guest_cart.variants(items)
+
+    results, conflicts = [], []
+    for item_id, quantity in ops.items():
+        variant = found.get(item_id)
+        if variant is None or item_id not in items or quantity <= 0:
+            items.pop(item_id, None)
+            results.append({"item_id": item_id, "removed": True, "quantity": 0, "item_total": "0.00"})
+            continue
+
+        if quantity > variant.stock_qty:
+            conflicts.append({
+                "item_id": item_id,
+                "available": variant.stock_qty,
+                "message": f"Quantidade não disponível. Estoque: {variant.stock_qty}",
+            })
+        else:
+            items[item_id] = min(quantity, guest_cart.MAX_QUANTITY)
+
+        item = guest_cart.GuestCartItem(variant, items[item_id])
+        results.append({
+            "item_id": item_id,
+            "removed": False,
+            "quantity": item.quantity,
+            "item_total": str(item.get_total_price()),
+        })
+
+    cart_items = [guest_cart.GuestCartItem(found[k], q) for k, q in items.items() if k in found]
+    return results, conflicts, items, cart_items
+
+
+def _guest_update_cart_item(request, item_id):
+    if _is_ajax(request):
+        try:
+            quantity = _ajax_quantity(request)
+        except ValueError as exc:
+            return JsonResponse({"success": False, "message": str(exc)}, status=400)
+    elif request.POST.get("action") == "update":
+        quantity = int(request.POST.get("quantity", 1))
+    else:
+        quantity = 0
+
+    results, conflicts, items, cart_items = _guest_apply(request, {item_id: quantity})
+    result, summary = results[0], guest_cart.summary(items, cart_items)
+
+    if _is_ajax(request):
+        response = JsonResponse({
+            "success": not conflicts,
+            **({"message": conflicts[0]["message"]} if conflicts else {}),
+            "removed": result["removed"],
+            "quantity": result["quantity"],
+            "item_total": result["item_total"],
+            "cart_total": summary["total"],
+            "cart_quantity": summary["quantity"],
+        }, status=409 if conflicts else 200)
+    else:
+        if conflicts:
+            messages.error(request, conflicts[0]["message"])
+        elif result["removed"]:
+            messages.success(request, "Item removido do carrinho!")
+        else:
+            messages.success(request, "Quantidade atualizada!")
+        response = redirect("shop:cart_detail")
+
+    guest_cart.save(response, items)
+    return response
+
+
+def _guest_update_cart_items(request, ops):
+    results, conflicts, items, cart_items = _guest_apply(request, ops)
+    summary = guest_cart.summary(items, cart_items)
+    response = JsonResponse({
+        "success": not conflicts,
+        "items": results,
+        "conflicts": conflicts,
+        "cart_total": summary["total"],
+        "cart_quantity": summary["quantity"],
+        "cart_count": summary["count"],
+    })
+    guest_cart.save(response, items)
+    return response
+
+
+def _guest_remove_from_cart(request, item_id):
+    results, conflicts, items, cart_items = _guest_apply(request, {item_id: 0})
+    summary = guest_cart.summary(items, cart_items)
+
+    if _is_ajax(request):
+        response = JsonResponse({
+            "success": True,
+            "cart_total": summary["total"],
+            "cart_quantity": summary["quantity"],
+            "message": "Item removido do carrinho!",
+        })
+    else:
+        messages.success(request, "Item removido do carrinho!")
+        response = redirect("shop:cart_detail")
+
+    guest_cart.save(response, items)
+    return response
+
+
 @login_required
 def checkout(request):
     """Página de checkout"""
@@ -90,14 +419,24 @@ def checkout(request):
     except Cart.DoesNotExist:
         cart = Cart.objects.create(user=request.user)
 
-    cart_items = cart.items.select_related('variant__product')
-    total_price = cart.get_total_price()
+    cart_items = cart.items.select_related('variant__product').with_line_totals()
+    total_price = cart.totals()["total"]
 
     # Verificar se o carrinho está vazio
     if not cart_items:
         messages.error(request, 'O seu carrinho está vazio.')
         return redirect('shop:cart_detail')
 
+    # Renovar as reservas enquanto o cliente preenche o checkout
+    unavailable = reservations.hold_cart(request.user.id)
+    if unavailable:
+        for item in unavailable:
+            messages.error(
+                request,
+                f'Stock insuficiente para {item.variant.product.name} - {item.variant.size}'
+            )
+        return redirect('shop:cart_detail')
+
     context = {
         'cart': cart,
         'cart_items': cart_items,
@@ -106,14 +445,16 @@ def checkout(request):
     return render(request, 'shop/checkout.html', context)
 
 
-@login_required
 def cart_detail(request):
+    if not request.user.is_authenticated:
+        return _guest_cart_detail(request)
+
     try:
         cart = request.user.cart
         cart_items = cart.items.select_related(
             'variant__product'
-        ).all()
-        total_price = cart.get_total_price()
+        ).prefetch_related(_cart_images()).with_line_totals()
+        total_price = cart.totals()["total"]
     except Cart.DoesNotExist:
         cart_items = []
         total_price = 0
@@ -125,7 +466,6 @@ def cart_detail(request):
     return render(request, 'shop/cart_detail.html', context)
 
 
-@login_required
 @require_POST
 def add_to_cart(request):
     variant_id = request.POST.get("variant_id")
@@ -137,8 +477,6 @@ def add_to_cart(request):
         messages.error(request, "Produto não encontrado.")
         return redirect("shop:product_list")
 
-    cart, _ = Cart.objects.get_or_create(user=request.user)
-
     if variant.stock_qty < quantity:
         msg = "Quantidade solicitada não disponível em estoque."
         messages.error(request, msg)
@@ -146,27 +484,35 @@ def add_to_cart(request):
             return JsonResponse({"success": False, "message": msg})
         return redirect("shop:product_detail", slug=variant.product.slug)
 
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        variant=variant,
-        defaults={"quantity": min(quantity, variant.stock_qty)},
-    )
+    if not request.user.is_authenticated:
+        return _guest_add_to_cart(request, variant, quantity)
 
-    if not created:
-        new_quantity = cart_item.quantity + quantity
-        if new_quantity > variant.stock_qty:
-            messages.warning(request, f"Quantidade ajustada para o estoque disponível: {variant.stock_qty}.")
-            cart_item.quantity = variant.stock_qty
-        else:
-            cart_item.quantity = new_quantity
+    cart, _ = Cart.objects.get_or_create(user=request.user)
+    cart_item = CartItem.objects.filter(cart=cart, variant=variant).first()
+    new_quantity = (cart_item.quantity if cart_item else 0) + quantity
+
+    # reserva o stock enquanto está no carrinho (ver shop/reservations.py)
+    if not reservations.hold(request.user.id, variant.id, new_quantity):
+        available = reservations.available_for(request.user.id, variant.id)
+        msg = f"Quantidade solicitada não disponível em estoque. Disponível: {available}."
+        messages.error(request, msg)
+        if _is_ajax(request):
+            return JsonResponse({"success": False, "message": msg})
+        return redirect("shop:product_detail", slug=variant.product.slug)
+
+    if cart_item:
+        cart_item.quantity = new_quantity
         cart_item.save(update_fields=["quantity"])
+    else:
+        CartItem.objects.create(cart=cart, variant=variant, quantity=new_quantity)
 
+    summary = refresh_cart_summary(request.user.id)
     messages.success(request, f"{variant.product.name} adicionado ao carrinho!")
 
     if _is_ajax(request):
         return JsonResponse({
             "success": True,
-            "cart_total_quantity": cart.get_total_quantity(),
+            "cart_total_quantity": summary["quantity"],
             "message": f"{variant.product.name} adicionado ao carrinho!",
         })
 
@@ -176,63 +522,61 @@ def add_to_cart(request):
     return redirect("shop:cart_detail")
 
 
-@login_required
 @require_POST
 def update_cart_item(request, item_id):
-    cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
+    if not request.user.is_authenticated:
+        return _guest_update_cart_item(request, item_id)
+
+    cart_item = get_object_or_404(
+        CartItem.objects.select_related("variant__product"), id=item_id, cart__user=request.user
+    )
 
     # AJAX
     if _is_ajax(request):
         try:
-            payload = json.loads(request.body.decode("utf-8") or "{}")
-        except json.JSONDecodeError:
-            return JsonResponse({"success": False, "message": "JSON inválido."}, status=400)
-
-        quantity = payload.get("quantity", None)
-        if quantity is None:
-            return JsonResponse({"success": False, "message": "Quantidade não informada."}, status=400)
-
-        try:
-            quantity = int(quantity)
-        except (TypeError, ValueError):
-            return JsonResponse({"success": False, "message": "Quantidade inválida."}, status=400)
+            quantity = _ajax_quantity(request)
+        except ValueError as exc:
+            return JsonResponse({"success": False, "message": str(exc)}, status=400)
 
         # remover
         if quantity <= 0:
-            cart = cart_item.cart
             cart_item.delete()
+            reservations.release(request.user.id, [cart_item.variant_id])
+            summary = refresh_cart_summary(request.user.id)
             return JsonResponse({
                 "success": True,
                 "removed": True,
                 "quantity": 0,
                 "item_total": "0.00",
-                "cart_total": str(cart.get_total_price()),
-                "cart_quantity": cart.get_total_quantity(),
+                "cart_total": summary["total"],
+                "cart_quantity": summary["quantity"],
             })
 
-        # stock check
-        available = cart_item.variant.stock_qty
-        if quantity > available:
+        # stock check + reserva
+        if not reservations.hold(request.user.id, cart_item.variant_id, quantity):
             # não grava; devolve o estado atual
+            available = reservations.available_for(request.user.id, cart_item.variant_id)
+            summary = get_cart_summary(request.user.id)
             return JsonResponse({
                 "success": False,
                 "message": f"Quantidade não disponível. Estoque: {available}",
                 "quantity": cart_item.quantity,  # quantidade REAL no DB
                 "item_total": str(cart_item.get_total_price()),
-                "cart_total": str(cart_item.cart.get_total_price()),
-                "cart_quantity": cart_item.cart.get_total_quantity(),
+                "cart_total": summary["total"],
+                "cart_quantity": summary["quantity"],
             }, status=409)
 
         cart_item.quantity = quantity
         cart_item.save(update_fields=["quantity"])
+        summary = refresh_cart_summary(request.user.id)
 
         return JsonResponse({
             "success": True,
             "removed": False,
             "quantity": cart_item.quantity,  # quantidade gravada
             "item_total": str(cart_item.get_total_price()),
-            "cart_total": str(cart_item.cart.get_total_price()),
-            "cart_quantity": cart_item.cart.get_total_quantity(),
+            "cart_total": summary["total"],
+            "cart_quantity": summary["quantity"],
         })
 
     # fallback não-AJAX
@@ -240,33 +584,147 @@ def update_cart_item(request, item_id):
     if action == "update":
         quantity = int(request.POST.get("quantity", 1))
         if quantity > 0:
-            if quantity > cart_item.variant.stock_qty:
-                messages.error(request, f"Quantidade não disponível. Estoque: {cart_item.variant.stock_qty}")
+            if not reservations.hold(request.user.id, cart_item.variant_id, quantity):
+                available = reservations.available_for(request.user.id, cart_item.variant_id)
+                messages.error(request, f"Quantidade não disponível. Estoque: {available}")
             else:
                 cart_item.quantity = quantity
                 cart_item.save(update_fields=["quantity"])
                 messages.success(request, "Quantidade atualizada!")
         else:
             cart_item.delete()
+            reservations.release(request.user.id, [cart_item.variant_id])
             messages.success(request, "Item removido do carrinho!")
     elif action == "remove":
         cart_item.delete()
+        reservations.release(request.user.id, [cart_item.variant_id])
         messages.success(request, "Item removido do carrinho!")
 
+    refresh_cart_summary(request.user.id)
     return redirect("shop:cart_detail")
 
 
+MAX_CART_BATCH_OPS = 100
+
+
+def _parse_cart_ops(body: bytes) -> dict[int, int]:
+    """
+    {"items": [{"item_id": 1, "quantity": 3}, ...]} -> {item_id: quantity}.
+    Operações repetidas para o mesmo item são fundidas (ganha a última).
+    """
+    payload = json.loads(body.decode("utf-8") or "{}")
+    ops = payload.get("items") if isinstance(payload, dict) else None
+    if not isinstance(ops, list) or not ops or len(ops) > MAX_CART_BATCH_OPS:
+        raise ValueError("Lista de itens inválida.")
+
+    merged = {}
+    for op in ops:
+        if not isinstance(op, dict):
+            raise ValueError("Operação inválida.")
+        try:
+            merged[int(op["item_id"])] = int(op["quantity"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Operação inválida.")
+    return merged
+
+
+@require_POST
+def update_cart_items(request):
+    """
+    Aplica várias alterações de quantidade de uma vez (o JS agrupa os cliques).
+    Uma transação, uma leitura de itens+stock, as reservas alteradas num só
+    hold_many, um bulk_update, um delete e um recálculo de totais.
+    """
+    try:
+        ops = _parse_cart_ops(request.body)
+    except (ValueError, UnicodeDecodeError) as exc:
+        return JsonResponse({"success": False, "message": str(exc)}, status=400)
+
+    if not request.user.is_authenticated:
+        return _guest_update_cart_items(request, ops)
+
+    results, conflicts = [], []
+    with transaction.atomic():
+        items = {
+            item.id: item
+            for item in CartItem.objects.filter(
+                cart__user=request.user, id__in=ops
+            ).select_related("variant__product")
+        }
+
+        # todas as reservas alteradas num só hold_many
+        changed = {
+            item_id: quantity
+            for item_id, quantity in ops.items()
+            if item_id in items and 0 < quantity != items[item_id].quantity
+        }
+        failed = reservations.hold_many(
+            request.user.id, {items[item_id].variant_id: quantity for item_id, quantity in changed.items()}
+        )
+
+        to_update, to_delete = [], []
+        for item_id, quantity in ops.items():
+            item = items.get(item_id)
+            if item is None or quantity <= 0:
+                if item is not None:
+                    to_delete.append(item_id)
+                results.append({"item_id": item_id, "removed": True, "quantity": 0, "item_total": "0.00"})
+                continue
+
+            if item_id in changed:
+                if item.variant_id not in failed:
+                    item.quantity = quantity
+                    to_update.append(item)
+                else:
+                    # não grava; devolve o estado atual
+                    available = reservations.available_for(request.user.id, item.variant_id)
+                    conflicts.append({
+                        "item_id": item_id,
+                        "available": available,
+                        "message": f"Quantidade não disponível. Estoque: {available}",
+                    })
+
+            results.append({
+                "item_id": item_id,
+                "removed": False,
+                "quantity": item.quantity,
+                "item_total": str(item.get_total_price()),
+            })
+
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ["quantity"])
+        if to_delete:
+            CartItem.objects.filter(id__in=to_delete).delete()
+            reservations.release(request.user.id, [items[pk].variant_id for pk in to_delete])
+
+    summary = refresh_cart_summary(request.user.id) if (to_update or to_delete) \
+        else get_cart_summary(request.user.id)
+
+    return JsonResponse({
+        "success": not conflicts,
+        "items": results,
+        "conflicts": conflicts,
+        "cart_total": summary["total"],
+        "cart_quantity": summary["quantity"],
+        "cart_count": summary["count"],
+    })
+
+
 @require_POST
 def remove_from_cart(request, item_id):
+    if not request.user.is_authenticated:
+        return _guest_remove_from_cart(request, item_id)
+
     cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
-    cart = cart_item.cart
     cart_item.delete()
+    reservations.release(request.user.id, [cart_item.variant_id])
+    summary = refresh_cart_summary(request.user.id)
 
     if _is_ajax(request):
         return JsonResponse({
             "success": True,
-            "cart_total": str(cart.get_total_price()),
-            "cart_quantity": cart.get_total_quantity(),
+            "cart_total": summary["total"],
+            "cart_quantity": summary["quantity"],
             "message": "Item removido do carrinho!",
         })
 
@@ -274,17 +732,23 @@ def remove_from_cart(request, item_id):
     return redirect("shop:cart_detail")
 
 
-@login_required
 @require_POST
 def clear_cart(request):
+    if not request.user.is_authenticated:
+        response = redirect("shop:cart_detail")
+        guest_cart.save(response, {})
+        return response
+
     try:
         cart = request.user.cart
         cart_items_count = cart.items.count()
         cart.items.all().delete()
+        reservations.release(request.user.id)
         messages.success(request, f"{cart_items_count} itens removidos do carrinho!")
     except Cart.DoesNotExist:
         pass
 
+    refresh_cart_summary(request.user.id)
     return redirect("shop:cart_detail")
 
 
@@ -297,12 +761,6 @@ SHIPPING_FEES = {
 }
 
 
-def _variant_final_price(variant) -> Decimal:
-    getter = getattr(variant, "get_final_price", None)
-    price = getter() if callable(getter) else getter
-    return Decimal(str(price))
-
-
 def _build_shipping_address(post) -> str:
     first_name = (post.get("first_name") or "").strip()
     last_name = (post.get("last_name") or "").strip()
@@ -316,24 +774,6 @@ def _build_shipping_address(post) -> str:
     return "\n".join([l for l in [full_name, street, city_line, country] if l]).strip()
 
 
-def _next_order_number_from_orders() -> str:
-    """
-    Gera PLA-0001, PLA-0002... sem tabela extra.
-    Usa lock no último pedido e retry em colisão.
-    """
-    last = Order.objects.select_for_update().order_by("-id").first()
-    if not last or not last.order_number:
-        return "PLA-0001"
-
-    m = re.search(r"PLA-(\d+)$", last.order_number.strip())
-    if not m:
-        # Se o formato antigo for diferente, recomeça a sequência.
-        return "PLA-0001"
-
-    n = int(m.group(1)) + 1
-    return f"PLA-{n:04d}"
-
-
 @login_required
 def create_order(request):
     if request.method == 'POST':
@@ -345,20 +785,6 @@ def create_order(request):
                 messages.error(request, 'O seu carrinho está vazio.')
                 return redirect('shop:cart_detail')
 
-            # Verificar stock
-            for item in cart_items:
-                variant = item.variant
-                stock = getattr(variant, "stock_qty", None)
-                if stock is None:
-                    stock = getattr(variant, "stock_quantity", 0)
-
-                if item.quantity > int(stock):
-                    messages.error(
-                        request,
-                        f'Stock insuficiente para {variant.product.name} - {getattr(variant, "size", "")}'
-                    )
-                    return redirect('shop:cart_detail')
-
             # DELIVERY (ship/pickup) baseado no teu template
             delivery_type = (request.POST.get("delivery_type") or "ship").strip()
 
@@ -392,10 +818,8 @@ def create_order(request):
                     messages.error(request, "Morada é obrigatória para entrega.")
                     return redirect("shop:checkout")
 
-            # Calcular subtotal/total (Decimal)
-            subtotal = Decimal("0.00")
-            for item in cart_items:
-                subtotal += _variant_final_price(item.variant) * Decimal(item.quantity)
+            # Calcular subtotal/total (Decimal) numa só query agregada
+            subtotal = cart.totals()["total"]
 
             total_amount = subtotal + delivery_fee
 
@@ -411,59 +835,41 @@ def create_order(request):
                              or (request.user.get_full_name() or "Cliente"))
             customer_phone = (request.POST.get("customer_phone") or "").strip()
 
-            # Criar encomenda com retry (sem classe nova)
-            # Usa atomic aqui para garantir lock do select_for_update + criação
-            with transaction.atomic():
-                for _ in range(5):
-                    order_number = _next_order_number_from_orders()
-
-                    try:
-                        order = Order.objects.create(
-                            order_number=order_number,  # PLA-0001...
-                            customer_name=customer_name,
-                            customer_email=customer_email,
-                            customer_phone=customer_phone,
-                            fulfillment_method=fulfillment_method,
-                            shipping_address=shipping_address,
-                            status="pending",
-                            subtotal_amount=subtotal,
-                            delivery_fee=delivery_fee,
-                            total_amount=total_amount,
-                            placed_at=timezone.now(),
-                        )
-                        break
-                    except IntegrityError:
-                        # Colisão rara (ex: tabela vazia com concorrência). Re-tenta.
-                        continue
-                else:
-                    raise Exception("Falha ao gerar número de encomenda único. Tente novamente.")
-
-                # Criar itens + baixar stock
-                for cart_item in cart_items:
-                    variant = cart_item.variant
-                    unit_price = _variant_final_price(variant)
-
-                    OrderItem.objects.create(
-                        order=order,
-                        product_variant=variant,
-                        quantity=cart_item.quantity,
-                        unit_price=unit_price,
-                        total_price=unit_price * Decimal(cart_item.quantity),
-                    )
-
-                    # Atualizar stock
-                    if hasattr(variant, "stock_qty"):
-                        variant.stock_qty = int(variant.stock_qty) - int(cart_item.quantity)
-                        variant.save(update_fields=["stock_qty"])
-                    else:
-                        variant.stock_quantity = int(variant.stock_quantity) - int(cart_item.quantity)
-                        variant.save(update_fields=["stock_quantity"])
-
-                # Limpar carrinho
-                cart.items.all().delete()
+            # Número da sequência em blocos (fora da transação: ver shop/sequences.py)
+            order_number = next_order_number()
+
+            # Encomenda + itens (bulk) + stock (um UPDATE) + limpar carrinho,
+            # numa transação curta (ver shop/orders.py). O stock só é verificado
+            # aí, no UPDATE condicional (conta com as reservas): InsufficientStock
+            # abaixo.
+            order = place_order(
+                request.user.id,
+                cart.id,
+                cart_items,
+                order_number=order_number,  # PLA-0001...
+                customer_name=customer_name,
+                customer_email=customer_email,
+                customer_phone=customer_phone,
+                fulfillment_method=fulfillment_method,
+                shipping_address=shipping_address,
+                status="pending",
+                subtotal_amount=subtotal,
+                delivery_fee=delivery_fee,
+                total_amount=total_amount,
+                placed_at=timezone.now(),
+            )
 
+            refresh_cart_summary(request.user.id)
             messages.success(request, f'Encomenda #{order.order_number} criada com sucesso!')
-            send_order_confirmation_email(order)
+            return redirect('shop:cart_detail')
+
+        except reservations.InsufficientStock as exc:
+            for cart_item in cart_items:
+                if cart_item.variant_id in exc.variant_ids:
+                    messages.error(
+                        request,
+                        f'Stock insuficiente para {cart_item.variant.product.name} - {cart_item.variant.size}'
+                    )
             return redirect('shop:cart_detail')
 
         except Exception as e:
@@ -472,47 +878,3 @@ def create_order(request):
             return redirect('shop:checkout')
 
     return redirect('shop:cart_detail')
-
-
-def send_order_confirmation_email(order):
-    """
-    Envia email de confirmação da encomenda para o cliente
-    """
-    try:
-        subject = f'Confirmação da sua Encomenda #{order.order_number}'
-
-        # Construir o contexto do email
-        context = {
-            'order': order,
-            'customer_name': order.customer_name,
-            'order_number': order.order_number,
-            'order_date': order.placed_at,
-            'subtotal': order.subtotal_amount,
-            'delivery_fee': order.delivery_fee,
-            'total_amount': order.total_amount,
-            'shipping_address': order.shipping_address,
-            'fulfillment_method': order.get_fulfillment_method_display(),
-            'customer_email': order.customer_email,
-            'customer_phone': order.customer_phone,
-        }
-
-        # Renderizar template HTML (crie um template em templates/emails/order_confirmation.html)
-        html_message = render_to_string('shop/order_confirmation.html', context)
-
-        # Versão texto simples (opcional)
-        plain_message = strip_tags(html_message)
-
-        # Enviar email
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email="yuransaraiva.ys@gmail.com",
-            recipient_list=[order.customer_email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-
-        print(f"Email de confirmação enviado para {order.customer_email}")
-
-    except Exception as e:
-        print(f"Erro ao enviar email de confirmação: {str(e)}")